@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks and load tests of the SDK, not installed with the package.
+"""
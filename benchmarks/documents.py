@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Generator of synthetic customer documents, shaped like the ones returned by the Contacthub APIs.
+"""
+import random
+import uuid
+
+
+def generate_customer(index=0, contacts=2, jobs=2, likes=2, subscriptions=2, extended=10, tags=3, node_id='node',
+                      rnd=None):
+    """
+    Create a dictionary representing a customer.
+
+    :param index: a number making the external id and the contacts of the customer unique
+    :param contacts: the number of other contacts of the customer
+    :param jobs: the number of jobs of the customer
+    :param likes: the number of likes of the customer
+    :param subscriptions: the number of subscriptions of the customer
+    :param extended: the number of extended properties, half of them are objects
+    :param tags: the number of manual and auto tags
+    :param node_id: the id of the node of the customer
+    :param rnd: the random.Random object used to generate the values
+    :return: a new dictionary representing a customer
+    """
+    rnd = rnd or random.Random(index)
+    extended_properties = {}
+    for i in range(extended):
+        if i % 2:
+            extended_properties['object%s' % i] = {'name': 'value %s' % rnd.randint(0, 1000),
+                                                   'score': rnd.random(),
+                                                   'nested': {'flag': bool(i % 3), 'list': [i, i + 1]}}
+        else:
+            extended_properties['field%s' % i] = 'value %s' % rnd.randint(0, 1000)
+    return {
+        'id': str(uuid.UUID(int=rnd.getrandbits(128))),
+        'nodeId': node_id,
+        'externalId': str(index),
+        'registeredAt': '2017-03-01T10:00:00.000+0000',
+        'updatedAt': '2017-03-%02dT10:00:00.000+0000' % (index % 28 + 1),
+        'enabled': True,
+        'base': {
+            'firstName': 'Name%s' % index,
+            'lastName': 'Surname%s' % index,
+            'dob': '1980-01-%02d' % (index % 28 + 1),
+            'locale': 'it_IT',
+            'timezone': 'Europe/Rome',
+            'contacts': {
+                'email': 'customer%s@example.com' % index,
+                'mobilePhone': '+39%010d' % index,
+                'otherContacts': [{'name': 'contact%s' % i, 'type': 'EMAIL',
+                                   'value': 'other%s.%s@example.com' % (index, i)} for i in range(contacts)]
+            },
+            'address': {'street': 'Street %s' % index, 'city': 'Milan', 'country': 'Italy', 'zip': '20100',
+                        'geo': {'lat': rnd.uniform(-90, 90), 'lon': rnd.uniform(-180, 180)}},
+            'jobs': [{'id': 'job%s' % i, 'companyName': 'Company %s' % i, 'jobTitle': 'Title %s' % i,
+                      'isCurrent': i == 0, 'startDate': '2010-01-01', 'endDate': None} for i in range(jobs)],
+            'likes': [{'id': 'like%s' % i, 'category': 'category%s' % (i % 5), 'name': 'like %s' % i,
+                       'createdTime': '2017-01-01T00:00:00Z'} for i in range(likes)],
+            'subscriptions': [{'id': 'subscription%s' % i, 'name': 'newsletter %s' % i, 'kind': 'DIGITAL_MESSAGE',
+                               'subscribed': bool(i % 2), 'preferences': [{'key': 'frequency', 'value': 'weekly'}]}
+                              for i in range(subscriptions)],
+            'educations': []
+        },
+        'extended': extended_properties,
+        'tags': {'manual': ['manual%s' % i for i in range(tags)], 'auto': ['auto%s' % i for i in range(tags)]},
+        'extra': None
+    }
+
+
+def generate_page(size=50, number=0, total_pages=1, seed=0, **kwargs):
+    """
+    Create a dictionary representing a page of customers returned by the APIs.
+
+    :param size: the number of customers in the page
+    :param number: the number of the page
+    :param total_pages: the total number of pages
+    :param seed: the seed of the random generator
+    :param kwargs: the parameters for generating each customer, see `generate_customer`
+    :return: a new dictionary representing a page of customers
+    """
+    rnd = random.Random(seed)
+    elements = [generate_customer(index=number * size + i, rnd=rnd, **kwargs) for i in range(size)]
+    return {'elements': elements,
+            'page': {'size': size, 'totalElements': size * total_pages, 'totalPages': total_pages,
+                     'totalUnfilteredElements': 0, 'number': number}}
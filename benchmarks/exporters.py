@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the export of customers in NDJSON, CSV and Parquet files, in rows per second.
+
+The fake server runs in its own process, like in the parallel export benchmark. The Parquet format is skipped if
+pyarrow is not installed. Run it with::
+
+    python -m benchmarks.exporters --customers 5000 --size 200 --formats ndjson csv parquet
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from multiprocessing import Pipe, Process
+
+from benchmarks.parallel_export import _serve
+from contacthub.workspace import Workspace
+
+FIELDS = ['id', 'externalId', 'base.firstName', 'base.lastName', 'base.contacts.email', 'base.jobs', 'tags.manual',
+          'registeredAt']
+
+
+def run(customers=2000, size=100, formats=('ndjson', 'csv', 'parquet'), latency=0):
+    """
+    Export all the customers of a fake server in each format.
+
+    :param customers: the number of customers exported
+    :param size: the size of the pages
+    :param formats: the formats to benchmark
+    :param latency: the latency of the fake server, in seconds
+    :return: a list of dictionaries with the results for each format
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        formats = [format for format in formats if format != 'parquet']
+    connection, server_connection = Pipe()
+    server = Process(target=_serve, args=(server_connection, customers, latency))
+    server.daemon = True
+    server.start()
+    directory = tempfile.mkdtemp()
+    try:
+        base_url = connection.recv()
+        node = Workspace(workspace_id='workspace', token='token', base_url=base_url).get_node('node')
+        results = []
+        for format in formats:
+            for fields in (None, FIELDS):
+                if format != 'ndjson' and fields is None:
+                    continue
+                path = os.path.join(directory, 'customers.' + format)
+                start = time.time()
+                rows = node.export(path, format=format, fields=fields, size=size)
+                elapsed = time.time() - start
+                results.append({'format': format, 'fields': 'selected' if fields else 'all', 'rows': rows,
+                                'seconds': elapsed, 'rows_per_second': rows / elapsed if elapsed else None,
+                                'bytes': os.path.getsize(path)})
+        return results
+    finally:
+        shutil.rmtree(directory)
+        connection.send(None)
+        server.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=100)
+    parser.add_argument('--formats', nargs='+', default=['ndjson', 'csv', 'parquet'])
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+    results = run(customers=args.customers, size=args.size, formats=args.formats, latency=args.latency)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        return
+    print('%8s %9s %7s %9s %10s %12s' % ('format', 'fields', 'rows', 'seconds', 'rows/s', 'bytes'))
+    for r in results:
+        print('%8s %9s %7d %9.2f %10.1f %12d' % (r['format'], r['fields'], r['rows'], r['seconds'],
+                                                 r['rows_per_second'], r['bytes']))
+
+
+if __name__ == '__main__':
+    main()
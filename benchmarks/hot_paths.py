@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Micro benchmarks of the hot paths of the SDK: hydration, attribute access, serialization, mutation tracking and query
+compilation. Every case is timed and memory profiled, and the results can be stored as a baseline and compared
+against later runs.
+
+Run it with::
+
+    python -m benchmarks.hot_paths --save baseline.json
+    python -m benchmarks.hot_paths --compare baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import sys
+import timeit
+from copy import deepcopy
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from benchmarks.documents import generate_customer, generate_page
+from contacthub.lib.paginated_list import PaginatedList
+from contacthub.lib.utils import DateEncoder, generate_mutation_tracker, remove_empty_attributes
+from contacthub.models.customer import Customer
+from contacthub.models.query import in_
+from contacthub.workspace import Workspace
+
+
+def _customer_getattr(node, document, params):
+    customer = Customer(node=node, **deepcopy(document))
+
+    def run():
+        customer.base.contacts.email
+        customer.base.firstName
+        customer.extended.object1.nested.flag
+        customer.tags.manual
+    return run
+
+
+def _customer_hydration(node, document, params):
+    return lambda: Customer(node=node, **deepcopy(document))
+
+
+def _serialization(node, document, params):
+    return lambda: json.dumps(document, cls=DateEncoder)
+
+
+def _mutation_tracker(node, document, params):
+    new = deepcopy(document['base'])
+    new['firstName'] = 'Changed'
+    new['address'].pop('zip')
+    new['contacts']['otherContacts'] = []
+    return lambda: generate_mutation_tracker(document['base'], new)
+
+
+def _remove_empty_attributes(node, document, params):
+    return lambda: remove_empty_attributes(document)
+
+
+def _query_filter(node, document, params):
+    def run():
+        query = node.query(Customer)
+        for i in range(params['filters']):
+            query = query.filter(Customer.base.firstName == 'Name%s' % i)
+        query.filter(in_('manual0', Customer.tags.manual))
+    return run
+
+
+def _query_compile(node, document, params):
+    def run():
+        query = node.query(Customer)
+        for i in range(params['filters']):
+            query = query.filter(Customer.base.firstName == 'Name%s' % i)
+        return query.compiled.serialized
+    return run
+
+
+def _paginated_list_retrieve(node, document, params):
+    page = generate_page(size=params['page_size'], **params['document'])
+    return lambda: PaginatedList(node=node, function=lambda **kwargs: deepcopy(page), entity_class=Customer)
+
+
+CASES = [
+    ('customer_getattr', _customer_getattr),
+    ('customer_hydration', _customer_hydration),
+    ('serialization', _serialization),
+    ('generate_mutation_tracker', _mutation_tracker),
+    ('remove_empty_attributes', _remove_empty_attributes),
+    ('query_filter', _query_filter),
+    ('query_compile', _query_compile),
+    ('paginated_list_retrieve_data', _paginated_list_retrieve),
+]
+
+DEFAULT_PARAMS = {'document': {'contacts': 2, 'jobs': 2, 'likes': 2, 'subscriptions': 2, 'extended': 10, 'tags': 3},
+                  'filters': 5, 'page_size': 50}
+
+
+def measure(function, number=100, repeat=3):
+    """
+    Time a function and measure the peak of memory allocated by a single call.
+
+    :param function: the function to measure, called without arguments
+    :param number: the number of calls of each timing
+    :param repeat: the number of timings, the best one is kept
+    :return: a dictionary with the seconds of a single call and the peak of bytes allocated, None if tracemalloc is
+        not available
+    """
+    seconds = min(timeit.repeat(function, number=number, repeat=repeat)) / number
+    peak = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'seconds': seconds, 'peak_bytes': peak}
+
+
+def run(params=None, number=100, repeat=3, cases=None):
+    """
+    Run the benchmark cases.
+
+    :param params: the parameters of the synthetic documents and of the cases, see DEFAULT_PARAMS
+    :param number: the number of calls of each timing
+    :param repeat: the number of timings of each case
+    :param cases: the names of the cases to run, all by default
+    :return: a dictionary with the parameters and the results of each case
+    """
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    node = Workspace(workspace_id='workspace', token='token').get_node('node')
+    document = generate_customer(**params['document'])
+    results = {}
+    for name, setup in CASES:
+        if cases is None or name in cases:
+            results[name] = measure(setup(node, document, params), number=number, repeat=repeat)
+    return {'params': params, 'results': results}
+
+
+def compare(current, baseline, tolerance=0.1):
+    """
+    Compare the results of a run against a baseline.
+
+    :param current: the dictionary returned by `run`
+    :param baseline: a dictionary returned by `run` on a previous version
+    :param tolerance: the relative increase allowed before considering a case as regressed
+    :return: a list of dictionaries with the ratio between the current and the baseline values of each case, and
+        whether the case has regressed
+    """
+    comparison = []
+    for name, result in sorted(current['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        row = {'case': name, 'regressed': False}
+        for metric in ('seconds', 'peak_bytes'):
+            if result[metric] and base[metric]:
+                row[metric] = result[metric] / float(base[metric])
+                row['regressed'] = row['regressed'] or row[metric] > 1 + tolerance
+            else:
+                row[metric] = None
+        comparison.append(row)
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=100, help='calls of each timing')
+    parser.add_argument('--repeat', type=int, default=3, help='timings of each case')
+    parser.add_argument('--case', action='append', dest='cases', help='a case to run, all by default')
+    for key, value in DEFAULT_PARAMS['document'].items():
+        parser.add_argument('--' + key, type=int, default=value, help='%s of each customer document' % key)
+    parser.add_argument('--save', help='store the results as a baseline in this file')
+    parser.add_argument('--compare', help='compare the results against the baseline in this file')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='relative increase allowed over the baseline')
+    args = parser.parse_args(argv)
+
+    params = {'document': dict((key, getattr(args, key)) for key in DEFAULT_PARAMS['document'])}
+    current = run(params=params, number=args.number, repeat=args.repeat, cases=args.cases)
+    print('%-30s %12s %12s' % ('case', 'us/call', 'peak KiB'))
+    for name, result in sorted(current['results'].items()):
+        peak = '%12.1f' % (result['peak_bytes'] / 1024.0) if result['peak_bytes'] is not None else '%12s' % '-'
+        print('%-30s %12.2f %s' % (name, result['seconds'] * 1e6, peak))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        comparison = compare(current, baseline, tolerance=args.tolerance)
+        print('\n%-30s %12s %12s' % ('case', 'time ratio', 'memory ratio'))
+        for row in comparison:
+            print('%-30s %12s %12s%s' % (row['case'],
+                                         '%.2f' % row['seconds'] if row['seconds'] else '-',
+                                         '%.2f' % row['peak_bytes'] if row['peak_bytes'] else '-',
+                                         '  REGRESSED' if row['regressed'] else ''))
+        if any(row['regressed'] for row in comparison):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput benchmark of the Node operations against the fake Contacthub server.
+
+Run it with::
+
+    python -m benchmarks.node_benchmark --customers 500 --threads 4 --latency 0.002
+"""
+import argparse
+import json
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+from contacthub.errors.api_error import APIError
+from contacthub.lib.upsert import UpsertStrategy
+from contacthub.models.customer import Customer
+from tests.fake_server import FakeContacthubServer
+
+
+def percentile(values, p):
+    """
+    :param values: a sorted list of numbers
+    :param p: the percentile to compute, between 0 and 100
+    :return: the nearest-rank percentile of the values, or None if there are no values
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def run_scenario(name, operation, arguments, threads=1):
+    """
+    Call the operation once for each argument, using the given number of threads, and time every call.
+
+    :param name: the name of the scenario
+    :param operation: a function called with a single argument
+    :param arguments: the list of arguments of the calls
+    :param threads: the number of concurrent threads
+    :return: a dictionary with the results of the scenario
+    """
+    def timed(argument):
+        start = time.time()
+        try:
+            operation(argument)
+            return time.time() - start, None
+        except APIError as e:
+            return time.time() - start, e
+
+    start = time.time()
+    if threads > 1:
+        pool = ThreadPool(threads)
+        try:
+            results = pool.map(timed, arguments)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [timed(argument) for argument in arguments]
+    elapsed = time.time() - start
+    latencies = sorted(latency for latency, _ in results)
+    return {'scenario': name,
+            'operations': len(results),
+            'errors': sum(1 for _, error in results if error is not None),
+            'seconds': elapsed,
+            'ops_per_second': len(results) / elapsed if elapsed else None,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99)}
+
+
+def run(customers=200, threads=1, latency=0, error_rate=0, page_size=50, seed=0):
+    """
+    Run all the scenarios against a new fake server.
+
+    :param customers: the number of customers created
+    :param threads: the number of concurrent threads of the write scenarios
+    :param latency: the latency of the fake server, in seconds
+    :param error_rate: the probability of an injected error for every request
+    :param page_size: the size of the pages read
+    :param seed: the seed of the fake server random generator
+    :return: a list of dictionaries with the results of the scenarios
+    """
+    results = []
+    with FakeContacthubServer(latency=latency, error_rate=error_rate, seed=seed) as server:
+        node = server.get_node()
+        ids = []
+
+        def add_customer(i):
+            ids.append(node.add_customer(externalId=str(i), base={'firstName': 'Name %s' % i,
+                                                                  'contacts': {'email': 'customer%s@example.com' % i}},
+                                         tags={'manual': ['even' if i % 2 == 0 else 'odd']}).id)
+
+        def read_all(_):
+            for _ in node.get_customers(size=page_size).iter_all():
+                pass
+
+        def query(_):
+            for _ in node.query(Customer).filter(Customer.tags.manual == 'even').all(size=page_size).iter_all():
+                pass
+
+        results.append(run_scenario('add_customer', add_customer, list(range(customers)), threads))
+        results.append(run_scenario('resync_force_update',
+                                    lambda i: node.add_customer(externalId=str(i), extra='resync', force_update=True),
+                                    list(range(customers)), threads))
+        strategy = UpsertStrategy()
+        results.append(run_scenario('resync_upsert_learning',
+                                    lambda i: node.add_customer(externalId=str(i), extra='resync',
+                                                                upsert_strategy=strategy),
+                                    list(range(customers)), threads))
+        results.append(run_scenario('resync_upsert_known',
+                                    lambda i: node.add_customer(externalId=str(i), extra='resync',
+                                                                upsert_strategy=strategy),
+                                    list(range(customers)), threads))
+        results[-1]['round_trips_saved'] = strategy.round_trips_saved
+        results.append(run_scenario('get_customer', lambda i: node.get_customer(id=i), list(ids), threads))
+        results.append(run_scenario('update_customer', lambda i: node.update_customer(id=i, extra='updated'),
+                                    list(ids), threads))
+        results.append(run_scenario('add_event', lambda i: node.add_event(customerId=i, type='viewedPage',
+                                                                          context='WEB', properties={}),
+                                    list(ids), threads))
+        results.append(run_scenario('get_customers_pages', read_all, [None]))
+        results.append(run_scenario('query_pages', query, [None]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+    results = run(customers=args.customers, threads=args.threads, latency=args.latency, error_rate=args.error_rate,
+                  page_size=args.page_size)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        return
+    print('%-24s %8s %7s %10s %9s %9s %9s' % ('scenario', 'ops', 'errors', 'ops/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for r in results:
+        print('%-24s %8d %7d %10.1f %9.2f %9.2f %9.2f' % (r['scenario'], r['operations'], r['errors'],
+                                                          r['ops_per_second'], r['p50'] * 1000, r['p95'] * 1000,
+                                                          r['p99'] * 1000))
+
+
+if __name__ == '__main__':
+    main()
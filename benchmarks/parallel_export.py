@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the export of customers hydrated in a pool of processes, at 1, 2, 4 and 8 workers.
+
+The fake server runs in its own process, so that its JSON encoding doesn't compete with the exporting process for
+the GIL. Run it with::
+
+    python -m benchmarks.parallel_export --customers 5000 --size 200 --workers 1 2 4 8
+"""
+import argparse
+import json
+import sys
+import time
+from multiprocessing import Pipe, Process
+
+from benchmarks.documents import generate_customer
+from contacthub.workspace import Workspace
+from tests.fake_server import FakeContacthubServer
+
+
+def summarize(customer):
+    """
+    Transform of the benchmark: read the nested properties of a customer, as a typical export does.
+
+    :param customer: a Customer object
+    :return: a tuple with the external id, the email, the companies of the jobs, the likes and the extended properties
+    """
+    base = customer.base
+    return (customer.externalId, base.contacts.email, [job.companyName for job in base.jobs],
+            [like.name for like in base.likes], sorted(customer.extended.to_dict()))
+
+
+def _serve(connection, customers, latency):
+    server = FakeContacthubServer(latency=latency).start()
+    server.add_customers([generate_customer(index=i, node_id=server.node_id) for i in range(customers)])
+    connection.send(server.base_url)
+    connection.recv()
+    server.stop()
+
+
+def run(customers=2000, size=100, workers=(1, 2, 4, 8), latency=0):
+    """
+    Export all the customers of a fake server with each number of workers.
+
+    :param customers: the number of customers exported
+    :param size: the size of the pages
+    :param workers: the numbers of worker processes to benchmark
+    :param latency: the latency of the fake server, in seconds
+    :return: a list of dictionaries with the results for each number of workers
+    """
+    connection, server_connection = Pipe()
+    server = Process(target=_serve, args=(server_connection, customers, latency))
+    server.daemon = True
+    server.start()
+    try:
+        base_url = connection.recv()
+        node = Workspace(workspace_id='workspace', token='token', base_url=base_url).get_node('node')
+        results = []
+        baseline = None
+        for count in workers:
+            start = time.time()
+            exported = sum(1 for _ in node.export_parallel(workers=count, transform=summarize, size=size))
+            elapsed = time.time() - start
+            baseline = baseline or elapsed
+            results.append({'workers': count, 'customers': exported, 'seconds': elapsed,
+                            'customers_per_second': exported / elapsed if elapsed else None,
+                            'speedup': baseline / elapsed if elapsed else None})
+        return results
+    finally:
+        connection.send(None)
+        server.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=100)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+    results = run(customers=args.customers, size=args.size, workers=args.workers, latency=args.latency)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        return
+    print('%8s %10s %9s %12s %8s' % ('workers', 'customers', 'seconds', 'customers/s', 'speedup'))
+    for r in results:
+        print('%8d %10d %9.2f %12.1f %7.2fx' % (r['workers'], r['customers'], r['seconds'], r['customers_per_second'],
+                                                r['speedup']))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,12 @@
 # -*- coding: utf-8 -*-
-import requests
 import json
 
 from copy import deepcopy
 from requests import HTTPError
 
+from contacthub._api_manager._api_request import _request, _stream_request
 from contacthub.errors.api_error import APIError
+from contacthub.lib.json_stream import JSONArrayStream
 from contacthub.lib.utils import DateEncoder
 
 
@@ -24,6 +25,20 @@ class _CustomerAPIManager(object):
         self.request_url = self.node.workspace.base_url + '/' + self.node.workspace.workspace_id + '/customers'
         self.headers = {'Authorization': 'Bearer ' + self.node.workspace.token, 'Content-Type': 'application/json'}
 
+    @classmethod
+    def for_node(cls, node):
+        """
+        Get the API manager of a node. An API manager is never modified after its creation, so the one created by the
+        Node is shared by all its entities and by all the threads using them.
+
+        :param node: the Node object for retrieving customers data
+        :return: the _CustomerAPIManager of the node, or a new one if the node doesn't have it
+        """
+        manager = getattr(node, 'customer_api_manager', None)
+        if isinstance(manager, cls):
+            return manager
+        return cls(node=node)
+
     def get_all(self, externalId=None, fields=None, query=None, size=None, page=None):
         # type: (str, list, dict, int, int) -> dict
         """
@@ -38,9 +53,52 @@ class _CustomerAPIManager(object):
         :return: A dictionary representing the JSON response from the API called if there were no errors, else raise an
             HTTPException
         """
+        params = self._get_all_params(externalId=externalId, fields=fields, query=query, size=size, page=page)
+        resp, response_text = _request(self.node.workspace, 'get', self.request_url, params=params,
+                                       headers=self.headers)
+        if 200 <= resp.status_code < 300:
+            return response_text
+        raise APIError("Status code: %s. Message: %s. Errors: %s. Data: %s. Logref: %s" % (resp.status_code,
+                                                                                           response_text['message'],
+                                                                                           response_text['errors'],
+                                                                                           response_text['data'],
+                                                                                           response_text['logref']),
+                       response=resp)
+
+    def get_all_stream(self, externalId=None, fields=None, query=None, size=None, page=None, chunk_size=65536):
+        """
+        Get a page of customers in the specified Node, decoding the response incrementally while it is received.
+
+        :param externalId: The external id assigned to the customers
+        :param fields: Comma-separated list of properties to include in the response
+        :param query: a dictionary query for filter the customers
+        :param size: the size of the pages containing customers
+        :param page: the number of the page for retrieve customer's data
+        :param chunk_size: the number of bytes read from the response at once
+        :return: a JSONArrayStream object, iterable over the dictionaries of the customers, with the `page` metadata in
+            its `metadata` dictionary once the iteration is over. If there were errors, raise an APIError
+        """
+        params = self._get_all_params(externalId=externalId, fields=fields, query=query, size=size, page=page)
+        resp = _stream_request(self.node.workspace, self.request_url, params=params, headers=self.headers)
+        if 200 <= resp.status_code < 300:
+            return JSONArrayStream(resp.iter_content(chunk_size), key='elements', close=resp.close)
+        try:
+            text = resp.text
+        finally:
+            resp.close()
+        response_text = json.loads(text) if text else {}
+        raise APIError("Status code: %s. Message: %s. Errors: %s. Data: %s. Logref: %s" % (resp.status_code,
+                                                                                           response_text.get('message'),
+                                                                                           response_text.get('errors'),
+                                                                                           response_text.get('data'),
+                                                                                           response_text.get('logref')),
+                       response=resp)
+
+    def _get_all_params(self, externalId=None, fields=None, query=None, size=None, page=None):
         params = {'nodeId': self.node.node_id}
         if query:
-            params['query'] = json.dumps(query, cls=DateEncoder)
+            #  a compiled query caches its serialization, reused for every page
+            params['query'] = getattr(query, 'serialized', None) or json.dumps(query, cls=DateEncoder)
         if externalId:
             params['externalId'] = str(externalId)
         if size:
@@ -49,15 +107,7 @@ class _CustomerAPIManager(object):
             params['page'] = page
         if fields:
             params['fields'] = ",".join(fields)
-        resp = requests.get(self.request_url, params=params, headers=self.headers)
-        response_text = json.loads(resp.text)
-        if 200 <= resp.status_code < 300:
-            return response_text
-        raise APIError("Status code: %s. Message: %s. Errors: %s. Data: %s. Logref: %s" % (resp.status_code,
-                                                                                           response_text['message'],
-                                                                                           response_text['errors'],
-                                                                                           response_text['data'],
-                                                                                           response_text['logref']))
+        return params
 
     def get(self, _id, urls_extra=None):
         """
@@ -72,49 +122,75 @@ class _CustomerAPIManager(object):
         request_url = self.request_url + '/' + str(_id)
         if urls_extra:
             request_url += "/" + urls_extra
-        resp = requests.get(request_url, headers=self.headers)
-        response_text = json.loads(resp.text)
+        resp, response_text = _request(self.node.workspace, 'get', request_url, headers=self.headers)
         if 200 <= resp.status_code < 300:
             return response_text
         raise APIError("Status code: %s. Message: %s. Errors: %s. Data: %s. Logref: %s" % (resp.status_code,
                                                                                            response_text['message'],
                                                                                            response_text['errors'],
                                                                                            response_text['data'],
-                                                                                           response_text['logref']))
+                                                                                           response_text['logref']),
+                       response=resp)
 
-    def post(self, body, urls_extra=None, force_update=False):
+    def post(self, body, urls_extra=None, force_update=False, upsert_strategy=None):
         """
         POST a new customer in the specified Node.
         If urls_extra is specified, post the new entity related to customer, like Job, Education and Like
         If the status code of the response is 409 (CONFLICT) and the parameter force_update is true,
         redirect the body to a PATCH request.
+        If an upsert strategy is specified, the customers whose external id is known by the strategy are PATCHed
+        directly, without POSTing them first.
 
         :param force_update: if True and the customer already exists in CH, this method redirect the body to a PATCH
             request.
         :param urls_extra: The extra url at the end of the base url of this class, for reaching end point of other
             entities like Job, Education and Like
         :param body: the body of the POST request containing the new Customers data
+        :param upsert_strategy: an UpsertStrategy object knowing the ids of the existing customers. It implies
+            force_update and learns the ids of the customers created or in conflict.
         :return: A dictionary representing the JSON response from the API called if there were no errors, else raise an
             HTTPException
         """
         if not urls_extra:
+            if upsert_strategy is not None:
+                customer_id = upsert_strategy.lookup(body.get('externalId'))
+                if customer_id is not None:
+                    body.pop('nodeId', None)
+                    request_url = self.request_url + '/' + str(customer_id)
+                    resp, response_text = _request(self.node.workspace, 'patch', request_url, body=body,
+                                                   headers=self.headers)
+                    if 200 <= resp.status_code < 300:
+                        upsert_strategy.record('direct_patches')
+                        return response_text
+                    if resp.status_code != 404:
+                        raise APIError("Status code: %s. Message: %s. Errors: %s. Data: %s. Logref: %s" % (
+                            resp.status_code, response_text['message'], response_text['errors'],
+                            response_text['data'], response_text['logref']), response=resp)
+                    upsert_strategy.forget(body.get('externalId'))
+                    upsert_strategy.record('stale')
             body['nodeId'] = self.node.node_id
             request_url = self.request_url
         else:
             request_url = self.request_url + "/" + urls_extra
-        body = json.loads(json.dumps(body, cls=DateEncoder))
-        resp = requests.post(request_url, json=body, headers=self.headers)
-        response_text = json.loads(resp.text)
+        resp, response_text = _request(self.node.workspace, 'post', request_url, body=body, headers=self.headers)
         if 200 <= resp.status_code < 300:
+            if upsert_strategy is not None and not urls_extra:
+                upsert_strategy.learn(body.get('externalId'), response_text['id'])
+                upsert_strategy.record('posts')
             return response_text
-        if resp.status_code == 409 and force_update:
+        if resp.status_code == 409 and (force_update or upsert_strategy is not None):
             body.pop('nodeId', None)
-            return self.patch(_id=response_text['data']['customer']['id'], body=body)
+            customer_id = response_text['data']['customer']['id']
+            if upsert_strategy is not None:
+                upsert_strategy.learn(body.get('externalId'), customer_id)
+                upsert_strategy.record('conflicts')
+            return self.patch(_id=customer_id, body=body)
         raise APIError("Status code: %s. Message: %s. Errors: %s. Data: %s. Logref: %s" % (resp.status_code,
                                                                                            response_text['message'],
                                                                                            response_text['errors'],
                                                                                            response_text['data'],
-                                                                                           response_text['logref']))
+                                                                                           response_text['logref']),
+                       response=resp)
 
     def delete(self, _id, urls_extra=None):
         """
@@ -128,18 +204,15 @@ class _CustomerAPIManager(object):
         request_url = self.request_url + '/' + str(_id)
         if urls_extra:
             request_url += '/' + urls_extra
-        resp = requests.delete(request_url, headers=self.headers)
-        if resp.text:
-            response_text = json.loads(resp.text)
-        else:
-            response_text = resp.text
+        resp, response_text = _request(self.node.workspace, 'delete', request_url, headers=self.headers)
         if 200 <= resp.status_code < 300:
             return response_text
         raise APIError("Status code: %s. Message: %s. Errors: %s. Data: %s. Logref: %s" % (resp.status_code,
                                                                                            response_text['message'],
                                                                                            response_text['errors'],
                                                                                            response_text['data'],
-                                                                                           response_text['logref']))
+                                                                                           response_text['logref']),
+                       response=resp)
 
     def patch(self, _id, body):
         """
@@ -150,17 +223,16 @@ class _CustomerAPIManager(object):
         :return: A dictionary representing the JSON response from the API called if there were no errors, else raise an
             HTTPException
         """
-
-        body = json.dumps(body, cls=DateEncoder)
-        resp = requests.patch(self.request_url + '/' + str(_id), json=json.loads(body), headers=self.headers)
-        response_text = json.loads(resp.text)
+        resp, response_text = _request(self.node.workspace, 'patch', self.request_url + '/' + str(_id), body=body,
+                                       headers=self.headers)
         if 200 <= resp.status_code < 300:
             return response_text
         raise APIError("Status code: %s. Message: %s. Errors: %s. Data: %s. Logref: %s" % (resp.status_code,
                                                                                            response_text['message'],
                                                                                            response_text['errors'],
                                                                                            response_text['data'],
-                                                                                           response_text['logref']))
+                                                                                           response_text['logref']),
+                       response=resp)
 
     def put(self, _id, body, urls_extra=None):
         """
@@ -175,13 +247,12 @@ class _CustomerAPIManager(object):
         request_url = self.request_url + '/' + str(_id)
         if urls_extra:
             request_url += '/' + urls_extra
-        body = json.loads(json.dumps(body, cls=DateEncoder))
-        resp = requests.put(request_url, json=body, headers=self.headers)
-        response_text = json.loads(resp.text)
+        resp, response_text = _request(self.node.workspace, 'put', request_url, body=body, headers=self.headers)
         if 200 <= resp.status_code < 300:
             return response_text
         raise APIError("Status code: %s. Message: %s. Errors: %s. Data: %s. Logref: %s" % (resp.status_code,
                                                                                            response_text['message'],
                                                                                            response_text['errors'],
                                                                                            response_text['data'],
-                                                                                           response_text['logref']))
+                                                                                           response_text['logref']),
+                       response=resp)
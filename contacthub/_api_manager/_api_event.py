@@ -1,10 +1,8 @@
 # -*- coding: utf-8 -*-
-import json
 from datetime import datetime
-import requests
-from contacthub.lib.utils import DateEncoder
 from requests import HTTPError
 
+from contacthub._api_manager._api_request import _request
 from contacthub.errors.api_error import APIError
 
 
@@ -23,6 +21,20 @@ class _EventAPIManager(object):
         self.request_url = self.node.workspace.base_url + '/' + self.node.workspace.workspace_id + '/events'
         self.headers = {'Authorization': 'Bearer ' + self.node.workspace.token, 'Content-Type': 'application/json'}
 
+    @classmethod
+    def for_node(cls, node):
+        """
+        Get the API manager of a node. An API manager is never modified after its creation, so the one created by the
+        Node is shared by all its entities and by all the threads using them.
+
+        :param node: the Node object for retrieving events data
+        :return: the _EventAPIManager of the node, or a new one if the node doesn't have it
+        """
+        manager = getattr(node, 'event_api_manager', None)
+        if isinstance(manager, cls):
+            return manager
+        return cls(node=node)
+
     def get_all(self, customer_id, type=None, context=None, mode=None, dateFrom=None, dateTo=None, page=None,
                 size=None):
         """
@@ -62,15 +74,16 @@ class _EventAPIManager(object):
             params['page'] = page
         if size:
             params['size'] = size
-        resp = requests.get(self.request_url, params=params, headers=self.headers)
-        response_text = json.loads(resp.text)
+        resp, response_text = _request(self.node.workspace, 'get', self.request_url, params=params,
+                                       headers=self.headers)
         if 200 <= resp.status_code < 300:
             return response_text
         raise APIError("Status code: %s. Message: %s. Errors: %s. Data: %s. Logref: %s" % (resp.status_code,
                                                                                            response_text['message'],
                                                                                            response_text['errors'],
                                                                                            response_text['data'],
-                                                                                           response_text['logref']))
+                                                                                           response_text['logref']),
+                       response=resp)
 
     def get(self, _id):
         """
@@ -80,32 +93,38 @@ class _EventAPIManager(object):
         :return: A dictionary representing the JSON response from the API called if there were no errors, else raise an
             HTTPException
         """
-        resp = requests.get(self.request_url + '/' + _id, headers=self.headers)
-        response_text = json.loads(resp.text)
+        resp, response_text = _request(self.node.workspace, 'get', self.request_url + '/' + _id, headers=self.headers)
         if 200 <= resp.status_code < 300:
             return response_text
         raise APIError("Status code: %s. Message: %s. Errors: %s. Data: %s. Logref: %s" % (resp.status_code,
                                                                                            response_text['message'],
                                                                                            response_text['errors'],
                                                                                            response_text['data'],
-                                                                                           response_text['logref']))
+                                                                                           response_text['logref']),
+                       response=resp)
 
     def post(self, body):
         """
-        Post a new event with the given body
+        Post a new event with the given body. If the node deduplicates the events (see `Node.deduplicate_events`), a
+        duplicate event is not posted and the transient errors are retried.
 
         :param body: the body of the POST request containing the new Customers data
         :return: A dictionary representing the JSON response from the API called if there were no errors, else raise an
             HTTPException
         """
-        body = json.dumps(body, cls=DateEncoder)
-        resp = requests.post(self.request_url, headers=self.headers, json=json.loads(body))
-        if resp.text:
-            response_text = json.loads(resp.text)
+        deduplicator = getattr(self.node, 'event_deduplicator', None)
+        if deduplicator is not None:
+            return deduplicator.post(self._post, body, self.headers)
+        return self._post(body, self.headers)
+
+    def _post(self, body, headers):
+        resp, response_text = _request(self.node.workspace, 'post', self.request_url, body=body, headers=headers)
+        if response_text:
             if 200 <= resp.status_code < 300:
                 return response_text
             raise APIError("Status code: %s. Message: %s. Errors: %s. Data: %s. Logref: %s" % (resp.status_code,
                                                                                            response_text['message'],
                                                                                            response_text['errors'],
                                                                                            response_text['data'],
-                                                                                           response_text['logref']))
+                                                                                           response_text['logref']),
+                           response=resp)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+
+import requests
+
+from contacthub.lib import tracing
+from contacthub.lib.hooks import RequestInfo
+from contacthub.lib.utils import DateEncoder
+
+
+def _endpoint_template(workspace, url):
+    """
+    Get the template of the endpoint of an URL, replacing the ids with {id}.
+    For example: the template of .../workspaces/123/customers/456/jobs/789 is /customers/{id}/jobs/{id}
+
+    :param workspace: the Workspace object of the request
+    :param url: the URL of the request
+    :return: a string representing the template of the endpoint
+    """
+    path = url[len(workspace.base_url) + len(workspace.workspace_id) + 1:]
+    segments = [segment for segment in path.split('/') if segment]
+    return '/' + '/'.join(segment if index % 2 == 0 else '{id}' for index, segment in enumerate(segments))
+
+
+def _request(workspace, method, url, headers, params=None, body=None):
+    """
+    Execute a request to the APIs, serializing the body and decoding the response. If the Workspace has hooks, they
+    are called with the information about the request and its timings. If a tracer is installed, the request, the
+    encoding and the decoding are traced in their own spans.
+
+    :param workspace: the Workspace object of the request
+    :param method: the HTTP method of the request, lowercase (get, post, put, patch or delete)
+    :param url: the URL of the request
+    :param headers: the headers of the request
+    :param params: a dictionary containing the query string parameters of the request
+    :param body: a dictionary containing the body of the request, serialized with DateEncoder
+    :return: a tuple containing the response object and the decoded JSON body of the response, or the empty text of
+        the response if there is no body
+    """
+    kwargs = {'headers': headers}
+    if params is not None:
+        kwargs['params'] = params
+    hooks = getattr(workspace, 'hooks', None)
+    if not hooks and tracing.tracer is None:
+        if body is not None:
+            kwargs['json'] = json.loads(json.dumps(body, cls=DateEncoder))
+        resp = getattr(requests, method)(url, **kwargs)
+        text = resp.text
+        return resp, json.loads(text) if text else text
+
+    info = RequestInfo(method=method, url=url, endpoint=_endpoint_template(workspace, url))
+    with tracing.span('contacthub.http', **{'http.method': method.upper(), 'http.url': url,
+                                            'contacthub.endpoint': info.endpoint}) as http_span:
+        start = time.time()
+        if body is not None:
+            with tracing.span('contacthub.json.encode'):
+                serialized = json.dumps(body, cls=DateEncoder)
+                kwargs['json'] = json.loads(serialized)
+            info.request_bytes = len(serialized)
+        info.serialize_time = time.time() - start
+        if hooks:
+            hooks.fire('before_request', info)
+
+        start = time.time()
+        try:
+            resp = getattr(requests, method)(url, **kwargs)
+        except Exception as e:
+            info.network_time = time.time() - start
+            info.error = e
+            if hooks:
+                hooks.fire('on_error', info)
+            raise
+        info.network_time = time.time() - start
+        info.status = resp.status_code
+        http_span.set_attribute('http.status_code', resp.status_code)
+
+        start = time.time()
+        with tracing.span('contacthub.json.decode'):
+            text = resp.text
+            response_text = json.loads(text) if text else text
+        info.decode_time = time.time() - start
+        if hooks:
+            content = getattr(resp, 'content', None)
+            info.response_bytes = len(content) if isinstance(content, bytes) else len((text or '').encode('utf-8'))
+            hooks.fire('after_response', info)
+            if not 200 <= resp.status_code < 300:
+                hooks.fire('on_error', info)
+    return resp, response_text
+
+
+def _stream_request(workspace, url, headers, params=None):
+    """
+    Execute a GET request to the APIs without reading its body, for decoding it incrementally. If the Workspace has
+    hooks, they are called as soon as the status code is received: the bytes received and the decoding time are not
+    known yet.
+
+    :param workspace: the Workspace object of the request
+    :param url: the URL of the request
+    :param headers: the headers of the request
+    :param params: a dictionary containing the query string parameters of the request
+    :return: the response object, with its body still to be read
+    """
+    kwargs = {'headers': headers, 'stream': True}
+    if params is not None:
+        kwargs['params'] = params
+    hooks = getattr(workspace, 'hooks', None)
+    if not hooks and tracing.tracer is None:
+        return requests.get(url, **kwargs)
+
+    info = RequestInfo(method='get', url=url, endpoint=_endpoint_template(workspace, url))
+    with tracing.span('contacthub.http', **{'http.method': 'GET', 'http.url': url, 'contacthub.endpoint': info.endpoint,
+                                            'contacthub.stream': True}) as http_span:
+        if hooks:
+            hooks.fire('before_request', info)
+        start = time.time()
+        try:
+            resp = requests.get(url, **kwargs)
+        except Exception as e:
+            info.network_time = time.time() - start
+            info.error = e
+            if hooks:
+                hooks.fire('on_error', info)
+            raise
+        info.network_time = time.time() - start
+        info.status = resp.status_code
+        http_span.set_attribute('http.status_code', resp.status_code)
+        if hooks:
+            hooks.fire('after_response', info)
+            if not 200 <= resp.status_code < 300:
+                hooks.fire('on_error', info)
+    return resp
@@ -5,4 +5,10 @@ class APIError(HTTPError):
     """
     Class for API response error
     """
-    pass
\ No newline at end of file
+
+    @property
+    def status_code(self):
+        """
+        The status code of the response of the APIs, None if the error was raised without the response
+        """
+        return getattr(self.response, 'status_code', None)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+
+from contacthub.lib.concurrency import run_concurrently
+from contacthub.models.customer import Customer
+from contacthub.models.query import in_
+from contacthub.models.query.query import Query
+
+
+class BulkResult(object):
+    """
+    The outcome of a bulk operation for each customer: `updated`, `unchanged` if the operation didn't change the
+    customer, `not_found` if there isn't a customer with the given id, `failed` if the request raised an exception,
+    available in `errors`.
+    """
+    UPDATED = 'updated'
+    UNCHANGED = 'unchanged'
+    NOT_FOUND = 'not_found'
+    FAILED = 'failed'
+
+    def __init__(self):
+        self.outcomes = OrderedDict()
+        self.errors = {}
+
+    def set(self, customer_id, outcome, error=None):
+        """
+        Record the outcome of a customer.
+
+        :param customer_id: the id of the customer
+        :param outcome: one of `updated`, `unchanged`, `not_found` or `failed`
+        :param error: the exception raised for a failed customer
+        """
+        self.outcomes[customer_id] = outcome
+        if error is not None:
+            self.errors[customer_id] = error
+
+    def ids(self, outcome):
+        """
+        :param outcome: one of `updated`, `unchanged`, `not_found` or `failed`
+        :return: the list of the ids of the customers with the given outcome
+        """
+        return [customer_id for customer_id, o in self.outcomes.items() if o == outcome]
+
+    @property
+    def counts(self):
+        """
+        A dictionary mapping each outcome to the number of customers with that outcome.
+        """
+        counts = dict((outcome, 0) for outcome in (self.UPDATED, self.UNCHANGED, self.NOT_FOUND, self.FAILED))
+        for outcome in self.outcomes.values():
+            counts[outcome] += 1
+        return counts
+
+    def __repr__(self):
+        return 'BulkResult(%s)' % self.counts
+
+
+def _manual_tags(node, customers, chunk_size):
+    """
+    Fetch only the manual tags of the given customers.
+
+    :param node: the Node object of the customers
+    :param customers: a Query object, or a list of ids of customers
+    :param chunk_size: the number of customers fetched for each request
+    :return: an OrderedDict mapping the id of each customer found to the list of its manual tags
+    """
+    tags = OrderedDict()
+    if isinstance(customers, Query):
+        pages = [customers.all(size=chunk_size, fields=['id', 'tags.manual'], raw=True)]
+    else:
+        ids = list(OrderedDict.fromkeys(customers))
+        pages = (node.query(Customer).filter(in_(ids[i:i + chunk_size], Customer.id))
+                 .all(size=chunk_size, fields=['id', 'tags.manual'], raw=True) for i in range(0, len(ids), chunk_size))
+    for page in pages:
+        if page is None:
+            continue
+        for element in page.iter_all():
+            tags[element['id']] = list((element.get('tags') or {}).get('manual') or [])
+    return tags
+
+
+def update_tags_bulk(node, customers, add=(), remove=(), concurrency=8, chunk_size=50):
+    """
+    Add and remove manual tags on many customers, fetching only their manual tags and patching only the customers
+    whose tags change, with at most `concurrency` PATCH requests running at the same time.
+    The new tags of each customer are computed from the ones fetched: a change made by someone else to the tags of a
+    customer between the fetch and the PATCH is overwritten.
+
+    :param node: the Node object of the customers
+    :param customers: a Query object, or a list of ids of customers
+    :param add: a list of tags to add
+    :param remove: a list of tags to remove
+    :param concurrency: the maximum number of concurrent PATCH requests
+    :param chunk_size: the number of customers fetched for each request
+    :return: a BulkResult object with the outcome for each customer
+    """
+    result = BulkResult()
+    current = _manual_tags(node, customers, chunk_size)
+    if not isinstance(customers, Query):
+        for customer_id in customers:
+            if customer_id not in current:
+                result.set(customer_id, BulkResult.NOT_FOUND)
+
+    changes = []
+    for customer_id, tags in current.items():
+        new_tags = [tag for tag in tags if tag not in remove]
+        new_tags += [tag for tag in OrderedDict.fromkeys(add) if tag not in new_tags]
+        if new_tags == tags:
+            result.set(customer_id, BulkResult.UNCHANGED)
+        else:
+            changes.append((customer_id, new_tags))
+
+    def patch(change):
+        customer_id, new_tags = change
+        return node.customer_api_manager.patch(_id=customer_id, body={'tags': {'manual': new_tags}})
+
+    for (customer_id, _), (_, error) in zip(changes, run_concurrently(patch, changes, concurrency)):
+        if error is None:
+            result.set(customer_id, BulkResult.UPDATED)
+            for observer in getattr(node, 'tag_observers', ()):
+                for tag in add:
+                    observer.tag_added(customer_id, tag)
+                for tag in remove:
+                    observer.tag_removed(customer_id, tag)
+        else:
+            result.set(customer_id, BulkResult.FAILED, error)
+    return result
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict
+
+from contacthub.lib.concurrency import run_concurrently
+from contacthub.models.query.canonical import CompiledQuery
+from contacthub.models.query.criterion import Criterion
+from contacthub.models.query.evaluator import compile_condition
+
+
+def _largest_list_condition(query, max_values):
+    """
+    Find the IN or NOT_IN condition with the most values in a query, if it has more than `max_values` values and
+    every entity of the query satisfies it (see `_conjunctive`).
+
+    :param query: a dictionary representing a simple or combined query
+    :param max_values: the maximum number of values of a condition sent in a single request
+    :return: the dictionary of the condition, None if no such condition has more than `max_values` values
+    """
+    largest = None
+    stack = [query]
+    while stack:
+        element = stack.pop()
+        if element['type'] == 'combined':
+            stack.extend(element['queries'])
+        elif element['type'] == 'simple':
+            stack.append(element['are']['condition'])
+        elif element['type'] == 'composite':
+            stack.extend(element['conditions'])
+        elif element['operator'] in (Criterion.SIMPLE_OPERATORS.IN, Criterion.SIMPLE_OPERATORS.NOT_IN) and \
+                isinstance(element.get('value'), (list, tuple)) and len(element['value']) > max_values:
+            if (largest is None or len(element['value']) > len(largest['value'])) and _conjunctive(query, element):
+                largest = element
+    return largest
+
+
+def _conjunctive(element, target):
+    """
+    :param element: a dictionary representing a query or a condition
+    :param target: a condition of the query, compared by identity
+    :return: True if the target is found only through intersections and AND conditions, so every entity of the query
+        satisfies it
+    """
+    if element is target:
+        return True
+    if element['type'] == 'combined':
+        return element['conjunction'] == 'INTERSECT' and any(_conjunctive(q, target) for q in element['queries'])
+    if element['type'] == 'simple':
+        return _conjunctive(element['are']['condition'], target)
+    if element['type'] == 'composite':
+        return element['conjunction'] == Criterion.COMPLEX_OPERATORS.AND and \
+            any(_conjunctive(c, target) for c in element['conditions'])
+    return False
+
+
+def _covered(attribute, fields):
+    return any(attribute == field or attribute.startswith(field + '.') for field in fields)
+
+
+def _strip(element, keys):
+    """
+    Remove a dotted attribute from a dictionary returned by the APIs, and the dictionaries left empty by removing it.
+    """
+    parent = element.get(keys[0])
+    if len(keys) == 1:
+        element.pop(keys[0], None)
+    elif isinstance(parent, dict):
+        _strip(parent, keys[1:])
+        if not parent:
+            del element[keys[0]]
+
+
+class _Prefetch(threading.Thread):
+    """
+    A page retrieved in background.
+    """
+
+    def __init__(self, function, kwargs):
+        super(_Prefetch, self).__init__()
+        self.daemon = True
+        self.function = function
+        self.kwargs = kwargs
+        self.response = None
+        self.error = None
+        self.start()
+
+    def run(self):
+        try:
+            self.response = self.function(**self.kwargs)
+        except Exception as e:
+            self.error = e
+
+    def result(self):
+        self.join()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+def _replace(element, target, replacement):
+    """
+    Copy a query replacing a condition, sharing the parts of the query not containing it.
+
+    :param element: a dictionary representing a query or a condition
+    :param target: the condition to replace, compared by identity
+    :param replacement: the new condition
+    :return: the dictionary of the new query or condition
+    """
+    if element is target:
+        return replacement
+    if element['type'] == 'combined':
+        return dict(element, queries=[_replace(q, target, replacement) for q in element['queries']])
+    if element['type'] == 'simple':
+        return dict(element, are={'condition': _replace(element['are']['condition'], target, replacement)})
+    if element['type'] == 'composite':
+        return dict(element, conditions=[_replace(c, target, replacement) for c in element['conditions']])
+    return element
+
+
+class ChunkedQuery(object):
+    """
+    A function retrieving pages of entities like the `get_all` function of an API manager, for a query with an IN or
+    NOT_IN condition too large for a single request.
+
+    The condition must be in an intersection (e.g. AND) with the rest of the query, so that every entity of the query
+    satisfies it: otherwise a ValueError is raised, and `split` keeps such queries in a single request.
+
+    For an IN condition, the values are split in chunks of at most `max_values` values, one query for each chunk: the
+    entities of the whole query are the union of the ones of the chunks. The merged result is a stream of the pages of
+    the chunks, one after the other: the first pages of all the chunks are retrieved concurrently for the totals, then
+    each page is retrieved when requested, with the next `concurrency` pages retrieved in background. An entity
+    matching the values of an earlier chunk too (e.g. on a list attribute like the tags) is removed locally from the
+    pages of the later chunks, so no state is kept about the entities served.
+
+    For a NOT_IN condition, splitting it would scan the whole node for each chunk. The query is sent once with the first
+    `max_values` values, and the entities having one of the other values are removed locally from each page.
+
+    If the fields of the response are restricted, the attribute of the condition is requested too for the local
+    filters, and removed from the entities.
+
+    The pages may hold fewer entities than their size, and `totalElements` is an upper bound, since the entities
+    removed are known only when their page is retrieved.
+    """
+
+    def __init__(self, function, query, condition, max_values, concurrency=8):
+        """
+        :param function: the function of an API manager retrieving a page of entities
+        :param query: the dictionary of the query, with the name of the query and the inner query
+        :param condition: the IN or NOT_IN condition of the query to split
+        :param max_values: the maximum number of values of the condition sent in a single request
+        :param concurrency: the maximum number of concurrent requests
+        """
+        if not _conjunctive(query['query'], condition):
+            raise ValueError('A condition with more than %s values can be split only if it is in an intersection '
+                             'with the rest of the query' % max_values)
+        self.function = function
+        values = list(OrderedDict.fromkeys(condition['value']))
+        if condition['operator'] == Criterion.SIMPLE_OPERATORS.IN:
+            chunks = [values[i:i + max_values] for i in range(0, len(values), max_values)]
+            #  the filter of each chunk removes the entities of the earlier chunks
+            self.filters = [None] + [compile_condition(dict(condition, operator=Criterion.SIMPLE_OPERATORS.NOT_IN,
+                                                            value=values[:i * max_values]))
+                                     for i in range(1, len(chunks))]
+        else:
+            chunks = [values[:max_values]]
+            self.filters = [compile_condition(dict(condition, value=values[max_values:]))]
+        self.attribute = condition['attribute']
+        self.queries = [CompiledQuery(query, query=_replace(query['query'], condition, dict(condition, value=chunk)))
+                        for chunk in chunks]
+        self.concurrency = concurrency
+        #  the (chunk, page of the chunk) of each page of the merged result, known after the first pages
+        self.pages = None
+        self.first_pages = {}
+        self.prefetched = {}
+        self.total_elements = 0
+        self.total_unfiltered_elements = 0
+        self.lock = threading.Lock()
+        #  held while retrieving the first pages, without blocking the threads already using the pages
+        self.plan_lock = threading.Lock()
+
+    @classmethod
+    def split(cls, function, query, max_values, concurrency=8):
+        """
+        Create a ChunkedQuery if a query has an IN or NOT_IN condition with more than `max_values` values.
+
+        :param function: the function of an API manager retrieving a page of entities
+        :param query: the dictionary of the query, with the name of the query and the inner query
+        :param max_values: the maximum number of values of a condition sent in a single request
+        :param concurrency: the maximum number of concurrent requests
+        :return: a new ChunkedQuery object, None if the query can be sent in a single request or can't be split
+        """
+        condition = _largest_list_condition(query['query'], max_values)
+        if condition is None:
+            return None
+        return cls(function, query, condition, max_values, concurrency)
+
+    def _kwargs(self, number, kwargs):
+        chunk, page = self.pages[number]
+        return dict(kwargs, query=self.queries[chunk], page=page)
+
+    def _plan(self, kwargs):
+        with self.plan_lock:
+            if self.pages is not None:
+                return
+            results = run_concurrently(lambda query: self.function(**dict(kwargs, query=query, page=0)),
+                                       self.queries, self.concurrency)
+            for _, error in results:
+                if error is not None:
+                    raise error
+            pages = []
+            first_pages = {}
+            total_elements = total_unfiltered_elements = 0
+            for chunk, (resp, _) in enumerate(results):
+                if resp['page']['totalPages']:
+                    first_pages[len(pages)] = resp
+                pages.extend((chunk, page) for page in range(resp['page']['totalPages']))
+                total_elements += resp['page']['totalElements']
+                total_unfiltered_elements = max(total_unfiltered_elements, resp['page']['totalUnfilteredElements'])
+            with self.lock:
+                self.first_pages = first_pages
+                self.total_elements = total_elements
+                self.total_unfiltered_elements = total_unfiltered_elements
+                self.pages = pages
+
+    def _retrieve(self, number, kwargs):
+        if self.pages is None:
+            self._plan(kwargs)
+        with self.lock:
+            if number >= len(self.pages):
+                return []
+            resp = self.first_pages.pop(number, None)
+            prefetch = self.prefetched.pop(number, None)
+            #  keep retrieving the following pages in background, forgetting the ones out of the window
+            window = range(number + 1, min(number + 1 + self.concurrency, len(self.pages)))
+            for other in list(self.prefetched):
+                if other not in window:
+                    del self.prefetched[other]
+            for other in window:
+                if other not in self.prefetched and other not in self.first_pages:
+                    self.prefetched[other] = _Prefetch(self.function, self._kwargs(other, kwargs))
+            if resp is None and prefetch is None:
+                prefetch = _Prefetch(self.function, self._kwargs(number, kwargs))
+        return resp['elements'] if resp is not None else prefetch.result()['elements']
+
+    def __call__(self, page=0, **kwargs):
+        """
+        Retrieve a page of the merged entities.
+
+        :param page: the number of the page to retrieve
+        :param kwargs: the other parameters of the function of the API manager, e.g. `size` and `fields`; the query
+            is ignored in favour of the chunks
+        :return: a dictionary like the response of the APIs, with the `elements` and the `page` metadata
+        """
+        kwargs.pop('query', None)
+        page = page or 0
+        added = None
+        if any(self.filters) and kwargs.get('fields') and not _covered(self.attribute, kwargs['fields']):
+            added = self.attribute.split('.')
+            kwargs['fields'] = list(kwargs['fields']) + [self.attribute]
+        elements = self._retrieve(page, kwargs)
+        keep = self.filters[self.pages[page][0]] if page < len(self.pages) else None
+        if keep is not None:
+            elements = [element for element in elements if keep(element)]
+        if added is not None:
+            for element in elements:
+                _strip(element, added)
+        size = kwargs.get('size') or 10
+        return {'elements': elements,
+                'page': {'size': size, 'totalElements': self.total_elements, 'totalPages': len(self.pages),
+                         'totalUnfilteredElements': self.total_unfiltered_elements, 'number': page}}
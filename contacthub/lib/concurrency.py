@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from multiprocessing.pool import ThreadPool
+
+
+def run_concurrently(function, arguments, concurrency=8):
+    """
+    Call a function once for each argument, with at most `concurrency` calls running at the same time.
+
+    :param function: a function called with a single argument
+    :param arguments: a list of arguments
+    :param concurrency: the maximum number of concurrent calls
+    :return: a list of tuples (result, exception), in the order of the arguments. For each call, either the result
+        or the exception raised is None
+    """
+    def call(argument):
+        try:
+            return function(argument), None
+        except Exception as e:
+            return None, e
+
+    if concurrency <= 1 or len(arguments) <= 1:
+        return [call(argument) for argument in arguments]
+    pool = ThreadPool(min(concurrency, len(arguments)))
+    try:
+        return pool.map(call, arguments)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+import threading
+from bisect import bisect_right
+from copy import deepcopy
+from datetime import datetime, timedelta
+
+from six.moves import queue
+
+from contacthub.lib.concurrency import run_concurrently
+from contacthub.lib.utils import parse_datetime
+from contacthub.models.customer import Customer
+from contacthub.models.query import between_
+
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def _second(value):
+    """
+    :param value: a datetime object
+    :return: the datetime truncated to the second, the precision of the dates sent in the queries
+    """
+    return value.replace(microsecond=0)
+
+
+def _get(element, path):
+    for key in path.split('.'):
+        if not isinstance(element, dict):
+            return None
+        element = element.get(key)
+    return element
+
+
+class CustomerScan(object):
+    """
+    Iterable over all the customers of a node, scanned by concurrent partitions of a date attribute.
+
+    The range of dates between `start` and `end` is split in partitions holding about the same number of customers,
+    found by sampling the count of customers of sub-ranges. Each partition is a query with a BETWEEN criterion,
+    paginated independently, so a partition never reaches deep page numbers and the partitions are retrieved
+    concurrently. The customers registered (or updated) after `end`, fixed when the scan is planned, are excluded, so
+    scanning by `registeredAt` returns a consistent snapshot of the customers existing when the scan started. Scanning
+    by `updatedAt`, the customers updated during the scan move after `end` and are skipped: synchronize them later with
+    `Node.sync_customers`.
+
+    The `cursor` attribute is a JSON serializable dictionary with the pages already delivered for each partition: pass
+    it to `Node.scan_customers` for restarting an interrupted scan without delivering again the pages completed.
+    """
+    #  the number of counts sampled in a range of dates for each round of the balancing
+    SAMPLES = 8
+    #  the maximum number of rounds of sampling for balancing the partitions
+    ROUNDS = 10
+
+    def __init__(self, node, partitions=4, by='registeredAt', start=None, end=None, query=None, size=None,
+                 fields=None, concurrency=None, raw=False, cursor=None):
+        """
+        :param node: the Node object of the customers
+        :param partitions: the number of partitions
+        :param by: the dotted path of the date attribute of the partitions, e.g. 'registeredAt' or 'updatedAt'
+        :param start: a datetime object, the lower bound of the dates scanned. Customers without the date attribute
+            are never scanned
+        :param end: a datetime object, the upper bound of the dates scanned. If None, the time the scan is planned
+        :param query: a Query object for filtering the customers, all the customers if None
+        :param size: the size of the pages containing customers
+        :param fields: a list of strings representing the properties to include in the response. The `id` and `by`
+            properties are always included
+        :param concurrency: the maximum number of partitions retrieved at the same time, `partitions` if None
+        :param raw: if True, yield the dictionaries returned by the APIs instead of Customer objects
+        :param cursor: the `cursor` of a previous scan to restart; `partitions`, `by`, `start` and `end` are taken from
+            the cursor
+        """
+        self.node = node
+        self.by = cursor['by'] if cursor else by
+        self.start = _second(start) if start else datetime(1970, 1, 1)
+        self.end = _second(end) if end else None
+        self.partitions = partitions
+        self.base_query = query
+        self.size = size
+        self.fields = list(fields) + [f for f in ('id', self.by) if f not in fields] if fields else None
+        self.concurrency = concurrency or partitions
+        self.raw = raw
+        self.field = Customer
+        for name in self.by.split('.'):
+            self.field = getattr(self.field, name)
+        self._cursor = deepcopy(cursor) if cursor else None
+        #  the number of pages delivered
+        self.pages = 0
+
+    @property
+    def cursor(self):
+        """
+        A JSON serializable dictionary representing the progress of this scan, None if the scan is not planned yet.
+        """
+        return deepcopy(self._cursor)
+
+    def _query(self, lower, upper):
+        criterion = between_(self.field, lower, upper)
+        if self.base_query is None or not self.base_query.inner_query:
+            return self.node.query(Customer).filter(criterion)
+        if self.base_query.inner_query['type'] == 'combined':
+            return self.base_query & self.node.query(Customer).filter(criterion)
+        return self.base_query.filter(criterion)
+
+    def count(self, lower, upper):
+        """
+        :param lower: a datetime object
+        :param upper: a datetime object
+        :return: the number of customers whose date attribute is between `lower` and `upper`
+        """
+        kwargs = {'query': self._query(lower, upper).compiled, 'size': 1, 'fields': ['id']}
+        return self.node.customer_api_manager.get_all(**kwargs)['page']['totalElements']
+
+    def _boundaries(self, start, end):
+        """
+        Find the dates splitting the customers between `start` and `end` in partitions with about the same number of
+        customers, sampling the counts of customers between `start` and dates inside the ranges containing a boundary.
+        """
+        total = self.count(start, end)
+        targets = [total * k / float(self.partitions) for k in range(1, self.partitions)]
+        tolerance = max(1, total // (self.partitions * 20))
+        counts = {start: 0, end: total}
+        for _ in range(self.ROUNDS):
+            times = sorted(counts)
+            cumulative = [counts[t] for t in times]
+            samples = set()
+            for target in targets:
+                i = min(max(bisect_right(cumulative, target) - 1, 0), len(times) - 2)
+                lower, upper = times[i], times[i + 1]
+                if cumulative[i + 1] - cumulative[i] <= tolerance or upper - lower <= timedelta(seconds=1):
+                    continue
+                step = (upper - lower).total_seconds() / (self.SAMPLES + 1)
+                for j in range(1, self.SAMPLES + 1):
+                    sample = _second(lower + timedelta(seconds=step * j))
+                    if lower < sample < upper:
+                        samples.add(sample)
+            if not samples:
+                break
+            samples = sorted(samples)
+            results = run_concurrently(lambda t: self.count(start, t), samples, self.concurrency)
+            for sample, (count, error) in zip(samples, results):
+                if error is not None:
+                    raise error
+                counts[sample] = count
+
+        times = sorted(counts)
+        cumulative = [counts[t] for t in times]
+        boundaries = []
+        for target in targets:
+            i = min(max(bisect_right(cumulative, target) - 1, 0), len(times) - 2)
+            lower, upper = times[i], times[i + 1]
+            fraction = (target - cumulative[i]) / float(max(cumulative[i + 1] - cumulative[i], 1))
+            boundary = _second(lower + timedelta(seconds=(upper - lower).total_seconds() * fraction))
+            boundaries.append(max([boundary] + boundaries))
+        return boundaries
+
+    def plan(self):
+        """
+        Split the dates in balanced partitions, if this scan has no cursor yet.
+
+        :return: the list of the partitions, dictionaries with the `lower` and `upper` dates, the next `page` to
+            deliver and whether the partition is `done`
+        """
+        if self._cursor is None:
+            end = self.end or _second(datetime.utcnow())
+            bounds = [self.start] + self._boundaries(self.start, end) + [end]
+            self._cursor = {'by': self.by, 'seen': [],
+                            'partitions': [{'lower': bounds[i].strftime(DATE_FORMAT),
+                                            'upper': bounds[i + 1].strftime(DATE_FORMAT), 'page': 0, 'done': False}
+                                           for i in range(len(bounds) - 1)]}
+        return self._cursor['partitions']
+
+    def _scan_partitions(self, pending, results, stop):
+        """
+        Retrieve the pages of the partitions taken from `pending`, putting them in `results` until all the partitions
+        are retrieved or the scan is stopped.
+        """
+        def put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        while not stop.is_set():
+            try:
+                index = pending.get_nowait()
+            except queue.Empty:
+                return
+            partition = self._cursor['partitions'][index]
+            try:
+                kwargs = {'query': self._query(parse_datetime(partition['lower']),
+                                               parse_datetime(partition['upper'])).compiled,
+                          'size': self.size, 'fields': self.fields, 'page': partition['page']}
+                while True:
+                    resp = self.node.customer_api_manager.get_all(**kwargs)
+                    last = resp['page']['number'] >= resp['page']['totalPages'] - 1
+                    if not put((index, kwargs['page'], resp['elements'], last, None)) or last:
+                        break
+                    kwargs['page'] += 1
+            except Exception as e:
+                put((index, None, None, True, e))
+                return
+
+    def __iter__(self):
+        partitions = self.plan()
+        boundaries = set(parse_datetime(p['lower']) for p in partitions) | \
+            set(parse_datetime(p['upper']) for p in partitions)
+        seen = set(self._cursor['seen'])
+        pending = queue.Queue()
+        remaining = 0
+        for index, partition in enumerate(partitions):
+            if not partition['done']:
+                pending.put(index)
+                remaining += 1
+        results = queue.Queue(maxsize=2 * self.concurrency)
+        stop = threading.Event()
+        threads = [threading.Thread(target=self._scan_partitions, args=(pending, results, stop))
+                   for _ in range(min(self.concurrency, remaining))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        try:
+            while remaining:
+                index, page, elements, last, error = results.get()
+                if error is not None:
+                    raise error
+                page_seen = []
+                for element in elements:
+                    value = _get(element, self.by)
+                    #  a customer whose date is a boundary may be returned by both the partitions sharing it
+                    if value and parse_datetime(value) in boundaries:
+                        if element['id'] in seen:
+                            continue
+                        seen.add(element['id'])
+                        page_seen.append(element['id'])
+                    yield element if self.raw else Customer(node=self.node, **element)
+                #  the cursor changes only once all the elements of a page have been delivered
+                self._cursor['seen'].extend(page_seen)
+                partitions[index]['page'] = page + 1
+                if last:
+                    partitions[index]['done'] = True
+                    remaining -= 1
+                self.pages += 1
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
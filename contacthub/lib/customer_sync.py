@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+from contacthub.lib.utils import parse_datetime
+from contacthub.models.customer import Customer
+
+
+class Watermark(object):
+    """
+    The point reached by an incremental synchronization of customers.
+
+    A watermark holds the time (UTC) when the synchronization that produced it started: every customer updated before
+    it has been delivered. It also holds the keys (id and updatedAt) of the customers delivered inside the overlap
+    window preceding it. The next synchronization starts from the watermark minus the overlap window, for tolerating
+    clock skew between the API servers and this machine, and discards the customers already delivered through these
+    keys.
+    """
+
+    def __init__(self, updated_at=None, seen=None):
+        """
+        :param updated_at: a datetime object before which all the updated customers have been delivered
+        :param seen: a dictionary mapping the customers id delivered inside the overlap window to their `updatedAt`
+        """
+        self.updated_at = parse_datetime(updated_at) if updated_at else None
+        self.seen = {} if seen is None else seen
+
+    @classmethod
+    def from_dict(cls, attributes=None):
+        """
+        Create a new Watermark from a dictionary generated by the `to_dict` method
+
+        :param attributes: a dictionary representing a Watermark
+        :return: a new Watermark object
+        """
+        attributes = attributes or {}
+        return cls(updated_at=attributes.get('updatedAt'), seen=dict(attributes.get('seen', {})))
+
+    def to_dict(self):
+        """
+        Convert this Watermark in a JSON serializable dictionary, for storing it between two synchronizations.
+
+        :return: a new dictionary representing this Watermark
+        """
+        return {'updatedAt': self.updated_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ") if self.updated_at else None,
+                'seen': dict(self.seen)}
+
+
+class CustomerSync(object):
+    """
+    Iterable over the customers of a node updated since a given watermark.
+
+    Iterating over this object fetches, page by page, the customers with `updatedAt` greater or equal than the
+    watermark minus the overlap window, skipping the customers already delivered. Once the iteration is over, the
+    `watermark` attribute contains the Watermark to use for the next synchronization: the time the iteration started,
+    since the pages are not sorted by `updatedAt`, so the customers updated while they are fetched may be missed. Before
+    the end of the iteration, the `watermark` stays the one the synchronization started from.
+    """
+
+    def __init__(self, node, since=None, overlap=timedelta(minutes=1), size=None, fields=None):
+        """
+        :param node: the Node object for retrieving customers data
+        :param since: a Watermark, a dictionary generated by `Watermark.to_dict`, a datetime or a date string. If None,
+            all the customers of the node are synchronized
+        :param overlap: a timedelta object representing the tolerated clock skew between consecutive synchronizations
+        :param size: the size of the pages containing customers
+        :param fields: a list of strings representing the properties to include in the response. The `id` and
+            `updatedAt` properties are always included
+        """
+        if since is None or isinstance(since, Watermark):
+            self.since = since or Watermark()
+        elif isinstance(since, dict):
+            self.since = Watermark.from_dict(since)
+        else:
+            self.since = Watermark(updated_at=since)
+        self.node = node
+        self.overlap = overlap
+        self.size = size
+        self.fields = fields
+        self.delivered = 0
+        self.skipped = 0
+        self._seen = dict(self.since.seen)
+        self._updated_at = self.since.updated_at
+
+    @property
+    def watermark(self):
+        """
+        The Watermark reached by this synchronization, to use as `since` parameter for the next one.
+
+        :return: a new Watermark object
+        """
+        if self._updated_at is None:
+            return Watermark(seen=dict(self._seen))
+        lower_bound = self._updated_at - self.overlap
+        return Watermark(updated_at=self._updated_at,
+                         seen=dict((k, v) for k, v in self._seen.items() if v and parse_datetime(v) >= lower_bound))
+
+    def __iter__(self):
+        #  taken before the first request: a customer updated later may be missed by this iteration
+        started = datetime.utcnow()
+        query = self.node.query(Customer)
+        if self.since.updated_at:
+            query = query.filter(Customer.updatedAt >= self.since.updated_at - self.overlap)
+        fields = self.fields
+        if fields:
+            fields = list(fields) + [field for field in ('id', 'updatedAt') if field not in fields]
+        customers = query.all(size=self.size, fields=fields)
+        for customer in customers.iter_all():
+            customer_id = customer.attributes['id']
+            updated_at = customer.attributes.get('updatedAt')
+            if customer_id in self._seen and self._seen[customer_id] == updated_at:
+                self.skipped += 1
+                continue
+            self._seen[customer_id] = updated_at
+            self.delivered += 1
+            yield customer
+        self._updated_at = started
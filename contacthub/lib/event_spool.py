@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+import base64
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from contacthub.errors.api_error import APIError
+from contacthub.lib.jobs import Checkpoint
+from contacthub.lib.utils import DateEncoder
+
+#  length of the payload, crc32 of the payload, timestamp of the append
+HEADER = struct.Struct('>IId')
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+
+def _segment_name(index):
+    return '%016d.log' % index
+
+
+def _is_permanent(error):
+    """
+    :param error: the exception raised sending an event
+    :return: True if sending the event again can't succeed, i.e. the APIs refused it with a 4xx status other than 429
+    """
+    return isinstance(error, APIError) and error.status_code is not None and 400 <= error.status_code < 500 and \
+        error.status_code != 429
+
+
+def _records(data, offset, end, limit=None):
+    """
+    Parse the records of a segment.
+
+    :param data: the bytes (or the mmap) of the segment
+    :param offset: the position of the first record
+    :param end: the position after the last byte to parse
+    :param limit: the maximum number of records to parse, all if None
+    :return: a list of tuples (position after the record, timestamp, payload). The parsing stops at the first record
+        incomplete or corrupted, e.g. by a crash while it was written
+    """
+    records = []
+    while offset + HEADER.size <= end and (limit is None or len(records) < limit):
+        length, crc, timestamp = HEADER.unpack(data[offset:offset + HEADER.size])
+        start = offset + HEADER.size
+        if start + length > end:
+            break
+        payload = data[start:start + length]
+        if zlib.crc32(payload) & 0xffffffff != crc:
+            break
+        offset = start + length
+        records.append((offset, timestamp, payload))
+    return records
+
+
+def _is_torn(data, offset, end):
+    """
+    :return: True if the record at the offset is incomplete, as if the process crashed while writing it, False if it's
+        complete but corrupted
+    """
+    if offset + HEADER.size > end:
+        return True
+    length = HEADER.unpack(data[offset:offset + HEADER.size])[0]
+    return offset + HEADER.size + length > end
+
+
+class EventSpool(object):
+    """
+    Durable write-ahead queue of the events to post, stored in append-only segment files in a local directory.
+
+    `append` writes an event at the end of the active segment and returns without calling the APIs; a background
+    thread reads the events from the segments through memory-mapped files and posts them in order. The position of
+    the next event to post is saved in a checkpoint file after every batch: after a crash or a restart, the events not
+    acknowledged are posted again (at-least-once delivery), so an event may be posted twice. The segments fully
+    posted are deleted.
+
+    The fsync policy sets the durability of `append`:
+
+    - 'always': the segment is flushed to disk before `append` returns, the events survive a power loss
+    - 'interval': the events are written to the operating system at once, and flushed to disk at most every
+      `fsync_interval` seconds: the events survive a crash of the process, the last ones may be lost on a power loss
+    - 'never': the events are written to the operating system, never explicitly flushed to disk
+
+    An event refused by the APIs with a client error (4xx, other than 429) is moved in the `dead.ndjson` file of the
+    directory with the error; on the other errors, the event is posted again after `retry_delay` seconds, doubled at
+    each consecutive failure up to `max_retry_delay`. A segment is never deleted with bytes after its last valid
+    record: the bytes from a corrupted record to the end of the segment, which can't be split in events, are moved
+    in `dead.ndjson` too, encoded in base64 under `data`. Only an incomplete record at the end of the last segment,
+    left by a crash while it was written, is discarded.
+    """
+
+    def __init__(self, node, directory, fsync='interval', fsync_interval=1.0, segment_size=16 * 1024 * 1024,
+                 batch_size=100, retry_delay=0.5, max_retry_delay=30.0, start=True):
+        """
+        :param node: the Node object posting the events
+        :param directory: the directory of the segment files, created if it doesn't exist
+        :param fsync: 'always', 'interval' or 'never'
+        :param fsync_interval: the maximum seconds between two flushes to disk with the 'interval' policy
+        :param segment_size: the size in bytes after which a new segment is started
+        :param batch_size: the number of events posted between two checkpoints
+        :param retry_delay: the seconds waited before posting again an event after an error
+        :param max_retry_delay: the maximum seconds waited between two attempts
+        :param start: if True, start the background thread posting the events
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("Unknown fsync policy %s, choose one of %s" % (fsync, ', '.join(FSYNC_POLICIES)))
+        self.node = node
+        self.directory = directory
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.segment_size = segment_size
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.appended = 0
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+        self.errors = 0
+        self.last_error = None
+        self.oldest = None
+        self.last_fsync = time.time()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.checkpoint = Checkpoint(os.path.join(directory, 'ack.json'))
+        self._recover()
+        self.thread = None
+        if start:
+            self.start()
+
+    def _path(self, index):
+        return os.path.join(self.directory, _segment_name(index))
+
+    def _recover(self):
+        """
+        Load the position of the next event to post, delete the segments already posted, truncate a record partially
+        written at the end of the last segment and count the events still to post.
+        """
+        self.segments = sorted(int(name[:-4]) for name in os.listdir(self.directory)
+                               if name.endswith('.log') and name[:-4].isdigit())
+        ack = self.checkpoint.load() or {}
+        self.ack_segment = ack.get('segment', self.segments[0] if self.segments else 0)
+        self.ack_offset = ack.get('offset', 0)
+        for index in [index for index in self.segments if index < self.ack_segment]:
+            os.remove(self._path(index))
+            self.segments.remove(index)
+        if not self.segments:
+            self.segments = [self.ack_segment]
+        if self.segments[0] != self.ack_segment:
+            self.ack_segment, self.ack_offset = self.segments[0], 0
+        self.pending = 0
+        self.pending_bytes = 0
+        for index in self.segments:
+            with open(self._path(index), 'ab+') as f:
+                f.seek(0)
+                data = f.read()
+                offset = self.ack_offset if index == self.ack_segment else 0
+                records = _records(data, offset, len(data))
+                end = records[-1][0] if records else offset
+                if index == self.segments[-1] and end < len(data):
+                    if not _is_torn(data, end, len(data)):
+                        self._dead_tail(index, data, end)
+                    f.truncate(end)
+                if records and self.oldest is None:
+                    self.oldest = records[0][1]
+                self.pending += len(records)
+                self.pending_bytes += end - offset
+        self.active = open(self._path(self.segments[-1]), 'ab')
+
+    def append(self, event):
+        """
+        Write an event at the end of the spool, for posting it later. An event without a `date` is dated now, otherwise
+        the APIs would date it when it is posted.
+
+        :param event: a dictionary representing the body of the event
+        """
+        if not event.get('date'):
+            event = dict(event, date=datetime.utcnow())
+        payload = json.dumps(event, cls=DateEncoder).encode('utf-8')
+        now = time.time()
+        record = HEADER.pack(len(payload), zlib.crc32(payload) & 0xffffffff, now) + payload
+        with self.lock:
+            if self.active.tell() and self.active.tell() + len(record) > self.segment_size:
+                self._rotate()
+            self.active.write(record)
+            self.active.flush()
+            if self.fsync == 'always' or (self.fsync == 'interval' and now - self.last_fsync >= self.fsync_interval):
+                os.fsync(self.active.fileno())
+                self.last_fsync = now
+            self.appended += 1
+            self.pending += 1
+            self.pending_bytes += len(record)
+            if self.oldest is None:
+                self.oldest = now
+        self.wakeup.set()
+
+    def _rotate(self):
+        if self.fsync != 'never':
+            os.fsync(self.active.fileno())
+        self.active.close()
+        self.segments.append(self.segments[-1] + 1)
+        self.active = open(self._path(self.segments[-1]), 'ab')
+
+    def _read(self):
+        """
+        Read the next batch of events to post, from the acknowledged position.
+
+        :return: a tuple (segment index, list of records). The list is empty if there are no events to post
+        """
+        while True:
+            with self.lock:
+                segment = self.ack_segment
+                last = self.segments[-1]
+            path = self._path(segment)
+            size = os.path.getsize(path)
+            if self.ack_offset < size:
+                with open(path, 'rb') as f:
+                    data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+                    try:
+                        records = _records(data, self.ack_offset, size, self.batch_size)
+                    finally:
+                        data.close()
+                if records:
+                    return segment, records
+            #  the active segment may end with a record still being written, a previous one is never written again
+            if segment == last:
+                return segment, []
+            if self.ack_offset < size:
+                with open(path, 'rb') as f:
+                    self._dead_tail(segment, f.read(), self.ack_offset)
+            #  the segment is fully posted: move to the next one and delete it
+            with self.lock:
+                self.ack_segment = self.segments[self.segments.index(segment) + 1]
+                self.ack_offset = 0
+                self.checkpoint.save({'segment': self.ack_segment, 'offset': 0})
+                self.segments.remove(segment)
+            os.remove(path)
+
+    def _dead_tail(self, index, data, offset):
+        """
+        Move in the dead letters the bytes of a segment from a corrupted record to the end.
+        """
+        with open(os.path.join(self.directory, 'dead.ndjson'), 'ab') as f:
+            f.write(json.dumps({'segment': _segment_name(index), 'offset': offset,
+                                'data': base64.b64encode(data[offset:]).decode('ascii'),
+                                'error': 'Corrupted record'}).encode('utf-8'))
+            f.write(b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.failed += 1
+
+    def _dead_letter(self, payload, error):
+        with open(os.path.join(self.directory, 'dead.ndjson'), 'ab') as f:
+            f.write(json.dumps({'event': json.loads(payload.decode('utf-8')), 'error': str(error)}).encode('utf-8'))
+            f.write(b'\n')
+
+    def send_pending(self):
+        """
+        Post the events in the spool until it is empty or an error requires to wait before posting again.
+
+        :return: the exception that stopped the posting, None if the spool is empty
+        """
+        with self.send_lock:
+            while True:
+                segment, records = self._read()
+                if not records:
+                    return None
+                self.oldest = records[0][1]
+                start = position = self.ack_offset
+                posted = 0
+                error = None
+                for end, timestamp, payload in records:
+                    try:
+                        self.node.event_api_manager.post(body=json.loads(payload.decode('utf-8')))
+                        self.sent += 1
+                    except Exception as e:
+                        if not _is_permanent(e):
+                            error = e
+                            break
+                        self._dead_letter(payload, e)
+                        self.failed += 1
+                    posted += 1
+                    position = end
+                if error is not None:
+                    self.retries += 1
+                with self.lock:
+                    self.ack_offset = position
+                    self.pending -= posted
+                    self.pending_bytes -= position - start
+                    self.checkpoint.save({'segment': segment, 'offset': position})
+                    if not self.pending:
+                        self.oldest = None
+                    elif posted < len(records):
+                        self.oldest = records[posted][1]
+                if error is not None:
+                    return error
+
+    def _run(self):
+        delay = self.retry_delay
+        while not self.stopping.is_set():
+            self.wakeup.clear()
+            try:
+                error = self.send_pending()
+                if self.fsync == 'interval' and time.time() - self.last_fsync >= self.fsync_interval:
+                    with self.lock:
+                        os.fsync(self.active.fileno())
+                        self.last_fsync = time.time()
+            except Exception as e:
+                #  e.g. the checkpoint can't be written: the thread must survive and try again
+                error = e
+                with self.lock:
+                    self.errors += 1
+            if error is not None:
+                self.last_error = '%s: %s' % (type(error).__name__, error)
+            if error is None:
+                delay = self.retry_delay
+                self.wakeup.wait(self.fsync_interval)
+            else:
+                self.stopping.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+    def start(self):
+        """
+        Start the background thread posting the events.
+        """
+        if self.thread is None:
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def flush(self, timeout=None):
+        """
+        Wait until all the events in the spool are posted.
+
+        :param timeout: the maximum seconds to wait, None for waiting forever
+        :return: True if the spool is empty, False if the timeout expired
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self.pending:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            self.wakeup.set()
+            time.sleep(0.01)
+        return True
+
+    def close(self):
+        """
+        Stop the background thread and flush the active segment to disk. The events not posted yet are kept in the
+        spool and posted when a spool is opened again on the same directory.
+        """
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        with self.lock:
+            if not self.active.closed:
+                self.active.flush()
+                if self.fsync != 'never':
+                    os.fsync(self.active.fileno())
+                self.active.close()
+
+    @property
+    def metrics(self):
+        """
+        A dictionary with the state of the spool: the `depth` (events to post) and its `depth_bytes`, the `lag` (seconds
+        since the oldest event to post was appended), the number of `segments`, and the events `appended`, `sent`,
+        `failed` (moved to the dead letters) and the `retries` since the spool was opened. `errors` counts the failures
+        of the sender not caused by an event (e.g. writing the checkpoint), and `last_error` describes the last error.
+        """
+        with self.lock:
+            oldest = self.oldest
+            return {'depth': self.pending, 'depth_bytes': self.pending_bytes,
+                    'lag': time.time() - oldest if oldest is not None and self.pending else 0.0,
+                    'segments': len(self.segments), 'appended': self.appended, 'sent': self.sent,
+                    'failed': self.failed, 'retries': self.retries, 'errors': self.errors,
+                    'last_error': self.last_error}
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+import csv
+import datetime
+import io
+import json
+import os
+from collections import OrderedDict
+
+from six import PY2, integer_types, string_types
+
+from contacthub.lib.frame import build_columns, fill_columns
+from contacthub.lib.jobs import NDJSONWriter
+from contacthub.lib.utils import DateEncoder, parse_datetime
+
+FORMATS = ('ndjson', 'csv', 'parquet')
+
+
+def flatten(element, prefix='', flat=None):
+    """
+    Flatten a dictionary returned by the APIs in a dictionary mapping the dotted path of each value to the value, e.g.
+    {'base': {'contacts': {'email': 'a@b.c'}}} in {'base.contacts.email': 'a@b.c'}. Lists are not flattened.
+
+    :param element: a dictionary
+    :param prefix: the dotted path of the dictionary
+    :param flat: the OrderedDict to fill, a new one if None
+    :return: an OrderedDict mapping each dotted path to its value
+    """
+    flat = OrderedDict() if flat is None else flat
+    for key, value in element.items():
+        path = prefix + key
+        if isinstance(value, dict) and value:
+            flatten(value, path + '.', flat)
+        else:
+            flat[path] = value
+    return flat
+
+
+def _cell(value):
+    """
+    :return: the value of a CSV or Parquet cell: lists and dictionaries are encoded in JSON
+    """
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, cls=DateEncoder)
+    return value
+
+
+class CSVWriter(object):
+    """
+    Writer of records in a CSV file, with a column for each dotted field. Lists and dictionaries are encoded in JSON.
+    The fields are required for a new file, while a file resumed keeps the columns of its header.
+
+    Like NDJSONWriter, its position can be recorded in the checkpoints of an ExportJob.
+    """
+
+    def __init__(self, path, fields=None):
+        """
+        :param path: the path of the output file
+        :param fields: a list of strings representing the dotted fields of the columns. It can be None only for
+            resuming a file, whose header lists the fields
+        """
+        self.path = path
+        self.fields = list(fields) if fields else None
+        self.getters = None
+        self.file = None
+        #  the rows are formatted in a buffer, then written encoded in the file
+        self.buffer = io.BytesIO() if PY2 else io.StringIO()
+        self.csv_writer = csv.writer(self.buffer, lineterminator='\n')
+
+    def open(self, position=None):
+        """
+        :param position: the position returned by `commit` to resume from, None for writing a new file
+        """
+        if position is None or not os.path.exists(self.path):
+            if not self.fields:
+                raise ValueError("The 'csv' format requires the list of the fields to export")
+            self.file = open(self.path, 'wb')
+            return
+        self.file = open(self.path, 'r+b')
+        self.file.truncate(position)
+        self.file.seek(0)
+        header = self.file.readline()
+        if header:
+            self.fields = next(csv.reader([header.decode('utf-8')]))
+            self._set_getters()
+        self.file.seek(position)
+
+    def _set_getters(self):
+        self.getters = [tuple(field.split('.')) for field in self.fields]
+
+    def _write_row(self, row):
+        if PY2:
+            row = [cell.encode('utf-8') if isinstance(cell, unicode) else cell for cell in row]  # noqa: F821
+        self.csv_writer.writerow(row)
+        value = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.file.write(value if PY2 else value.encode('utf-8'))
+
+    def write(self, record):
+        """
+        :param record: a dictionary, like the ones returned by the APIs
+        """
+        if self.getters is None:
+            self._set_getters()
+            self._write_row(self.fields)
+        row = []
+        for keys in self.getters:
+            value = record
+            for key in keys:
+                value = value.get(key) if isinstance(value, dict) else None
+            row.append('' if value is None else _cell(value))
+        self._write_row(row)
+
+    def commit(self):
+        """
+        Flush the records written to disk.
+
+        :return: the position to resume from
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+#  the kinds of the Parquet columns, mapped to the pyarrow types by ParquetWriter
+KINDS = ('string', 'double', 'int', 'bool', 'timestamp')
+
+
+def _kind(value):
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, integer_types + (float,)):
+        return 'double'
+    if isinstance(value, datetime.datetime):
+        return 'timestamp'
+    return 'string'
+
+
+def infer_kind(values):
+    """
+    Infer the kind of a Parquet column from its values. The numbers are doubles, like the numbers of JSON, so a column
+    of integers can later hold fractional values.
+
+    :param values: a list of cell values
+    :return: one of KINDS: the kind of all the values not None if they have the same one, 'string' otherwise or if
+        there are no values
+    """
+    kinds = set(_kind(value) for value in values if value is not None)
+    return kinds.pop() if len(kinds) == 1 else 'string'
+
+
+def convert_column(values, kind):
+    """
+    Convert the cell values of a column to the values of a Parquet column of a kind.
+
+    :param values: a list of cell values
+    :param kind: one of KINDS
+    :return: a new list of values. The values of a 'string' column are converted to text, numbers and dates included,
+        the date strings of a 'timestamp' column are parsed; a value not fitting the other kinds raises a ValueError
+    """
+    converted = []
+    encoder = DateEncoder()
+    for value in values:
+        if value is None:
+            converted.append(None)
+        elif kind == 'string':
+            if isinstance(value, datetime.date):
+                value = encoder.default(value)
+            converted.append(value if isinstance(value, string_types) else json.dumps(value))
+        elif kind == 'double' and _kind(value) == 'double':
+            converted.append(float(value))
+        elif kind == 'int' and _kind(value) == 'double' and float(value).is_integer():
+            converted.append(int(value))
+        elif kind == 'bool' and _kind(value) == 'bool':
+            converted.append(value)
+        elif kind == 'timestamp' and isinstance(value, (datetime.date,) + string_types):
+            converted.append(parse_datetime(value))
+        else:
+            raise ValueError('The value %r is not a %s' % (value, kind))
+    return converted
+
+
+class ParquetWriter(object):
+    """
+    Writer of records in a Parquet file, with a column for each dotted field, buffering the records in columns and
+    writing a row group for every `batch_size` records. Lists and dictionaries are encoded in JSON.
+
+    The kind of each column (see KINDS) is given in `schema`, or inferred from the first row group with `infer_kind`.
+    The later row groups are converted to the same kinds: a column of strings, like the ones without values in the
+    first row group, holds every later value as text. A value not fitting a column of another kind raises a ValueError:
+    pass its kind in `schema` when the first records are not representative.
+    The pyarrow package is an optional dependency and must be installed separately. A Parquet file can't be resumed.
+    """
+
+    def __init__(self, path, fields, batch_size=10000, schema=None):
+        """
+        :param path: the path of the output file
+        :param fields: a list of strings representing the dotted fields of the columns
+        :param batch_size: the number of records of each row group
+        :param schema: a dictionary mapping some of the fields to their kind, one of KINDS. The kind of the other fields
+            is inferred
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("The 'parquet' format requires the pyarrow package")
+        if not fields:
+            raise ValueError("The 'parquet' format requires the list of the fields to export")
+        schema = dict(schema or {})
+        for field, kind in schema.items():
+            if kind not in KINDS:
+                raise ValueError("Unknown kind %s of the field %s, choose one of %s" % (kind, field, ', '.join(KINDS)))
+        self.pyarrow = pyarrow
+        self.types = {'string': pyarrow.string(), 'double': pyarrow.float64(), 'int': pyarrow.int64(),
+                      'bool': pyarrow.bool_(), 'timestamp': pyarrow.timestamp('us')}
+        self.path = path
+        self.batch_size = batch_size
+        self.columns = build_columns([], fields)
+        self.kinds = schema
+        self.buffered = 0
+        self.schema = None
+        self.writer = None
+
+    def open(self, position=None):
+        """
+        :param position: must be None, a Parquet file is always written from the beginning
+        """
+        if position is not None:
+            raise ValueError('A Parquet file cannot be resumed')
+
+    def write(self, record):
+        """
+        :param record: a dictionary, like the ones returned by the APIs
+        """
+        fill_columns(self.columns, [record])
+        self.buffered += 1
+        if self.buffered >= self.batch_size:
+            self._write_batch()
+
+    def _write_batch(self):
+        if not self.buffered:
+            return
+        pyarrow = self.pyarrow
+        cells = OrderedDict((field, [_cell(value) for value in column]) for field, column in self.columns.items())
+        if self.schema is None:
+            for field, values in cells.items():
+                self.kinds.setdefault(field, infer_kind(values))
+            self.schema = pyarrow.schema([(field, self.types[self.kinds[field]]) for field in cells])
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+        arrays = []
+        for field, values in cells.items():
+            kind = self.kinds[field]
+            try:
+                values = convert_column(values, kind)
+            except ValueError as e:
+                raise ValueError('%s in the column %s: pass its kind in the schema of the writer' % (e, field))
+            arrays.append(pyarrow.array(values, type=self.types[kind]))
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+        for column in self.columns.values():
+            del column[:]
+        self.buffered = 0
+
+    def commit(self):
+        """
+        Write the records buffered in a row group.
+        """
+        self._write_batch()
+
+    def close(self):
+        self._write_batch()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def get_writer(path, format='ndjson', fields=None):
+    """
+    Create the writer of a format.
+
+    :param path: the path of the output file
+    :param format: 'ndjson', 'csv' or 'parquet'
+    :param fields: a list of strings representing the dotted fields of the columns, required for 'csv' and 'parquet'
+    :return: an NDJSONWriter, CSVWriter or ParquetWriter object
+    """
+    if format == 'ndjson':
+        return NDJSONWriter(path)
+    if format == 'csv':
+        return CSVWriter(path, fields=fields)
+    if format == 'parquet':
+        return ParquetWriter(path, fields=fields)
+    raise ValueError("Unknown format %s, choose one of %s" % (format, ', '.join(FORMATS)))
+
+
+def export_elements(elements, path, format='ndjson', fields=None):
+    """
+    Write the dictionaries returned by the APIs in a file, without creating entity objects.
+
+    :param elements: an iterable of dictionaries
+    :param path: the path of the output file
+    :param format: 'ndjson', 'csv' or 'parquet'
+    :param fields: a list of strings representing the dotted fields of the columns of 'csv' and 'parquet'
+    :return: the number of elements written
+    """
+    writer = get_writer(path, format=format, fields=fields)
+    writer.open()
+    count = 0
+    try:
+        for element in elements:
+            writer.write(element)
+            count += 1
+        writer.commit()
+    finally:
+        writer.close()
+    return count
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+
+FORMATS = ('columns', 'pandas', 'arrow')
+
+
+def fill_columns(columns, elements):
+    """
+    Append the values of the given elements to the columns, reading the dotted fields straight from the dictionaries
+    returned by the APIs. A field missing in an element is read as None.
+
+    :param columns: an OrderedDict mapping each dotted field (e.g. 'base.contacts.email') to the list of its values
+    :param elements: an iterable of dictionaries representing entities, like the `elements` of a page of the APIs
+    """
+    getters = [(tuple(field.split('.')), column) for field, column in columns.items()]
+    for element in elements:
+        for keys, column in getters:
+            value = element
+            for key in keys:
+                if isinstance(value, dict):
+                    value = value.get(key)
+                else:
+                    value = None
+                    break
+            column.append(value)
+
+
+def build_columns(elements, fields):
+    """
+    Create a columnar representation of the given elements, containing a list of values for each field.
+
+    :param elements: an iterable of dictionaries representing entities, like the `elements` of a page of the APIs
+    :param fields: a list of strings representing the dotted fields to extract
+    :return: an OrderedDict mapping each field to the list of its values
+    """
+    columns = OrderedDict((field, []) for field in fields)
+    fill_columns(columns, elements)
+    return columns
+
+
+def to_frame(columns, format='columns'):
+    """
+    Convert a columnar representation in the requested format.
+
+    :param columns: an OrderedDict mapping each field to the list of its values
+    :param format: 'columns' for the OrderedDict itself, 'pandas' for a pandas DataFrame, 'arrow' for a pyarrow Table.
+        pandas and pyarrow are optional dependencies and must be installed separately
+    :return: the columns in the requested format
+    """
+    if format == 'columns':
+        return columns
+    if format == 'pandas':
+        try:
+            import pandas
+        except ImportError:
+            raise ImportError("The 'pandas' format requires the pandas package")
+        return pandas.DataFrame(columns, columns=list(columns))
+    if format == 'arrow':
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError("The 'arrow' format requires the pyarrow package")
+        return pyarrow.Table.from_arrays([pyarrow.array(column) for column in columns.values()],
+                                         names=list(columns))
+    raise ValueError("Unknown format %s, choose one of %s" % (format, ', '.join(FORMATS)))
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import threading
+
+
+class RequestInfo(object):
+    """
+    The information about a request to the APIs, given to the hooks of a Workspace.
+    """
+
+    __slots__ = ('method', 'url', 'endpoint', 'status', 'request_bytes', 'response_bytes', 'serialize_time',
+                 'network_time', 'decode_time', 'error')
+
+    def __init__(self, method, url, endpoint):
+        """
+        :param method: the HTTP method of the request, lowercase
+        :param url: the URL of the request
+        :param endpoint: the template of the endpoint called, with the ids replaced by {id} (e.g. /customers/{id}/jobs)
+        """
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint
+        self.status = None
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.serialize_time = 0.0
+        self.network_time = 0.0
+        self.decode_time = 0.0
+        self.error = None
+
+    @property
+    def total_time(self):
+        """
+        The seconds spent for serializing the body, waiting for the response and decoding it.
+        """
+        return self.serialize_time + self.network_time + self.decode_time
+
+    def __repr__(self):
+        return 'RequestInfo(%s %s, status=%s)' % (self.method.upper(), self.endpoint, self.status)
+
+
+class Hooks(object):
+    """
+    The functions called around every request to the APIs. Each function receives a RequestInfo object:
+
+    - `before_request`: after the body has been serialized, before sending the request
+    - `after_response`: after the response has been received and decoded, whatever its status code
+    - `on_error`: if the status code of the response is not 2xx or the request raised an exception, in `error`
+
+    The lists of functions are replaced instead of being modified, so functions can be added or removed while other
+    threads are firing the events.
+    """
+    EVENTS = ('before_request', 'after_response', 'on_error')
+
+    def __init__(self):
+        self.before_request = []
+        self.after_response = []
+        self.on_error = []
+        self.lock = threading.Lock()
+
+    def add(self, event, function):
+        """
+        Register a function called on the given event.
+
+        :param event: one of Hooks.EVENTS
+        :param function: a function accepting a RequestInfo object
+        """
+        if event not in self.EVENTS:
+            raise ValueError("Unknown event %s, choose one of %s" % (event, ', '.join(self.EVENTS)))
+        with self.lock:
+            setattr(self, event, getattr(self, event) + [function])
+
+    def remove(self, event, function):
+        """
+        Unregister a function from the given event.
+
+        :param event: one of Hooks.EVENTS
+        :param function: a function previously registered
+        """
+        with self.lock:
+            functions = list(getattr(self, event))
+            functions.remove(function)
+            setattr(self, event, functions)
+
+    def fire(self, event, info):
+        """
+        Call all the functions registered on the given event.
+
+        :param event: one of Hooks.EVENTS
+        :param info: the RequestInfo object of the request
+        """
+        for function in getattr(self, event):
+            function(info)
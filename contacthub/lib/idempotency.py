@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from requests import ConnectTimeout, RequestException
+
+from contacthub.errors.api_error import APIError
+from contacthub.lib.utils import DateEncoder
+
+
+def event_key(body):
+    """
+    Compute the idempotency key of an event from its canonical body: the customer (its id, or the bringBackProperties
+    of an anonymous event), the type, the date and the properties. The other attributes, like the context, don't
+    change the key.
+
+    :param body: a dictionary representing the body of the event
+    :return: a string with the hexadecimal SHA-256 of the canonical JSON of the event
+    """
+    canonical = [body.get('customerId') or body.get('bringBackProperties'), body.get('type'), body.get('date'),
+                 body.get('properties')]
+    serialized = json.dumps(canonical, cls=DateEncoder, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+def _is_retryable(error, keyed):
+    """
+    :param error: the exception raised posting an event
+    :param keyed: True if the request carries the idempotency key, so the APIs can recognize a request already received
+    :return: True if posting again the event may succeed without posting it twice. A 429 or a connection timeout mean
+        the event was not received, so they are always retried; after the other network errors, timeouts and 5xx
+        statuses the event may have been received, so they are retried only if the request carries the key
+    """
+    if isinstance(error, APIError):
+        status = error.status_code
+        return status == 429 or (keyed and status is not None and status >= 500)
+    if isinstance(error, ConnectTimeout):
+        return True
+    return keyed and isinstance(error, RequestException)
+
+
+class EventDeduplicator(object):
+    """
+    Idempotency layer for the events posted by a node.
+
+    Every event gets an idempotency key, the hash of its canonical body (see `event_key`). The keys of the events
+    posted are kept in a LRU set of `capacity` keys: an event whose key is in the set, or is being posted by another
+    thread, is a duplicate and is dropped without calling the APIs. A key is added only when its event is posted
+    successfully, so an event that failed can be posted again.
+
+    The events without a `date` are never dropped, since the APIs date them when they are received: two equal events
+    without a date are two different actions of the customer.
+
+    If `header` is set, the key is sent in that header of the requests, so the APIs can recognize a retry of a request
+    they already received; the events without a date get a random key, the same for all their attempts. After a 429
+    or a connection timeout, the POST request is sent again up to `retries` times. After a failure that may have
+    reached the APIs (other network errors, read timeouts, 5xx statuses), it's sent again only if `header` is set:
+    without the key, a retry could post the event twice.
+    """
+
+    def __init__(self, capacity=100000, header=None, retries=2, retry_delay=0.2):
+        """
+        :param capacity: the maximum number of keys remembered
+        :param header: the name of the header carrying the key, e.g. 'Idempotency-Key'. If None, the key is not sent
+        :param retries: the maximum number of times a POST request is sent again after a transient error, see the
+            class documentation for the errors retried without a header
+        :param retry_delay: the seconds waited before the first retry, doubled at each following one
+        """
+        self.capacity = capacity
+        self.header = header
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.keys = OrderedDict()
+        self.in_flight = set()
+        self.lock = threading.Lock()
+        self.posted = 0
+        self.duplicates = 0
+        self.retried = 0
+
+    def claim(self, key):
+        """
+        :param key: the idempotency key of an event about to be posted
+        :return: True if the event must be posted, False if it is a duplicate
+        """
+        with self.lock:
+            if key in self.in_flight or key in self.keys:
+                if key in self.keys:
+                    self.keys[key] = self.keys.pop(key)
+                self.duplicates += 1
+                return False
+            self.in_flight.add(key)
+            return True
+
+    def release(self, key, posted):
+        """
+        :param key: the idempotency key of a claimed event
+        :param posted: True if the event was posted, False if it failed and may be posted again
+        """
+        with self.lock:
+            self.in_flight.discard(key)
+            if posted:
+                self.posted += 1
+                self.keys[key] = True
+                while len(self.keys) > self.capacity:
+                    self.keys.popitem(last=False)
+
+    def post(self, function, body, headers):
+        """
+        Post an event unless it is a duplicate, retrying the transient errors.
+
+        :param function: the function sending the POST request, called with the body and the headers
+        :param body: a dictionary representing the body of the event
+        :param headers: the headers of the request, copied before adding the idempotency key
+        :return: the result of the function, None if the event is a duplicate
+        """
+        dated = bool(body.get('date'))
+        key = event_key(body) if dated else uuid.uuid4().hex
+        if dated and not self.claim(key):
+            return None
+        if self.header is not None:
+            headers = dict(headers)
+            headers[self.header] = key
+        delay = self.retry_delay
+        attempt = 0
+        try:
+            while True:
+                try:
+                    result = function(body, headers)
+                    break
+                except (APIError, RequestException) as e:
+                    if attempt >= self.retries or not _is_retryable(e, self.header is not None):
+                        raise
+                with self.lock:
+                    self.retried += 1
+                attempt += 1
+                time.sleep(delay)
+                delay *= 2
+        except Exception:
+            if dated:
+                self.release(key, posted=False)
+            raise
+        if dated:
+            self.release(key, posted=True)
+        else:
+            with self.lock:
+                self.posted += 1
+        return result
+
+    @property
+    def counters(self):
+        """
+        A dictionary with the events `posted`, the `duplicates` dropped, the `retries` sent and their rates over the
+        events received.
+        """
+        with self.lock:
+            received = self.posted + self.duplicates
+            return {'posted': self.posted, 'duplicates': self.duplicates, 'retries': self.retried,
+                    'duplicate_rate': float(self.duplicates) / received if received else 0.0,
+                    'retry_rate': float(self.retried) / self.posted if self.posted else 0.0}
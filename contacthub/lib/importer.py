@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import json
+import threading
+from collections import OrderedDict
+
+from six import PY2, string_types
+from six.moves import queue
+
+from contacthub.lib.utils import DateEncoder
+
+FORMATS = ('ndjson', 'csv')
+
+
+class ColumnMapping(object):
+    """
+    A mapping from the columns of an input file to the dotted paths of the attributes of the records to import,
+    compiled once and applied to every row::
+
+        mapping = ColumnMapping({'email': 'base.contacts.email', 'name': 'base.firstName', 'id': 'externalId',
+                                 'points': ('extended.points', int)})
+
+    A column can be mapped to a path, or to a tuple with a path and a function converting the value. The columns not
+    mapped and the empty values are discarded.
+    """
+
+    def __init__(self, mapping):
+        """
+        :param mapping: a dictionary mapping each column to a dotted path, or to a tuple (dotted path, converter)
+        """
+        self.mapping = mapping
+        self.columns = []
+        for column, target in mapping.items():
+            path, converter = (target, None) if isinstance(target, string_types) else target
+            keys = path.split('.')
+            self.columns.append((column, tuple(keys[:-1]), keys[-1], converter))
+
+    def apply(self, row):
+        """
+        :param row: a dictionary mapping the columns to their values
+        :return: a new dictionary with the values at the mapped paths. If a converter raises an error, it is raised
+            as a ValueError naming the column
+        """
+        record = {}
+        for column, parents, key, converter in self.columns:
+            value = row.get(column)
+            if value is None or value == '':
+                continue
+            if converter is not None:
+                try:
+                    value = converter(value)
+                except Exception as e:
+                    raise ValueError('Invalid value %r of the column %s: %s' % (value, column, e))
+            target = record
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[key] = value
+        return record
+
+
+def _get(record, path):
+    for key in path.split('.'):
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+    return record
+
+
+def read_ndjson(path):
+    """
+    Read a file with a JSON document for each line, one line at a time.
+
+    :param path: the path of the file
+    :return: a generator of tuples (line number, dictionary), skipping the empty lines. A line not containing a JSON
+        object is yielded with a ValueError instead of the dictionary
+    """
+    for number, record, _ in iter_ndjson(path):
+        yield number, record
+
+
+def iter_ndjson(path, offset=0, line=0):
+    """
+    Read a file with a JSON document for each line from a byte offset, e.g. for resuming an earlier read.
+
+    :param path: the path of the file
+    :param offset: the byte offset of the first line to read
+    :param line: the number of the lines before the offset
+    :return: a generator of tuples (line number, dictionary, offset after the line), skipping the empty lines. A line
+        not containing a JSON object is yielded with a ValueError instead of the dictionary
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for data in iter(f.readline, b''):
+            line += 1
+            if not data.strip():
+                continue
+            try:
+                record = json.loads(data.decode('utf-8'))
+                if not isinstance(record, dict):
+                    raise ValueError('The line is not a JSON object')
+            except ValueError as e:
+                record = ValueError(str(e))
+            yield line, record, f.tell()
+
+
+def read_csv(path):
+    """
+    Read a CSV file with a header, one row at a time.
+
+    :param path: the path of the file
+    :return: a generator of tuples (line number, dictionary mapping the columns of the header to the values)
+    """
+    if PY2:
+        with open(path, 'rb') as f:
+            for number, row in enumerate(csv.DictReader(f), 2):
+                yield number, dict((k.decode('utf-8'), v.decode('utf-8') if v is not None else v)
+                                   for k, v in row.items() if k is not None)
+        return
+    with io.open(path, encoding='utf-8', newline='') as f:
+        for number, row in enumerate(csv.DictReader(f), 2):
+            yield number, row
+
+
+class ImportResult(object):
+    """
+    The outcome of an import: the number of rows `read`, `imported` and `rejected`. The rejected rows are written in
+    the reject file, if any.
+    """
+
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.rejected = 0
+
+    @property
+    def counts(self):
+        return OrderedDict([('read', self.read), ('imported', self.imported), ('rejected', self.rejected)])
+
+    def __repr__(self):
+        return 'ImportResult(%s)' % dict(self.counts)
+
+
+class FileImporter(object):
+    """
+    Streaming importer of customers or events from NDJSON or CSV files.
+
+    The rows are read one at a time, mapped to records through a ColumnMapping and validated in batches: a batch of
+    valid records is put in a bounded queue, consumed by `concurrency` threads adding the records to the node. When
+    the writers fall behind, reading blocks on the full queue, so the memory used depends on the batch size and not on
+    the size of the file. Every rejected row (invalid, or failed when added) is written in the reject file, a JSON
+    document for each line with the `line` of the row, the `row` itself, the `stage` ('validation' or 'write') and the
+    `error`.
+    """
+
+    def __init__(self, node, mapping=None, entity='customer', required=(), validate=None, batch_size=500,
+                 concurrency=8, queue_size=None):
+        """
+        :param node: the Node object receiving the records
+        :param mapping: a ColumnMapping object or a dictionary for creating it. If None, the rows are imported as they
+            are, e.g. NDJSON files already containing customers
+        :param entity: 'customer' for adding the records with `node.add_customer`, 'event' with `node.add_event`
+        :param required: a list of dotted paths the records must have, e.g. ('externalId',)
+        :param validate: a function receiving a record and raising ValueError if it is not valid
+        :param batch_size: the number of records validated and queued together
+        :param concurrency: the number of threads adding the records
+        :param queue_size: the maximum number of batches waiting for the writers, `concurrency` if None
+        """
+        if entity not in ('customer', 'event'):
+            raise ValueError("Unknown entity %s, choose one of customer, event" % entity)
+        if mapping is not None and not isinstance(mapping, ColumnMapping):
+            mapping = ColumnMapping(mapping)
+        self.node = node
+        self.mapping = mapping
+        self.add = node.add_customer if entity == 'customer' else node.add_event
+        self.required = tuple(required)
+        self.validate = validate
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.queue_size = queue_size or concurrency
+        self.lock = threading.Lock()
+
+    def _reject(self, rejects, result, number, row, stage, error):
+        with self.lock:
+            result.rejected += 1
+            if rejects is not None:
+                rejects.write(json.dumps({'line': number, 'row': row, 'stage': stage, 'error': str(error)},
+                                         cls=DateEncoder) + u'\n')
+
+    def _validate_batch(self, batch, rejects, result):
+        """
+        Map and validate a batch of rows, rejecting the invalid ones.
+
+        :return: the list of tuples (line number, row, record) of the valid rows
+        """
+        valid = []
+        for number, row in batch:
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                record = self.mapping.apply(row) if self.mapping is not None else row
+                missing = [path for path in self.required if _get(record, path) in (None, '')]
+                if missing:
+                    raise ValueError('Missing required %s' % ', '.join(missing))
+                if self.validate is not None:
+                    self.validate(record)
+            except ValueError as e:
+                self._reject(rejects, result, number, None if isinstance(row, Exception) else row, 'validation', e)
+                continue
+            valid.append((number, row, record))
+        return valid
+
+    def _write(self, batches, rejects, result):
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            for number, row, record in batch:
+                try:
+                    self.add(**record)
+                except Exception as e:
+                    self._reject(rejects, result, number, row, 'write', e)
+                else:
+                    with self.lock:
+                        result.imported += 1
+
+    def run(self, path, format=None, rejects=None):
+        """
+        Import all the rows of a file.
+
+        :param path: the path of the input file
+        :param format: 'ndjson' or 'csv'. If None, it's taken from the extension of the file
+        :param rejects: the path of the reject file, None for discarding the rejected rows
+        :return: an ImportResult object
+        """
+        format = format or path.rsplit('.', 1)[-1].lower()
+        if format not in FORMATS:
+            raise ValueError("Unknown format %s, choose one of %s" % (format, ', '.join(FORMATS)))
+        rows = read_ndjson(path) if format == 'ndjson' else read_csv(path)
+        result = ImportResult()
+        reject_file = io.open(rejects, 'w', encoding='utf-8') if rejects is not None else None
+        batches = queue.Queue(maxsize=self.queue_size)
+        writers = [threading.Thread(target=self._write, args=(batches, reject_file, result))
+                   for _ in range(self.concurrency)]
+        for writer in writers:
+            writer.daemon = True
+            writer.start()
+        try:
+            batch = []
+            for number, row in rows:
+                result.read += 1
+                batch.append((number, row))
+                if len(batch) == self.batch_size:
+                    batches.put(self._validate_batch(batch, reject_file, result))
+                    batch = []
+            if batch:
+                batches.put(self._validate_batch(batch, reject_file, result))
+        finally:
+            for _ in writers:
+                batches.put(None)
+            for writer in writers:
+                writer.join()
+            if reject_file is not None:
+                reject_file.close()
+        return result
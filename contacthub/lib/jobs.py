@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+from collections import OrderedDict
+
+from contacthub.lib.concurrency import run_concurrently
+from contacthub.lib.customer_scan import CustomerScan
+from contacthub.lib.importer import iter_ndjson
+from contacthub.lib.utils import DateEncoder
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+class Checkpoint(object):
+    """
+    A small JSON file recording the progress of a job. The file is replaced atomically: after a crash it contains
+    either the previous or the new state, never a partial one.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: the path of the checkpoint file
+        """
+        self.path = path
+
+    def load(self):
+        """
+        :return: the dictionary of the state saved, None if the checkpoint file doesn't exist
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, state):
+        """
+        Write the state in a temporary file, flush it to disk and rename it over the checkpoint file.
+
+        :param state: a JSON serializable dictionary
+        """
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(state, f, cls=DateEncoder)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(temporary, self.path)
+
+    def clear(self):
+        """
+        Remove the checkpoint file, for running the job again from the beginning.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class NDJSONWriter(object):
+    """
+    Writer of records in a file, one JSON document for each line, whose committed position is recorded in the
+    checkpoints of a job: resuming the job truncates the records written after the last checkpoint.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: the path of the output file
+        """
+        self.path = path
+        self.file = None
+
+    def open(self, position=None):
+        """
+        :param position: the position returned by `commit` to resume from, None for writing a new file
+        """
+        if position is None or not os.path.exists(self.path):
+            self.file = open(self.path, 'wb')
+        else:
+            self.file = open(self.path, 'r+b')
+            self.file.truncate(position)
+            self.file.seek(position)
+
+    def write(self, record):
+        """
+        :param record: a JSON serializable dictionary
+        """
+        self.file.write((json.dumps(record, cls=DateEncoder) + '\n').encode('utf-8'))
+
+    def commit(self):
+        """
+        Flush the records written to disk.
+
+        :return: the position to resume from
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class ExportJob(object):
+    """
+    A resumable export of the customers of a node.
+
+    The dictionaries of the customers are written by a writer (e.g. an NDJSONWriter) and, after every page, the
+    position of the writer and the page reached (or the cursor of the partitions, for a partitioned scan) are saved in a
+    checkpoint file. Running again a job interrupted by a failure resumes it from the last checkpoint, truncating the
+    output written after it.
+    """
+
+    def __init__(self, node, checkpoint, query=None, size=None, fields=None, partitions=None, by='registeredAt'):
+        """
+        :param node: the Node object of the customers
+        :param checkpoint: the path of the checkpoint file
+        :param query: a Query object for filtering the customers, all the customers if None
+        :param size: the size of the pages containing customers
+        :param fields: a list of strings representing the properties to include in the response
+        :param partitions: the number of partitions of a scan by date (see `Node.scan_customers`), None for
+            exporting the pages of a single query
+        :param by: the date attribute of the partitions
+        """
+        self.node = node
+        self.checkpoint = Checkpoint(checkpoint)
+        self.query = query.compiled if query is not None else None
+        #  the checkpoint stores the serialized query: the query loaded from JSON has the dates as strings
+        self.serialized_query = self.query.serialized if self.query is not None else None
+        self.base_query = query
+        self.size = size
+        self.fields = fields
+        self.partitions = partitions
+        self.by = by
+        self.exported = 0
+
+    def _state(self, position, cursor, done=False):
+        return {'kind': 'export', 'query': self.serialized_query, 'partitions': self.partitions, 'output': position,
+                'cursor': cursor, 'exported': self.exported, 'done': done}
+
+    def _pages(self, cursor):
+        """
+        Generate the elements of each page with the cursor following the page, starting from the given cursor.
+        """
+        if self.partitions:
+            scan = CustomerScan(self.node, partitions=self.partitions, by=self.by, query=self.base_query,
+                                size=self.size, fields=self.fields, raw=True, cursor=cursor)
+            page, pages = [], None
+            for element in scan:
+                #  the cursor changes once all the elements of a page have been yielded
+                if pages is not None and scan.pages != pages and page:
+                    yield page, scan.cursor
+                    page = []
+                pages = scan.pages
+                page.append(element)
+            yield page, scan.cursor
+            return
+        page_number = cursor or 0
+        while True:
+            resp = self.node.customer_api_manager.get_all(query=self.query, size=self.size, fields=self.fields,
+                                                          page=page_number)
+            page_number = resp['page']['number'] + 1
+            yield resp['elements'], page_number
+            if resp['page']['number'] >= resp['page']['totalPages'] - 1:
+                return
+
+    def run(self, writer):
+        """
+        Run the job from the last checkpoint, or from the beginning if there is no checkpoint.
+
+        :param writer: an object with the methods `open(position)`, `write(record)`, `commit()` returning the position
+            to resume from, and `close()`, like NDJSONWriter
+        :return: the number of customers exported by the whole job
+        """
+        state = self.checkpoint.load()
+        if state is not None and (state.get('kind') != 'export' or state.get('query') != self.serialized_query or
+                                  state.get('partitions') != self.partitions):
+            raise ValueError('The checkpoint %s belongs to a different job' % self.checkpoint.path)
+        if state is not None and state['done']:
+            self.exported = state['exported']
+            return self.exported
+        self.exported = state['exported'] if state else 0
+        writer.open(state['output'] if state else None)
+        try:
+            for elements, cursor in self._pages(state['cursor'] if state else None):
+                for element in elements:
+                    writer.write(element)
+                self.exported += len(elements)
+                self.checkpoint.save(self._state(writer.commit(), cursor))
+            self.checkpoint.save(self._state(writer.commit(), None, done=True))
+        finally:
+            writer.close()
+        return self.exported
+
+
+class ImportJob(object):
+    """
+    A resumable import of records from a file with a JSON document for each line.
+
+    The records are read in batches and passed concurrently to a function (by default, adding them as customers).
+    The outcome of each record is written in an outcomes file, a JSON document for each line with the `line` of the
+    record, the `outcome` ('imported' or 'failed'), the `id` of the customer imported or the `error`. A line not
+    containing a JSON object is a failed record, like the ones the function raises an error for. After every batch,
+    the offset of the input file and the position of the outcomes file are saved in a checkpoint file: running again a
+    job interrupted by a failure resumes it from the first batch not completed.
+    """
+    IMPORTED = 'imported'
+    FAILED = 'failed'
+
+    def __init__(self, node, path, checkpoint, outcomes, function=None, batch_size=100, concurrency=8):
+        """
+        :param node: the Node object receiving the records
+        :param path: the path of the input file
+        :param checkpoint: the path of the checkpoint file
+        :param outcomes: the path of the file with the outcome of each record
+        :param function: a function receiving a record and returning the object imported, with an `id`. If None,
+            each record is added as a customer with `node.add_customer(**record)`
+        :param batch_size: the number of records of each batch
+        :param concurrency: the maximum number of records imported at the same time
+        """
+        self.node = node
+        self.path = path
+        self.checkpoint = Checkpoint(checkpoint)
+        self.outcomes = NDJSONWriter(outcomes)
+        self.function = function or (lambda record: node.add_customer(**record))
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.counts = OrderedDict([(self.IMPORTED, 0), (self.FAILED, 0)])
+
+    def _batches(self, offset, line):
+        batch = []
+        for line, record, offset in iter_ndjson(self.path, offset, line):
+            batch.append((line, record))
+            if len(batch) == self.batch_size:
+                yield batch, offset, line
+                batch = []
+        if batch:
+            yield batch, offset, line
+
+    def _import(self, record):
+        if isinstance(record, ValueError):
+            raise record
+        result = self.function(record)
+        return getattr(result, 'id', None) if not isinstance(result, dict) else result.get('id')
+
+    def run(self):
+        """
+        Run the job from the last checkpoint, or from the beginning if there is no checkpoint.
+
+        :return: a dictionary with the number of records `imported` and `failed` by the whole job
+        """
+        state = self.checkpoint.load()
+        if state is not None and (state.get('kind') != 'import' or state.get('input') != self.path):
+            raise ValueError('The checkpoint %s belongs to a different job' % self.checkpoint.path)
+        if state is not None:
+            self.counts.update(state['counts'])
+            if state['done']:
+                return dict(self.counts)
+        self.outcomes.open(state['outcomes'] if state else None)
+        offset, line = (state['offset'], state['line']) if state else (0, 0)
+        try:
+            for batch, offset, line in self._batches(offset, line):
+                results = run_concurrently(self._import, [record for _, record in batch], self.concurrency)
+                for (number, _), (customer_id, error) in zip(batch, results):
+                    if error is None:
+                        self.outcomes.write({'line': number, 'outcome': self.IMPORTED, 'id': customer_id})
+                        self.counts[self.IMPORTED] += 1
+                    else:
+                        self.outcomes.write({'line': number, 'outcome': self.FAILED, 'error': str(error)})
+                        self.counts[self.FAILED] += 1
+                self.checkpoint.save(self._state(offset, line))
+            self.checkpoint.save(self._state(offset, line, done=True))
+        finally:
+            self.outcomes.close()
+        return dict(self.counts)
+
+    def _state(self, offset, line, done=False):
+        return {'kind': 'import', 'input': self.path, 'offset': offset, 'line': line,
+                'outcomes': self.outcomes.commit(), 'counts': self.counts, 'done': done}
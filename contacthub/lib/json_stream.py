@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import codecs
+import json
+
+_WHITESPACE = ' \t\n\r'
+
+
+class JSONArrayStream(object):
+    """
+    Incremental parser of a JSON object containing an array, e.g. a page of customers returned by the APIs.
+
+    Iterating over this object yields the elements of the array one at a time, decoding them as soon as the chunks
+    containing them are read: only the element being decoded and the last chunk read are kept in memory. The other
+    keys of the JSON object (e.g. `page`) are collected in the `metadata` dictionary, complete once the iteration is
+    over.
+    """
+
+    def __init__(self, chunks, key='elements', close=None):
+        """
+        :param chunks: an iterable of strings or of UTF-8 encoded bytes, e.g. the `iter_content` of a response
+        :param key: the key of the array to iterate over
+        :param close: an optional function called when the iteration ends, e.g. for releasing the connection
+        """
+        self.chunks = iter(chunks)
+        self.key = key
+        self.close = close
+        self.metadata = {}
+        self.buffer = ''
+        self.position = 0
+        self.finished = False
+        self.decoder = json.JSONDecoder()
+        self.bytes_decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def _read(self):
+        """
+        Append the next chunk to the buffer, dropping the part of the buffer already parsed.
+
+        :return: False if there are no more chunks, True otherwise
+        """
+        if self.finished:
+            return False
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.finished = True
+            chunk = self.bytes_decoder.decode(b'', True)
+        if isinstance(chunk, bytes):
+            chunk = self.bytes_decoder.decode(chunk)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def _peek(self):
+        """
+        Skip the whitespaces and return the next character, without consuming it.
+        """
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._read():
+                raise ValueError('Unexpected end of the JSON document')
+
+    def _expect(self, characters):
+        character = self._peek()
+        if character not in characters:
+            raise ValueError('Expecting one of %r at position %s, found %r' % (characters, self.position, character))
+        self.position += 1
+        return character
+
+    def _value(self):
+        """
+        Decode the next JSON value, reading more chunks until the value is complete.
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                #  a number at the end of the buffer could continue in the next chunk
+                if end < len(self.buffer) or self.finished:
+                    self.position = end
+                    return value
+            except ValueError:
+                if self.finished:
+                    raise
+            self._read()
+
+    def __iter__(self):
+        try:
+            self._expect('{')
+            if self._peek() == '}':
+                return
+            while True:
+                key = self._value()
+                self._expect(':')
+                if key == self.key:
+                    self._expect('[')
+                    if self._peek() == ']':
+                        self.position += 1
+                    else:
+                        while True:
+                            yield self._value()
+                            if self._expect(',]') == ']':
+                                break
+                else:
+                    self.metadata[key] = self._value()
+                if self._expect(',}') == '}':
+                    return
+        finally:
+            if self.close is not None:
+                self.close()
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+import json
+import sqlite3
+
+from contacthub.errors.operation_not_permitted import OperationNotPermitted
+from contacthub.lib.customer_sync import Watermark
+from contacthub.lib.utils import DateEncoder
+from contacthub.models.customer import Customer
+from contacthub.models.query.criterion import Criterion
+from contacthub.models.query.evaluator import compile_query
+from contacthub.models.query.query import Query
+
+
+class LocalMirror(object):
+    """
+    Local copy of the customers of a node, stored in a SQLite database.
+
+    The mirror is filled and kept up to date with the incremental synchronization of the node, and indexes the id,
+    the externalId, the email and the tags of each customer for answering lookups without calling the APIs.
+    Note that the customers deleted from the node are not removed from the mirror by the synchronization.
+    """
+
+    #: attributes stored in an indexed column of the customers table
+    COLUMNS = {'id': 'id', 'externalId': 'external_id', 'base.contacts.email': 'email'}
+
+    #: list attributes stored in the indexed customer_tags table
+    TAGS = {'tags.manual': 'manual', 'tags.auto': 'auto'}
+
+    #: the IN and NOT_IN conditions with more values are bound as a single JSON array, expanded by json_each
+    MAX_LIST_VALUES = 100
+
+    #: the maximum number of parameters of a SQL statement in the older SQLite versions: the queries needing more are
+    #: evaluated on every customer in the mirror
+    MAX_VARIABLES = 999
+
+    def __init__(self, node, path=':memory:'):
+        """
+        :param node: the Node object to mirror
+        :param path: the path of the SQLite database file. By default the mirror is kept in memory
+        """
+        self.node = node
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        try:
+            self.connection.execute("SELECT value FROM json_each('[]')")
+            self.json_each = True
+        except sqlite3.OperationalError:
+            self.json_each = False
+        self._create_schema()
+
+    def _create_schema(self):
+        """
+        Create the tables and the indexes of the mirror, if they don't exist yet.
+        """
+        with self.connection:
+            self.connection.executescript('''
+                CREATE TABLE IF NOT EXISTS customers (
+                    id TEXT PRIMARY KEY,
+                    external_id TEXT,
+                    email TEXT,
+                    updated_at TEXT,
+                    document TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS customers_external_id ON customers (external_id);
+                CREATE INDEX IF NOT EXISTS customers_email ON customers (email);
+                CREATE TABLE IF NOT EXISTS customer_tags (
+                    customer_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    tag NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS customer_tags_tag ON customer_tags (kind, tag);
+                CREATE INDEX IF NOT EXISTS customer_tags_customer ON customer_tags (customer_id);
+                CREATE TABLE IF NOT EXISTS mirror_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            ''')
+
+    @property
+    def watermark(self):
+        """
+        The Watermark reached by the last synchronization of this mirror.
+
+        :return: a Watermark object, empty if the mirror has never been synchronized
+        """
+        row = self.connection.execute("SELECT value FROM mirror_state WHERE key = 'watermark'").fetchone()
+        return Watermark.from_dict(json.loads(row[0])) if row else Watermark()
+
+    def sync(self, size=None, batch_size=1000):
+        """
+        Fetch from the node the customers updated since the last synchronization and store them in this mirror.
+        The first synchronization fetches all the customers of the node.
+
+        :param size: the size of the pages containing customers
+        :param batch_size: the number of customers stored in each transaction
+        :return: the number of customers stored
+        """
+        sync = self.node.sync_customers(since=self.watermark, size=size)
+        batch = []
+        for customer in sync:
+            batch.append(customer.attributes)
+            if len(batch) >= batch_size:
+                self.store(batch)
+                batch = []
+        with self.connection:
+            self._store(batch)
+            self.connection.execute("INSERT OR REPLACE INTO mirror_state (key, value) VALUES ('watermark', ?)",
+                                    (json.dumps(sync.watermark.to_dict()),))
+        return sync.delivered
+
+    def store(self, customers):
+        """
+        Insert or replace the given customers in this mirror.
+
+        :param customers: a list of Customer objects or dictionaries representing customers
+        """
+        with self.connection:
+            self._store(customers)
+
+    def _store(self, customers):
+        """
+        Insert or replace the given customers, without committing the transaction.
+
+        :param customers: a list of Customer objects or dictionaries representing customers
+        """
+        rows = []
+        tags = []
+        ids = []
+        for customer in customers:
+            attributes = customer.attributes if isinstance(customer, Customer) else customer
+            customer_id = attributes['id']
+            contacts = (attributes.get('base') or {}).get('contacts') or {}
+            rows.append((customer_id, attributes.get('externalId'), contacts.get('email'),
+                         attributes.get('updatedAt'), json.dumps(attributes, cls=DateEncoder)))
+            ids.append((customer_id,))
+            customer_tags = attributes.get('tags') or {}
+            for kind in self.TAGS.values():
+                for tag in customer_tags.get(kind) or []:
+                    tags.append((customer_id, kind, tag))
+        self.connection.executemany("DELETE FROM customer_tags WHERE customer_id = ?", ids)
+        self.connection.executemany("INSERT OR REPLACE INTO customers (id, external_id, email, updated_at, document) "
+                                    "VALUES (?, ?, ?, ?, ?)", rows)
+        self.connection.executemany("INSERT INTO customer_tags (customer_id, kind, tag) VALUES (?, ?, ?)", tags)
+
+    def remove(self, customer_id):
+        """
+        Remove a customer from this mirror.
+
+        :param customer_id: the id of the customer to remove
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM customer_tags WHERE customer_id = ?", (customer_id,))
+            self.connection.execute("DELETE FROM customers WHERE id = ?", (customer_id,))
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+
+    def _select(self, where='1', params=()):
+        """
+        Get the customers satisfying the given SQL condition.
+
+        :param where: a SQL condition on the customers table
+        :param params: the parameters of the SQL condition
+        :return: a list of Customer objects
+        """
+        cursor = self.connection.execute("SELECT document FROM customers WHERE %s ORDER BY rowid" % where, params)
+        return [Customer(node=self.node, **json.loads(row[0])) for row in cursor]
+
+    def get_customers(self):
+        """
+        Get all the customers in this mirror.
+
+        :return: a list of Customer objects
+        """
+        return self._select()
+
+    def get_customer(self, id=None, external_id=None):
+        """
+        Retrieve a customer from this mirror by its id or external ID. Only one parameter can be specified for
+        getting a customer.
+
+        :param id: the id of the customer to retrieve
+        :param external_id: the external id of the customer to retrieve
+        :return: a Customer object, a list of Customer objects if more customers share the external id, None if no
+            customer is found
+        """
+        if id and external_id:
+            raise ValueError('Cannot get a customer by both its id and external_id')
+        if not id and not external_id:
+            raise ValueError('Insert an id or an external_id')
+        if id:
+            customers = self._select('id = ?', (id,))
+        else:
+            customers = self._select('external_id = ?', (external_id,))
+        if not customers:
+            return None
+        return customers[0] if len(customers) == 1 else customers
+
+    def get_customers_by_email(self, email):
+        """
+        Get the customers in this mirror with the given email.
+
+        :param email: the email of the customers to retrieve
+        :return: a list of Customer objects
+        """
+        return self._select('email = ?', (email,))
+
+    def get_customers_by_tag(self, tag, kind='manual'):
+        """
+        Get the customers in this mirror with the given tag.
+
+        :param tag: the tag of the customers to retrieve
+        :param kind: the kind of the tag, 'manual' or 'auto'
+        :return: a list of Customer objects
+        """
+        return self._select('id IN (SELECT customer_id FROM customer_tags WHERE kind = ? AND tag = ?)', (kind, tag))
+
+    def filter(self, criterion):
+        """
+        Get the customers in this mirror satisfying a Criterion or a Query, without calling the APIs.
+        The criteria on the indexed attributes (`id`, `externalId` and `base.contacts.email` with EQUALS,
+        NOT_EQUALS, IN, NOT_IN, IS_NULL and IS_NOT_NULL operators, `tags.manual` and `tags.auto` with IN and NOT_IN
+        operators) are run by SQLite on the indexes, the others are evaluated on every customer in the mirror. Long
+        lists of values are bound as a single JSON array if SQLite has the json_each function; otherwise a query with
+        more than `MAX_VARIABLES` values is evaluated on every customer too.
+
+        :param criterion: a Criterion object or a Query object on the Customer entity
+        :return: a list of Customer objects
+        """
+        if isinstance(criterion, Query):
+            inner_query = criterion.inner_query
+        else:
+            inner_query = Query(node=self.node, entity=Customer).filter(criterion).inner_query
+        if not inner_query:
+            return self.get_customers()
+        params = []
+        try:
+            where = self._compile_query(inner_query, params)
+            if len(params) > self.MAX_VARIABLES:
+                raise OperationNotPermitted('Too many values for a SQL statement: %s' % len(params))
+        except OperationNotPermitted:
+            predicate = compile_query(inner_query)
+            cursor = self.connection.execute("SELECT document FROM customers ORDER BY rowid")
+            documents = (json.loads(row[0]) for row in cursor)
+            return [Customer(node=self.node, **document) for document in documents if predicate(document)]
+        return self._select(where, params)
+
+    def _compile_query(self, query, params):
+        """
+        Compile a simple or a combined query in a SQL condition on the customers table.
+
+        :param query: a dictionary representing a simple or a combined query for the APIs
+        :param params: a list for appending the parameters of the SQL condition
+        :return: a string containing the SQL condition
+        """
+        if query['type'] == 'combined':
+            conjunction = ' AND ' if query['conjunction'] == 'INTERSECT' else ' OR '
+            return '(' + conjunction.join(self._compile_query(q, params) for q in query['queries']) + ')'
+        return self._compile_condition(query['are']['condition'], params)
+
+    def _compile_condition(self, condition, params):
+        """
+        Compile an atomic or composite condition in a SQL condition on the customers table.
+
+        :param condition: a dictionary representing an atomic or composite condition for the APIs
+        :param params: a list for appending the parameters of the SQL condition
+        :return: a string containing the SQL condition
+        """
+        if condition['type'] == 'composite':
+            conjunction = ' AND ' if condition['conjunction'] == Criterion.COMPLEX_OPERATORS.AND else ' OR '
+            return '(' + conjunction.join(self._compile_condition(c, params) for c in condition['conditions']) + ')'
+
+        attribute = condition['attribute']
+        operator = condition['operator']
+        value = condition.get('value')
+        values = list(value) if isinstance(value, (list, tuple)) else [value]
+        if attribute in self.COLUMNS:
+            column = self.COLUMNS[attribute]
+            if operator == Criterion.SIMPLE_OPERATORS.EQUALS:
+                params.append(value)
+                return '%s = ?' % column
+            if operator == Criterion.SIMPLE_OPERATORS.NOT_EQUALS:
+                params.append(value)
+                return '%s IS NOT ?' % column
+            if operator == Criterion.SIMPLE_OPERATORS.IS_NULL:
+                return '%s IS NULL' % column
+            if operator == Criterion.SIMPLE_OPERATORS.IS_NOT_NULL:
+                return '%s IS NOT NULL' % column
+            if operator == Criterion.SIMPLE_OPERATORS.IN:
+                return '%s IN (%s)' % (column, self._compile_values(values, params))
+            if operator == Criterion.SIMPLE_OPERATORS.NOT_IN:
+                #  like NOT_EQUALS, a customer without the attribute is not in the values
+                return '(%s IS NULL OR %s NOT IN (%s))' % (column, column, self._compile_values(values, params))
+        elif attribute in self.TAGS:
+            if operator in (Criterion.SIMPLE_OPERATORS.IN, Criterion.SIMPLE_OPERATORS.NOT_IN):
+                params.append(self.TAGS[attribute])
+                negation = 'NOT ' if operator == Criterion.SIMPLE_OPERATORS.NOT_IN else ''
+                return 'id %sIN (SELECT customer_id FROM customer_tags WHERE kind = ? AND tag IN (%s))' % (
+                    negation, self._compile_values(values, params))
+        raise OperationNotPermitted('Cannot apply the operator %s on the attribute %s in a local mirror.'
+                                    % (operator, attribute))
+
+    def _compile_values(self, values, params):
+        """
+        Compile the list of values of an IN or NOT_IN operator.
+
+        :param values: the list of values
+        :param params: a list for appending the parameters of the SQL condition
+        :return: a string containing a placeholder for each value, or a subquery on a single JSON parameter if the
+            values are more than `MAX_LIST_VALUES`
+        """
+        if self.json_each and len(values) > self.MAX_LIST_VALUES:
+            params.append(json.dumps(values, cls=DateEncoder))
+            return 'SELECT value FROM json_each(?)'
+        params.extend(values)
+        return ', '.join('?' * len(values))
+
+    def close(self):
+        """
+        Close the connection to the SQLite database of this mirror.
+        """
+        self.connection.close()
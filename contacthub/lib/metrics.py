@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+import bisect
+import threading
+
+
+class Histogram(object):
+    """
+    Histogram of durations in seconds, with buckets growing exponentially. The memory used does not depend on the
+    number of values recorded, and percentiles are approximated by the upper bound of their bucket (relative error
+    lower than the growth factor of the buckets).
+    """
+
+    def __init__(self, lowest=0.0001, highest=120.0, factor=2 ** 0.25):
+        """
+        :param lowest: the upper bound of the first bucket, in seconds
+        :param highest: the upper bound of the last bucket, greater values are counted in an overflow bucket
+        :param factor: the ratio between the upper bounds of two consecutive buckets
+        """
+        self.bounds = [lowest]
+        while self.bounds[-1] < highest:
+            self.bounds.append(self.bounds[-1] * factor)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        """
+        :param value: the duration to record, in seconds
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """
+        :param p: the percentile, between 0 and 100
+        :return: the approximated value of the percentile, None if no values were recorded
+        """
+        if not self.count:
+            return None
+        rank = max(1, int(round(p / 100.0 * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+
+    def buckets(self):
+        """
+        :return: a list of (upper bound, cumulative count) tuples of the non empty buckets, the overflow bucket has
+            upper bound float('inf'). Useful for exporting the histogram to monitoring systems.
+        """
+        result = []
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count:
+                result.append((self.bounds[index] if index < len(self.bounds) else float('inf'), seen))
+        return result
+
+    def to_dict(self, percentiles=(50, 90, 99)):
+        """
+        :param percentiles: the percentiles to compute
+        :return: a dictionary with count, mean, max and the requested percentiles (e.g. p50)
+        """
+        result = {'count': self.count, 'mean': self.sum / self.count if self.count else None,
+                  'max': self.max if self.count else None}
+        for p in percentiles:
+            result['p%s' % p] = self.percentile(p)
+        return result
+
+
+class EndpointMetrics(object):
+    """
+    The metrics collected for a single endpoint.
+    """
+    TIMINGS = ('total', 'serialize', 'network', 'decode')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.timings = dict((timing, Histogram()) for timing in self.TIMINGS)
+
+    def to_dict(self, percentiles=(50, 90, 99)):
+        return {'requests': self.requests, 'errors': self.errors, 'statuses': dict(self.statuses),
+                'request_bytes': self.request_bytes, 'response_bytes': self.response_bytes,
+                'timings': dict((timing, histogram.to_dict(percentiles)) for timing, histogram in self.timings.items())}
+
+
+class MetricsCollector(object):
+    """
+    In memory collector of the metrics of the requests to the APIs, grouped by method and endpoint template
+    (e.g. 'GET /customers/{id}'). Register it on a Workspace with::
+
+        metrics = MetricsCollector()
+        metrics.register(workspace)
+        ...
+        metrics.snapshot()
+    """
+
+    def __init__(self):
+        self.endpoints = {}
+        self.lock = threading.Lock()
+
+    def register(self, workspace):
+        """
+        Collect the metrics of all the requests made through the given Workspace.
+
+        :param workspace: a Workspace object
+        """
+        workspace.add_hook('after_response', self.record)
+        workspace.add_hook('on_error', self.record_exception)
+
+    def unregister(self, workspace):
+        """
+        Stop collecting the metrics of the requests made through the given Workspace.
+
+        :param workspace: a Workspace object
+        """
+        workspace.hooks.remove('after_response', self.record)
+        workspace.hooks.remove('on_error', self.record_exception)
+
+    def _metrics(self, info):
+        key = info.method.upper() + ' ' + info.endpoint
+        if key not in self.endpoints:
+            self.endpoints[key] = EndpointMetrics()
+        return self.endpoints[key]
+
+    def record(self, info):
+        """
+        Record a request that received a response.
+
+        :param info: the RequestInfo object of the request
+        """
+        with self.lock:
+            metrics = self._metrics(info)
+            metrics.requests += 1
+            metrics.statuses[info.status] = metrics.statuses.get(info.status, 0) + 1
+            if not 200 <= info.status < 300:
+                metrics.errors += 1
+            metrics.request_bytes += info.request_bytes
+            metrics.response_bytes += info.response_bytes
+            metrics.timings['total'].record(info.total_time)
+            metrics.timings['serialize'].record(info.serialize_time)
+            metrics.timings['network'].record(info.network_time)
+            metrics.timings['decode'].record(info.decode_time)
+
+    def record_exception(self, info):
+        """
+        Record a request that raised an exception before receiving a response.
+
+        :param info: the RequestInfo object of the request
+        """
+        if info.status is not None:
+            return
+        with self.lock:
+            metrics = self._metrics(info)
+            metrics.requests += 1
+            metrics.errors += 1
+            metrics.request_bytes += info.request_bytes
+
+    def snapshot(self, percentiles=(50, 90, 99)):
+        """
+        :param percentiles: the percentiles to compute for every timing
+        :return: a dictionary mapping each endpoint to its metrics
+        """
+        with self.lock:
+            return dict((key, metrics.to_dict(percentiles)) for key, metrics in self.endpoints.items())
+
+    def reset(self):
+        """
+        Discard all the metrics collected.
+        """
+        with self.lock:
+            self.endpoints = {}
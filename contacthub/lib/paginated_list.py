@@ -1,14 +1,32 @@
 from contacthub.errors.operation_not_permitted import OperationNotPermitted
+from contacthub.lib import tracing
+from contacthub.lib.frame import build_columns, fill_columns, to_frame
 from contacthub.lib.read_only_list import ReadOnlyList
 
 
 class PaginatedList(ReadOnlyList):
+    """
+    A page of entities, able to retrieve the other pages.
 
-    def __init__(self, node, function, entity_class, **kwargs):
+    If the node is thread-safe, a PaginatedList is never modified after its creation: `next_page`, `previous_page`
+    and `iter_all` return new PaginatedList objects for the other pages, so the same page can be shared among threads.
+    Otherwise, for compatibility, `next_page` and `previous_page` load the other page in this same object.
+    """
+
+    def __init__(self, node, function, entity_class, raw=False, **kwargs):
+        """
+        :param node: the node of the entities in this list
+        :param function: the function of an API manager retrieving a page of entities
+        :param entity_class: the class of the entities in this list
+        :param raw: if True, the elements of this list are the dictionaries returned by the APIs instead of entities
+        :param kwargs: the parameters for the function retrieving the pages
+        """
         super(PaginatedList, self).__init__()
         self.node = node
         self.function = function
         self.entity_class = entity_class
+        self.raw = raw
+        self.thread_safe = getattr(node, 'thread_safe', False) is True
 
         self.kwargs = kwargs
         self.page_number = 0
@@ -22,6 +40,8 @@ class PaginatedList(ReadOnlyList):
         """
         if self.page_number == self.total_pages - 1:
             raise OperationNotPermitted('Last page reached.')
+        if self.thread_safe:
+            return self.get_page(self.page_number + 1)
 
         self.page_number += 1
         return self._retrieve_data()
@@ -34,13 +54,44 @@ class PaginatedList(ReadOnlyList):
         """
         if self.page_number == 0:
             raise OperationNotPermitted('First page reached.')
+        if self.thread_safe:
+            return self.get_page(self.page_number - 1)
 
         self.page_number -= 1
         return self._retrieve_data()
 
+    def iter_all(self):
+        """
+        Iterate over the entities of this page and of all the following ones, retrieving the next pages when needed.
+
+        :return: a generator of the entities from the current page up to the last one
+        """
+        page = self
+        while True:
+            for element in list.__iter__(page):
+                yield element
+            if page.page_number >= page.total_pages - 1:
+                return
+            page = page.next_page()
+
+    def get_page(self, number):
+        """
+        Retrieve a page of entities in a new PaginatedList, without changing this one.
+
+        :param number: the number of the page to retrieve, starting from 0
+        :return: a new PaginatedList containing the requested page of entities
+        """
+        page = type(self).__new__(type(self))
+        list.__init__(page)
+        page.__dict__.update(self.__dict__)
+        page.kwargs = dict(self.kwargs)
+        page.page_number = number
+        return page._retrieve_data()
+
     def _retrieve_data(self):
         self.kwargs['page'] = self.page_number
-        resp = self.function(**self.kwargs)
+        with tracing.span('contacthub.page', **{'contacthub.page': self.page_number}):
+            resp = self.function(**self.kwargs)
         self.page = resp['page']
         self.size = self.page['size']
         self.total_elements = self.page['totalElements']
@@ -49,9 +100,35 @@ class PaginatedList(ReadOnlyList):
         self.page_number = self.page['number']
 
         list.__delitem__(self, slice(None, None, None))
-        for element in resp['elements']:
-            list.append(self, self.entity_class(node=self.node, **element))
+        if self.raw:
+            list.extend(self, resp['elements'])
+            return self
+        with tracing.span('contacthub.hydrate', **{'contacthub.entities': len(resp['elements'])}):
+            for element in resp['elements']:
+                list.append(self, self.entity_class(node=self.node, **element))
         return self
 
+    def to_frame(self, fields, format='columns', all_pages=False):
+        """
+        Convert the entities of this PaginatedList in a columnar frame, reading the fields straight from the data
+        of the entities. When all the pages are requested, the following pages are fetched without creating their
+        entity objects and without changing the current page of this PaginatedList.
 
+        :param fields: a list of strings representing the dotted fields to extract (e.g. 'base.contacts.email')
+        :param format: 'columns' for an OrderedDict mapping each field to the list of its values, 'pandas' for a
+            pandas DataFrame, 'arrow' for a pyarrow Table
+        :param all_pages: if True, include the entities of the following pages
+        :return: the frame in the requested format
+        """
+        kwargs = dict(self.kwargs)
+        elements = list(self) if self.raw else [entity.attributes for entity in self]
+        columns = build_columns(elements, fields)
+        if all_pages:
+            for page_number in range(self.page_number + 1, self.total_pages):
+                fill_columns(columns, self._fetch_elements(kwargs, page_number))
+        return to_frame(columns, format=format)
 
+    def _fetch_elements(self, kwargs, page_number):
+        kwargs['page'] = page_number
+        with tracing.span('contacthub.page', **{'contacthub.page': page_number}):
+            return self.function(**kwargs)['elements']
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+from multiprocessing import Pool
+
+from contacthub.models.customer import Customer
+
+#  the node rebuilt by each worker process from the configuration of the exporting node
+_worker_node = None
+
+
+def node_config(node):
+    """
+    Extract the configuration of a node as a picklable dictionary, for rebuilding the node in another process.
+    Hooks and tracers are not part of the configuration.
+
+    :param node: the Node object to describe
+    :return: a dictionary with the workspace id, the token, the base URL and the node id
+    """
+    workspace = node.workspace
+    return {'workspace_id': workspace.workspace_id, 'token': workspace.token, 'base_url': workspace.base_url,
+            'node_id': node.node_id}
+
+
+def node_from_config(config):
+    """
+    Create a new Node object from a configuration generated by `node_config`.
+
+    :param config: a dictionary generated by `node_config`
+    :return: a new Node object
+    """
+    from contacthub.workspace import Workspace
+    workspace = Workspace(workspace_id=config['workspace_id'], token=config['token'], base_url=config['base_url'])
+    return workspace.get_node(config['node_id'])
+
+
+def _init_worker(config):
+    global _worker_node
+    _worker_node = node_from_config(config)
+
+
+def _export_page(arguments):
+    """
+    Retrieve, decode and hydrate a page of customers in a worker process, and apply the transform to each customer.
+
+    :param arguments: a tuple with the page number, the parameters of the page request and the transform
+    :return: a tuple with the page metadata and the list of the transformed records
+    """
+    page_number, kwargs, transform = arguments
+    return _transform_page(_worker_node, page_number, kwargs, transform)
+
+
+def _transform_page(node, page_number, kwargs, transform):
+    resp = node.customer_api_manager.get_all(page=page_number, **kwargs)
+    if transform is None:
+        return resp['page'], resp['elements']
+    return resp['page'], [transform(Customer(node=node, **element)) for element in resp['elements']]
+
+
+class ParallelExport(object):
+    """
+    Iterable over the records of an export of customers, hydrated and transformed in a pool of processes.
+
+    Each worker process rebuilds the node from its configuration, then retrieves a page of customers, decodes it,
+    creates the Customer objects and applies the transform, sending back only the transformed records. The records
+    are yielded in the order of the pages. The transform must be picklable, e.g. a function defined at module level.
+    """
+
+    def __init__(self, node, workers=4, transform=None, query=None, size=None, fields=None, chunk_size=1):
+        """
+        :param node: the Node object of the customers to export
+        :param workers: the number of worker processes. With 1 worker, the export runs in the current process
+        :param transform: a picklable function receiving a Customer object and returning a picklable record. If None,
+            the records are the dictionaries returned by the APIs
+        :param query: a Query object for filtering the customers, all the customers if None
+        :param size: the size of the pages containing customers
+        :param fields: a list of strings representing the properties to include in the response
+        :param chunk_size: the number of pages sent at once to each worker process
+        """
+        self.node = node
+        self.config = node_config(node)
+        self.workers = workers
+        self.transform = transform
+        self.kwargs = {}
+        if query is not None and query.inner_query:
+            self.kwargs['query'] = query.compiled
+        if size:
+            self.kwargs['size'] = size
+        if fields:
+            self.kwargs['fields'] = fields
+        self.chunk_size = chunk_size
+        self.total_pages = None
+        self.total_elements = None
+        self.exported = 0
+
+    def _pages(self):
+        if self.workers <= 1:
+            page, records = _transform_page(self.node, 0, self.kwargs, self.transform)
+            yield page, records
+            for page_number in range(1, page['totalPages']):
+                yield _transform_page(self.node, page_number, self.kwargs, self.transform)
+            return
+        pool = Pool(self.workers, initializer=_init_worker, initargs=(self.config,))
+        try:
+            page, records = pool.apply(_export_page, [(0, self.kwargs, self.transform)])
+            yield page, records
+            pending = [(page_number, self.kwargs, self.transform) for page_number in range(1, page['totalPages'])]
+            for result in pool.imap(_export_page, pending, self.chunk_size):
+                yield result
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def __iter__(self):
+        for page, records in self._pages():
+            self.total_pages = page['totalPages']
+            self.total_elements = page['totalElements']
+            for record in records:
+                self.exported += 1
+                yield record
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict, deque
+from copy import deepcopy
+
+
+def merge_patches(pending, patch):
+    """
+    Merge a PATCH body in a pending one, as if the two PATCH requests were applied in sequence: nested dictionaries are
+    merged recursively, while all the other values (lists and None included) of the later patch replace the earlier
+    ones.
+
+    :param pending: the dictionary of the earlier PATCH body, updated in place
+    :param patch: the dictionary of the later PATCH body
+    :return: the pending dictionary
+    """
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(pending.get(key), dict):
+            merge_patches(pending[key], value)
+        else:
+            pending[key] = deepcopy(value)
+    return pending
+
+
+class PatchCoalescer(object):
+    """
+    Write-coalescing layer for the PATCH requests on the customers of a node. The patches for the same customer received
+    within a time window are merged and sent in a single PATCH request when the window expires, or on demand with
+    `flush`.
+
+    Ordering guarantees:
+
+    - the patches for a customer are merged in the order they are received, so the later values win, exactly as if
+      the PATCH requests were sent one after the other
+    - the PATCH requests for a customer are sent one at a time, in order: a patch received while the previous merged
+      patch of the same customer is being sent is delayed until the request completes
+    - there is no ordering between the PATCH requests of different customers
+    - the patches are not visible to reads (e.g. `Node.get_customer`) until they are flushed
+    - a patch is never dropped: if its PATCH request fails, the patch goes back to the pending ones, merged before the
+      patches of the customer received in the meantime, and it's sent again after a delay doubling at each failure of
+      the customer, up to `max_retry_delay`, or by the next `flush` or `close`, that raise the error if it fails again
+
+    The last `max_errors` errors of the patches sent by the timers are kept in `errors`.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, node, window=0.05, max_retry_delay=30, max_errors=100):
+        """
+        :param node: the Node object of the customers to patch
+        :param window: the seconds waited after the first patch of a customer before sending its merged patch. If None,
+            the patches are sent only by `flush`, failed ones included
+        :param max_retry_delay: the maximum seconds waited before sending again a failed patch
+        :param max_errors: the number of errors kept in `errors`
+        """
+        self.node = node
+        self.window = window
+        self.max_retry_delay = max_retry_delay
+        self.pending = OrderedDict()
+        self.timers = {}
+        #  the number of consecutive failures of each customer, for the delay of its next retry
+        self.failures = {}
+        #  a customer is always sent holding the same lock, so its PATCH requests can't overlap
+        self.sending = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self.lock = threading.Lock()
+        self.received = 0
+        self.sent = 0
+        self.failed = 0
+        self.errors = deque(maxlen=max_errors)
+
+    def patch(self, customer_id, body):
+        """
+        Schedule a PATCH request on a customer, merging it with the pending ones of the same customer.
+
+        :param customer_id: the id of the customer to patch
+        :param body: a dictionary containing the body of the PATCH request
+        """
+        with self.lock:
+            self.received += 1
+            if customer_id in self.pending:
+                merge_patches(self.pending[customer_id], body)
+            else:
+                self.pending[customer_id] = deepcopy(body)
+            if customer_id not in self.timers:
+                self._schedule(customer_id, self.window)
+
+    def _schedule(self, customer_id, delay):
+        """
+        Start the timer sending the pending patch of a customer, holding the lock.
+
+        :param customer_id: the id of the customer
+        :param delay: the seconds waited before sending the patch. If None, no timer is started
+        """
+        if delay is None:
+            return
+        timer = threading.Timer(delay, self._flush_expired, [customer_id])
+        timer.daemon = True
+        self.timers[customer_id] = timer
+        timer.start()
+
+    def _flush_expired(self, customer_id):
+        try:
+            self.flush(customer_id)
+        except Exception as e:
+            with self.lock:
+                self.errors.append((customer_id, e))
+
+    def _requeue(self, customer_id, body):
+        """
+        Put back a patch whose PATCH request failed, before the patches of the customer received while it was sent,
+        and schedule its retry.
+
+        :param customer_id: the id of the customer of the patch
+        :param body: the dictionary of the patch that failed
+        """
+        with self.lock:
+            later = self.pending.pop(customer_id, None)
+            self.pending[customer_id] = merge_patches(body, later) if later is not None else body
+            self.failed += 1
+            failures = self.failures[customer_id] = self.failures.get(customer_id, 0) + 1
+            timer = self.timers.pop(customer_id, None)
+            if timer is not None:
+                timer.cancel()
+            if self.window is not None:
+                self._schedule(customer_id, min(self.window * 2 ** failures, self.max_retry_delay))
+
+    def flush(self, customer_id=None):
+        """
+        Send immediately the pending merged patch of a customer, or of all the customers. The patches whose PATCH
+        request fails stay pending.
+
+        :param customer_id: the id of the customer to flush, all the customers if None
+        :return: a dictionary mapping the id of each customer flushed to the response of its PATCH request. If a
+            request fails, the error is raised after trying all the customers
+        """
+        if customer_id is None:
+            with self.lock:
+                customer_ids = list(self.pending)
+            responses = {}
+            error = None
+            for pending_id in customer_ids:
+                try:
+                    responses.update(self.flush(pending_id))
+                except Exception as e:
+                    error = error or e
+            if error is not None:
+                raise error
+            return responses
+        with self.sending[hash(customer_id) % self.LOCK_STRIPES]:
+            with self.lock:
+                body = self.pending.pop(customer_id, None)
+                timer = self.timers.pop(customer_id, None)
+            if timer is not None:
+                timer.cancel()
+            if body is None:
+                return {}
+            try:
+                response = self.node.customer_api_manager.patch(_id=customer_id, body=body)
+            except Exception:
+                self._requeue(customer_id, body)
+                raise
+            with self.lock:
+                self.sent += 1
+                self.failures.pop(customer_id, None)
+            return {customer_id: response}
+
+    def close(self):
+        """
+        Send all the pending patches, raising the error of the first PATCH request failed.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def stats(self):
+        """
+        A dictionary with the count of patches received, PATCH requests sent, patches pending and PATCH requests
+        failed.
+        """
+        with self.lock:
+            return {'received': self.received, 'sent': self.sent, 'pending': len(self.pending), 'errors': self.failed}
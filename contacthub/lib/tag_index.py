@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+import binascii
+import threading
+
+from contacthub.models.customer import Customer
+from contacthub.models.query import in_
+
+
+class Segment(object):
+    """
+    A boolean expression over the tags of the customers, evaluated by a TagIndex. Segments are combined with
+    `&` (AND), `|` (OR) and `~` (NOT)::
+
+        segment = (Tag('vip') | Tag('gold')) & ~Tag('churned', kind='auto')
+    """
+
+    def __and__(self, other):
+        return _And(self, other)
+
+    def __or__(self, other):
+        return _Or(self, other)
+
+    def __invert__(self):
+        return _Not(self)
+
+    def evaluate(self, index):
+        """
+        :param index: the TagIndex to evaluate this segment on
+        :return: the bitset, as an int, of the ordinals of the customers in this segment
+        """
+        raise NotImplementedError
+
+
+class Tag(Segment):
+    """
+    The segment of the customers having a tag.
+    """
+
+    def __init__(self, name, kind='manual'):
+        """
+        :param name: the tag
+        :param kind: 'manual' or 'auto'
+        """
+        if kind not in TagIndex.KINDS:
+            raise ValueError("Unknown kind of tag %s, choose one of %s" % (kind, ', '.join(TagIndex.KINDS)))
+        self.name = name
+        self.kind = kind
+
+    def evaluate(self, index):
+        return index.tags[self.kind].get(self.name, 0) & index.live
+
+    def __repr__(self):
+        return 'Tag(%r, kind=%r)' % (self.name, self.kind)
+
+
+class _And(Segment):
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    def evaluate(self, index):
+        return self.left.evaluate(index) & self.right.evaluate(index)
+
+    def __repr__(self):
+        return '(%r & %r)' % (self.left, self.right)
+
+
+class _Or(Segment):
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+    def evaluate(self, index):
+        return self.left.evaluate(index) | self.right.evaluate(index)
+
+    def __repr__(self):
+        return '(%r | %r)' % (self.left, self.right)
+
+
+class _Not(Segment):
+    def __init__(self, segment):
+        self.segment = segment
+
+    def evaluate(self, index):
+        return index.live & ~self.segment.evaluate(index)
+
+    def __repr__(self):
+        return '~%r' % (self.segment,)
+
+
+def _bitset(ordinals, size):
+    """
+    Create a bitset in a single pass, instead of setting its bits one at a time (each `|` copies the whole int).
+
+    :param ordinals: an iterable of the positions of the bits to set
+    :param size: the number of bits of the bitset
+    :return: the bitset, as an int
+    """
+    buffer = bytearray((size + 7) // 8)
+    for ordinal in ordinals:
+        buffer[ordinal >> 3] |= 1 << (ordinal & 7)
+    if hasattr(int, 'from_bytes'):
+        return int.from_bytes(bytes(buffer), 'little')
+    return int(binascii.hexlify(bytes(buffer[::-1])) or '0', 16)
+
+
+def _ordinals(bits):
+    """
+    :param bits: a bitset, as an int
+    :return: the list of the positions of the bits set, in ascending order
+    """
+    return [ordinal for ordinal, bit in enumerate(reversed(bin(bits)[2:])) if bit == '1']
+
+
+class TagIndex(object):
+    """
+    Local inverted index from the tags of the customers of a node to the bitsets of the customers having them.
+
+    Each customer indexed gets an ordinal, and each tag maps to an int whose bit at the ordinal of a customer is set if
+    the customer has the tag. Segments (boolean expressions over the tags) are evaluated with bitwise operations,
+    without calling the APIs. Attached to a node, the index is updated by the tag operations of the node
+    (`add_tag`, `remove_tag`, `add_tags_bulk`, `remove_tags_bulk`); other changes to the tags require indexing the
+    customers again.
+    """
+    KINDS = ('manual', 'auto')
+
+    def __init__(self):
+        self.ids = []
+        self.ordinals = {}
+        self.tags = dict((kind, {}) for kind in self.KINDS)
+        #  the ordinal of each customer indexed mapped to the set of its (kind, tag), for clearing only its own tags
+        self.customer_tags = {}
+        #  the bitset of the customers indexed and not removed
+        self.live = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls, node, query=None, size=None, attach=True):
+        """
+        Create a new TagIndex of the customers of a node, streaming only their tags.
+
+        :param node: the Node object of the customers to index
+        :param query: a Query object for indexing only some customers, all the customers if None
+        :param size: the size of the pages containing customers
+        :param attach: if True, keep the index updated with the tag operations of the node
+        :return: a new TagIndex object
+        """
+        index = cls()
+        for customer in node.stream_customers(query=query, size=size, fields=['id', 'tags'], raw=True):
+            tags = customer.get('tags') or {}
+            ordinal = index.ordinals.get(customer['id'])
+            if ordinal is None:
+                ordinal = index.ordinals[customer['id']] = len(index.ids)
+                index.ids.append(customer['id'])
+            index.customer_tags[ordinal] = set((kind, tag) for kind in cls.KINDS for tag in tags.get(kind) or ())
+        #  every bitset is created once from the ordinals of its customers
+        members = dict((kind, {}) for kind in cls.KINDS)
+        for ordinal, tags in index.customer_tags.items():
+            for kind, tag in tags:
+                members[kind].setdefault(tag, []).append(ordinal)
+        size = len(index.ids)
+        for kind, tags in members.items():
+            index.tags[kind] = dict((tag, _bitset(ordinals, size)) for tag, ordinals in tags.items())
+        index.live = _bitset(range(size), size)
+        if attach:
+            index.attach(node)
+        return index
+
+    def attach(self, node):
+        """
+        Keep this index updated with the tag operations of a node.
+
+        :param node: a Node object
+        """
+        if self not in node.tag_observers:
+            node.tag_observers.append(self)
+
+    def detach(self, node):
+        """
+        Stop updating this index with the tag operations of a node.
+
+        :param node: a Node object
+        """
+        if self in node.tag_observers:
+            node.tag_observers.remove(self)
+
+    def _ordinal(self, customer_id):
+        ordinal = self.ordinals.get(customer_id)
+        if ordinal is None:
+            ordinal = self.ordinals[customer_id] = len(self.ids)
+            self.ids.append(customer_id)
+        self.live |= 1 << ordinal
+        self.customer_tags.setdefault(ordinal, set())
+        return ordinal
+
+    def add_customer(self, customer_id, manual=(), auto=()):
+        """
+        Index a customer with its tags, replacing the tags previously indexed for it.
+
+        :param customer_id: the id of the customer
+        :param manual: the list of the manual tags of the customer
+        :param auto: the list of the auto tags of the customer
+        """
+        with self.lock:
+            self._clear(customer_id)
+            ordinal = self._ordinal(customer_id)
+            bit = 1 << ordinal
+            for kind, tags in (('manual', manual), ('auto', auto)):
+                index = self.tags[kind]
+                for tag in tags:
+                    index[tag] = index.get(tag, 0) | bit
+                    self.customer_tags[ordinal].add((kind, tag))
+
+    def _clear(self, customer_id):
+        ordinal = self.ordinals.get(customer_id)
+        if ordinal is None:
+            return
+        mask = ~(1 << ordinal)
+        self.live &= mask
+        for kind, tag in self.customer_tags.pop(ordinal, ()):
+            index = self.tags[kind]
+            index[tag] &= mask
+            if not index[tag]:
+                del index[tag]
+
+    def remove_customer(self, customer_id):
+        """
+        Remove a customer from the index, e.g. after deleting it.
+
+        :param customer_id: the id of the customer
+        """
+        with self.lock:
+            self._clear(customer_id)
+
+    def tag_added(self, customer_id, tag, kind='manual'):
+        """
+        Record that a customer has a new tag.
+
+        :param customer_id: the id of the customer
+        :param tag: the tag added
+        :param kind: 'manual' or 'auto'
+        """
+        with self.lock:
+            index = self.tags[kind]
+            ordinal = self._ordinal(customer_id)
+            index[tag] = index.get(tag, 0) | 1 << ordinal
+            self.customer_tags[ordinal].add((kind, tag))
+
+    def tag_removed(self, customer_id, tag, kind='manual'):
+        """
+        Record that a customer doesn't have a tag anymore.
+
+        :param customer_id: the id of the customer
+        :param tag: the tag removed
+        :param kind: 'manual' or 'auto'
+        """
+        with self.lock:
+            ordinal = self.ordinals.get(customer_id)
+            index = self.tags[kind]
+            if ordinal is not None and (kind, tag) in self.customer_tags.get(ordinal, ()):
+                self.customer_tags[ordinal].discard((kind, tag))
+                index[tag] &= ~(1 << ordinal)
+                if not index[tag]:
+                    del index[tag]
+
+    def evaluate(self, segment):
+        """
+        :param segment: a Segment object, or a string for the segment of a manual tag
+        :return: the bitset, as an int, of the ordinals of the customers in the segment
+        """
+        if not isinstance(segment, Segment):
+            segment = Tag(segment)
+        with self.lock:
+            return segment.evaluate(self)
+
+    def count(self, segment):
+        """
+        :param segment: a Segment object, or a string for the segment of a manual tag
+        :return: the number of customers in the segment
+        """
+        return bin(self.evaluate(segment)).count('1')
+
+    def ids_of(self, segment):
+        """
+        :param segment: a Segment object, or a string for the segment of a manual tag
+        :return: the list of the ids of the customers in the segment, in the order they were indexed
+        """
+        bits = self.evaluate(segment)
+        return [self.ids[ordinal] for ordinal in _ordinals(bits)]
+
+    def fetch(self, node, segment, chunk_size=50, fields=None):
+        """
+        Fetch the customers in a segment, querying them by id in chunks.
+
+        :param node: the Node object of the customers
+        :param segment: a Segment object, or a string for the segment of a manual tag
+        :param chunk_size: the number of customers fetched for each request
+        :param fields: a list of strings representing the properties to include in the response
+        :return: a generator of the Customer objects in the segment
+        """
+        ids = self.ids_of(segment)
+        for i in range(0, len(ids), chunk_size):
+            query = node.query(Customer).filter(in_(ids[i:i + chunk_size], Customer.id))
+            for customer in query.all(size=chunk_size, fields=fields).iter_all():
+                yield customer
+
+    def __len__(self):
+        return bin(self.live).count('1')
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Optional tracing of the SDK operations. Install a tracer compatible with the OpenTelemetry API (an object with a
+`start_as_current_span(name, attributes=None)` method returning a context manager) with::
+
+    from opentelemetry import trace
+    from contacthub.lib import tracing
+
+    tracing.set_tracer(trace.get_tracer('contacthub'))
+
+Every public operation of Node, Customer, Event and Query opens a span, with child spans for the HTTP requests, the
+pages fetched, the JSON encoding and decoding and the hydration of the entities. When no tracer is installed, spans
+are not created at all.
+"""
+from functools import wraps
+
+tracer = None
+
+
+def set_tracer(new_tracer):
+    """
+    Install the tracer used for the spans of the SDK.
+
+    :param new_tracer: an OpenTelemetry compatible tracer, or None for disabling tracing
+    """
+    global tracer
+    tracer = new_tracer
+
+
+def get_tracer():
+    """
+    :return: the tracer installed, None if tracing is disabled
+    """
+    return tracer
+
+
+class _NoOpSpan(object):
+    """
+    Span and context manager doing nothing, used when tracing is disabled.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_NOOP_SPAN = _NoOpSpan()
+
+
+def span(name, **attributes):
+    """
+    Open a span with the installed tracer, as child of the current span.
+
+    :param name: the name of the span
+    :param attributes: the attributes of the span
+    :return: a context manager returning the span, doing nothing if tracing is disabled
+    """
+    if tracer is None:
+        return _NOOP_SPAN
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+def traced(function):
+    """
+    Decorator opening a span named after the qualified name of the function (e.g. Node.update_job) for every call.
+    When tracing is disabled, the function is called directly.
+    """
+    name = getattr(function, '__qualname__', function.__name__)
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if tracer is None:
+            return function(*args, **kwargs)
+        with tracer.start_as_current_span(name, attributes={}):
+            return function(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import threading
+
+
+class UpsertStrategy(object):
+    """
+    Strategy for inserting or updating customers identified by their external id, avoiding the POST, 409 (CONFLICT),
+    PATCH double round trip for the customers already known.
+
+    The strategy keeps a map from external ids to customer ids, filled with the known customers and learned from the
+    responses of the APIs, both from the customers created and from the conflicts. The same strategy can be reused
+    across batches: a customer met once is PATCHed directly the next time. If a known customer was deleted in the
+    meantime (404 on PATCH), the strategy forgets it and falls back to a POST.
+    """
+
+    def __init__(self, known=None):
+        """
+        :param known: an optional dictionary mapping the external ids of the customers already in the node to their ids
+        """
+        self.known = dict(known or {})
+        self.lock = threading.Lock()
+        self.posts = 0
+        self.direct_patches = 0
+        self.conflicts = 0
+        self.stale = 0
+
+    @classmethod
+    def from_customers(cls, customers):
+        """
+        Create a new UpsertStrategy knowing the given customers, e.g. the customers of a LocalMirror.
+
+        :param customers: an iterable of Customer objects or dictionaries, with id and externalId
+        :return: a new UpsertStrategy object
+        """
+        known = {}
+        for customer in customers:
+            attributes = customer if isinstance(customer, dict) else customer.attributes
+            if attributes.get('externalId') is not None:
+                known[attributes['externalId']] = attributes['id']
+        return cls(known=known)
+
+    def lookup(self, external_id):
+        """
+        :param external_id: the external id of a customer
+        :return: the id of the customer if known, None otherwise
+        """
+        if external_id is None:
+            return None
+        with self.lock:
+            return self.known.get(external_id)
+
+    def learn(self, external_id, customer_id):
+        """
+        Remember the id of the customer with the given external id.
+
+        :param external_id: the external id of the customer
+        :param customer_id: the id of the customer
+        """
+        if external_id is not None:
+            with self.lock:
+                self.known[external_id] = customer_id
+
+    def forget(self, external_id):
+        """
+        Forget the customer with the given external id.
+
+        :param external_id: the external id of the customer
+        """
+        with self.lock:
+            self.known.pop(external_id, None)
+
+    def record(self, outcome):
+        """
+        Count the outcome of an upsert.
+
+        :param outcome: 'posts', 'direct_patches', 'conflicts' or 'stale'
+        """
+        with self.lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    @property
+    def round_trips_saved(self):
+        """
+        The number of requests saved compared to always POSTing first: one for every direct PATCH, minus one for every
+        PATCH of a stale customer that had to be followed by a POST.
+        """
+        return self.direct_patches - self.stale
+
+    @property
+    def stats(self):
+        """
+        A dictionary with the count of customers created with a POST, updated with a direct PATCH, updated after a
+        conflict, known but not found, and the round trips saved.
+        """
+        with self.lock:
+            return {'posts': self.posts, 'direct_patches': self.direct_patches, 'conflicts': self.conflicts,
+                    'stale': self.stale, 'round_trips_saved': self.direct_patches - self.stale}
@@ -3,6 +3,8 @@ import json
 import datetime
 from copy import deepcopy
 
+from six import string_types
+
 
 class DateEncoder(json.JSONEncoder):
     """
@@ -146,3 +148,99 @@ def resolve_mutation_tracker(mutation_tracker):
                     update_dictionary[attr] = {}
                 update_dictionary = update_dictionary[attr]
     return body
+
+
+def parse_datetime(value):
+    """
+    Parse a date string coming from the APIs (e.g. '2017-03-02T12:12:53.074+0000' or '2017-03-02T12:12:53Z') in a
+    naive datetime object expressed in UTC. Datetime objects are returned unchanged.
+
+    :param value: a string representing a date in ISO 8601 format, or a datetime object
+    :return: a new datetime object representing the given value in UTC
+    """
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+    offset = datetime.timedelta(0)
+    if value.endswith('Z'):
+        value = value[:-1]
+    elif len(value) > 19 and value[-5] in '+-' and value[-4:].isdigit():
+        sign = 1 if value[-5] == '+' else -1
+        offset = sign * datetime.timedelta(hours=int(value[-4:-2]), minutes=int(value[-2:]))
+        value = value[:-5]
+    elif len(value) > 19 and value[-6] in '+-' and value[-3] == ':':
+        sign = 1 if value[-6] == '+' else -1
+        offset = sign * datetime.timedelta(hours=int(value[-5:-3]), minutes=int(value[-2:]))
+        value = value[:-6]
+    for date_format in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(value, date_format) - offset
+        except ValueError:
+            pass
+    raise ValueError("Unknown date format: %s" % value)
+
+
+READ_ONLY_ATTRIBUTES = ('id', 'nodeId', 'registeredAt', 'updatedAt')
+
+
+def _is_empty(value):
+    return value is None or value == [] or value == {}
+
+
+def _same_value(current, desired):
+    """
+    Compare a value of the APIs with a desired one. Empty values (None, empty lists and dictionaries) are equivalent,
+    and dates are compared as datetimes, whatever their format.
+
+    :param current: the value returned by the APIs
+    :param desired: the desired value
+    :return: True if the two values are equivalent
+    """
+    if _is_empty(current) and _is_empty(desired):
+        return True
+    if isinstance(desired, dict) and isinstance(current, dict):
+        keys = set(k for k in desired if not _is_empty(desired[k]))
+        keys.update(k for k in current if not _is_empty(current[k]))
+        return all(_same_value(current.get(k), desired.get(k)) for k in keys)
+    if isinstance(desired, (list, tuple)) and isinstance(current, (list, tuple)):
+        return len(desired) == len(current) and all(_same_value(c, d) for c, d in zip(current, desired))
+    if current == desired:
+        return True
+    if isinstance(current, string_types) and isinstance(desired, (string_types, datetime.date)):
+        try:
+            return parse_datetime(current) == parse_datetime(desired)
+        except (ValueError, IndexError):
+            return False
+    return False
+
+
+def diff_attributes(current, desired, read_only=READ_ONLY_ATTRIBUTES):
+    """
+    Compute the minimal PATCH body turning the current attributes of an entity in the desired ones:
+
+    - nested dictionaries (e.g. base, extended, tags) are compared recursively, and only their changed keys are sent
+    - lists (e.g. tags, jobs, likes) are sent whole if any of their elements changed
+    - the keys present in the current attributes but not in the desired ones are set to None
+    - the read only attributes are ignored
+
+    :param current: a dictionary with the current attributes, as returned by the APIs
+    :param desired: a dictionary with the full desired attributes
+    :param read_only: the top level attributes that cannot be updated
+    :return: a dictionary containing the PATCH body, empty if the attributes are equivalent
+    """
+    body = {}
+    for key, value in desired.items():
+        if key in read_only:
+            continue
+        old = current.get(key)
+        if isinstance(value, dict) and isinstance(old, dict):
+            nested = diff_attributes(old, value, read_only=())
+            if nested:
+                body[key] = nested
+        elif not _same_value(old, value):
+            body[key] = value
+    for key, value in current.items():
+        if key not in desired and key not in read_only and not _is_empty(value):
+            body[key] = None
+    return body
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import threading
 from copy import deepcopy
 
 from contacthub._api_manager._api_customer import _CustomerAPIManager
@@ -6,6 +7,7 @@ from contacthub._api_manager._api_event import _EventAPIManager
 from contacthub.errors.operation_not_permitted import OperationNotPermitted
 from contacthub.lib.paginated_list import PaginatedList
 from contacthub.lib.read_only_list import ReadOnlyList
+from contacthub.lib.tracing import traced
 from contacthub.lib.utils import generate_mutation_tracker, convert_properties_obj_in_prop, \
     resolve_mutation_tracker, remove_empty_attributes
 from contacthub.models.event import Event
@@ -19,7 +21,7 @@ class Customer(with_metaclass(EntityMeta, object)):
     """
     Customer entity definition
     """
-    __attributes__ = ('attributes', 'node', 'customer_api_manager', 'event_api_manager', 'mute')
+    __attributes__ = ('attributes', 'node', 'customer_api_manager', 'event_api_manager', 'mute', 'lock')
 
     def __init__(self, node, default_attributes=None, **attributes):
         """
@@ -60,9 +62,25 @@ class Customer(with_metaclass(EntityMeta, object)):
             self.attributes = default_attributes
 
         self.node = node
-        self.customer_api_manager = _CustomerAPIManager(node=self.node)
-        self.event_api_manager = _EventAPIManager(node=self.node)
+        self.customer_api_manager = _CustomerAPIManager.for_node(self.node)
+        self.event_api_manager = _EventAPIManager.for_node(self.node)
         self.mute = {}
+        self.lock = threading.RLock()
+
+    def __getstate__(self):
+        """
+        The state for pickling this Customer, without its lock.
+        """
+        state = self.__dict__.copy()
+        state.pop('lock', None)
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore a pickled Customer, with a new lock.
+        """
+        self.__dict__.update(state)
+        self.__dict__['lock'] = threading.RLock()
 
     @classmethod
     def from_dict(cls, node, attributes=None):
@@ -85,7 +103,8 @@ class Customer(with_metaclass(EntityMeta, object)):
         :rtype: dict
         :return: a new dictionary representing the attributes of this Customer
         """
-        return deepcopy(self.attributes)
+        with self.lock:
+            return deepcopy(self.attributes)
 
     def __getattr__(self, item):
         """
@@ -113,20 +132,22 @@ class Customer(with_metaclass(EntityMeta, object)):
         if attr in self.__attributes__:
             return super(Customer, self).__setattr__(attr, val)
         else:
-            if isinstance(val, Properties):
-                try:
-                    tracker = generate_mutation_tracker(self.attributes[attr], val.attributes)
-                    for key in val.attributes:
-                        if key not in tracker or (key in tracker and val.attributes[key]):
-                            tracker[key] = val.attributes[key]
-                    self.mute[attr] = tracker
-                except KeyError:
-                    self.mute[attr] = val.attributes
-                self.attributes[attr] = val.attributes
-            else:
-                self.attributes[attr] = val
-                self.mute[attr] = val
-
+            with self.lock:
+                if isinstance(val, Properties):
+                    try:
+                        tracker = generate_mutation_tracker(self.attributes[attr], val.attributes)
+                        for key in val.attributes:
+                            if key not in tracker or (key in tracker and val.attributes[key]):
+                                tracker[key] = val.attributes[key]
+                        self.mute[attr] = tracker
+                    except KeyError:
+                        self.mute[attr] = val.attributes
+                    self.attributes[attr] = val.attributes
+                else:
+                    self.attributes[attr] = val
+                    self.mute[attr] = val
+
+    @traced
     def get_events(self):
         """
         Get all the events associated to this Customer.
@@ -139,41 +160,59 @@ class Customer(with_metaclass(EntityMeta, object)):
                                  customer_id=self.attributes['id'])
         raise OperationNotPermitted('Cannot retrieve events from a new customer created.')
 
-    def post(self, force_update=False):
+    @traced
+    def post(self, force_update=False, upsert_strategy=None):
         """
         Post this Customer in the associated Node.
 
         :param force_update: if it's True and the customer already exists in the node, patch the customer with the
                              modified properties.
+        :param upsert_strategy: an UpsertStrategy object, for patching directly the customer if its external id is
+                                already known. It implies force_update
         """
-        self.attributes.pop('registeredAt', None)
-        self.attributes.pop('updatedAt', None)
-        self.attributes.pop('id', None)
-        body = remove_empty_attributes(self.attributes)
-        self.customer_api_manager.post(body=body, force_update=force_update)
+        with self.lock:
+            self.attributes.pop('registeredAt', None)
+            self.attributes.pop('updatedAt', None)
+            self.attributes.pop('id', None)
+            body = remove_empty_attributes(self.attributes)
+        if upsert_strategy is not None:
+            self.customer_api_manager.post(body=body, force_update=force_update, upsert_strategy=upsert_strategy)
+        else:
+            self.customer_api_manager.post(body=body, force_update=force_update)
 
+    @traced
     def delete(self):
         """
         Delete this customer from the associated Node.
         """
         self.customer_api_manager.delete(_id=self.attributes['id'])
 
+    @traced
     def patch(self):
         """
         Patch this customer in the associated node, updating his attributes with the modified ones.
+        If the node coalesces the patches, the patch is scheduled instead of being sent immediately.
         """
-        tracker = resolve_mutation_tracker(self.mute)
-        self.customer_api_manager.patch(_id=self.attributes['id'], body=tracker)
+        with self.lock:
+            tracker = deepcopy(resolve_mutation_tracker(self.mute))
+        if getattr(self.node, 'patch_coalescer', None) is not None:
+            self.node.patch_coalescer.patch(self.attributes['id'], tracker)
+        else:
+            self.customer_api_manager.patch(_id=self.attributes['id'], body=tracker)
 
+    @traced
     def put(self):
         """
         Put this customer in the associated node, substituting all the old attributes with the ones in this Customer.
         """
-        body = deepcopy(self.attributes)
+        with self.lock:
+            body = deepcopy(self.attributes)
         body.pop('registeredAt', None)
         body.pop('updatedAt', None)
         if 'base' in body and 'timezone' in body['base'] and body['base']['timezone'] is None:
             body['base']['timezone'] = 'Europe/Rome'
+        if getattr(self.node, 'patch_coalescer', None) is not None:
+            self.node.patch_coalescer.flush(self.attributes['id'])
         self.customer_api_manager.put(_id=self.attributes['id'], body=body)
 
     def get_mutation_tracker(self):
@@ -183,7 +222,8 @@ class Customer(with_metaclass(EntityMeta, object)):
         :rtype: dict
         :return: the mutation tracker of this customer
         """
-        return resolve_mutation_tracker(self.mute)
+        with self.lock:
+            return resolve_mutation_tracker(self.mute)
 
     class OTHER_CONTACT_TYPES:
         """
@@ -19,7 +19,7 @@ class Education(object):
         """
         self.customer = customer
         self.attributes = attributes
-        self.customer_api_manager = _CustomerAPIManager(node=customer.node)
+        self.customer_api_manager = _CustomerAPIManager.for_node(customer.node)
         self.entity_name = 'educations'
         self.parent_attr = parent_attr
         self.properties_class = properties_class
@@ -69,11 +69,12 @@ class Education(object):
         if attr in self.__attributes__:
             return super(Education, self).__setattr__(attr, val)
         else:
-            self.attributes[attr] = val
-            if self.parent_attr:
-                attr = self.parent_attr.split('.')[-1:][0]
-                base_attr = self.parent_attr.split('.')[-2:][0]
-                self.customer.mute[base_attr + '.' + attr] = self.customer.attributes[base_attr][attr]
+            with self.customer.lock:
+                self.attributes[attr] = val
+                if self.parent_attr:
+                    attr = self.parent_attr.split('.')[-1:][0]
+                    base_attr = self.parent_attr.split('.')[-2:][0]
+                    self.customer.mute[base_attr + '.' + attr] = self.customer.attributes[base_attr][attr]
 
     def post(self):
         """
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from copy import deepcopy
 from contacthub._api_manager._api_event import _EventAPIManager
+from contacthub.lib.tracing import traced
 from contacthub.lib.utils import convert_properties_obj_in_prop
 from contacthub.models import Properties
 
@@ -21,7 +22,7 @@ class Event(object):
         convert_properties_obj_in_prop(properties=attributes, properties_class=Properties)
         self.attributes = attributes
         self.node = node
-        self.event_api_manager = _EventAPIManager(node=self.node)
+        self.event_api_manager = _EventAPIManager.for_node(self.node)
 
     @classmethod
     def from_dict(cls, node, attributes=None):
@@ -79,6 +80,7 @@ class Event(object):
                 else:
                     self.attributes[attr] = val
 
+    @traced
     def post(self):
         """
         Post this Event in the associated Node.
@@ -92,7 +94,10 @@ class Event(object):
         """
         if 'bringBackProperties' in self.attributes and not 'nodeId' in self.attributes['bringBackProperties']:
             self.attributes['bringBackProperties']['nodeId'] = self.node.node_id
-        self.event_api_manager.post(body=self.attributes)
+        if getattr(self.node, 'event_spool', None) is not None:
+            self.node.event_spool.append(self.attributes)
+        else:
+            self.event_api_manager.post(body=self.attributes)
 
 
     class TYPES:
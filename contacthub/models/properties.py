@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import threading
 from copy import deepcopy
 from contacthub.lib.read_only_list import ReadOnlyList
 from contacthub.lib.utils import generate_mutation_tracker, convert_properties_obj_in_prop
@@ -14,7 +15,7 @@ class Properties(object):
     """
     __SUBPROPERTIES_LIST__ = {'educations': Education, 'likes': Like, 'jobs': Job, 'subscriptions': Subscription}
 
-    __attributes__ = ('attributes', 'parent_attr', 'mute', 'parent')
+    __attributes__ = ('attributes', 'parent_attr', 'mute', 'parent', 'lock')
 
     def __init__(self, parent=None, parent_attr=None, **attributes):
         """
@@ -28,8 +29,12 @@ class Properties(object):
         if self.parent:
             try:
                 self.mute = parent.mute
+                self.lock = parent.lock
             except AttributeError:
                 self.mute = parent.customer.mute
+                self.lock = parent.customer.lock
+        else:
+            self.lock = threading.RLock()
 
         convert_properties_obj_in_prop(properties=attributes, properties_class=Properties)
         self.attributes = attributes
@@ -37,6 +42,23 @@ class Properties(object):
     def __repr__(self):
         return str(self.attributes)
 
+    def __getstate__(self):
+        """
+        The state for pickling this Properties object, without its lock.
+        """
+        state = self.__dict__.copy()
+        state.pop('lock', None)
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore a pickled Properties object, sharing again the lock of its parent or with a new lock.
+        """
+        self.__dict__.update(state)
+        parent = state.get('parent')
+        lock = getattr(parent, 'lock', None) or getattr(getattr(parent, 'customer', None), 'lock', None)
+        self.__dict__['lock'] = lock or threading.RLock()
+
     @classmethod
     def from_dict(cls, parent=None, parent_attr=None, attributes=None):
         """
@@ -99,36 +121,37 @@ class Properties(object):
         if attr in self.__attributes__:
             return super(Properties, self).__setattr__(attr, val)
         else:
-            if isinstance(val, Properties):
-                if self.parent:
-                    try:
-                        mutations = generate_mutation_tracker(self.attributes[attr], val.attributes)
-                        update_tracking_with_new_prop(mutations, val.attributes)
-                        self.mute[self.parent_attr + '.' + attr] = mutations
-                    except KeyError as e:
-                        self.mute[attr] = val.attributes
-                self.attributes[attr] = val.attributes
-            else:
-                if isinstance(val, list):
-                    self.attributes[attr] = []
-                    for elem in val:
+            with self.lock:
+                if isinstance(val, Properties):
+                    if self.parent:
                         try:
-                            self.attributes[attr] += [elem.attributes]
-                        except AttributeError as e:
-                            self.attributes[attr] += [elem]
+                            mutations = generate_mutation_tracker(self.attributes[attr], val.attributes)
+                            update_tracking_with_new_prop(mutations, val.attributes)
+                            self.mute[self.parent_attr + '.' + attr] = mutations
+                        except KeyError as e:
+                            self.mute[attr] = val.attributes
+                    self.attributes[attr] = val.attributes
                 else:
-                    self.attributes[attr] = val
-                if self.parent:
-                    field = self.parent_attr.split('.')[-1:][0]
-                    if isinstance(self.parent.attributes[field], list):
-                        self.mute[self.parent_attr] = self.parent.attributes[field]
-                    elif isinstance(self.parent.attributes[field][attr], list):
-                        if self.parent_attr in self.mute:
-                            self.mute[self.parent_attr][attr] = self.parent.attributes[field][attr]
-                        else:
-                            self.mute[self.parent_attr + '.' + attr] = self.parent.attributes[field][attr]
+                    if isinstance(val, list):
+                        self.attributes[attr] = []
+                        for elem in val:
+                            try:
+                                self.attributes[attr] += [elem.attributes]
+                            except AttributeError as e:
+                                self.attributes[attr] += [elem]
                     else:
-                        self.mute[self.parent_attr + '.' + attr] = val
+                        self.attributes[attr] = val
+                    if self.parent:
+                        field = self.parent_attr.split('.')[-1:][0]
+                        if isinstance(self.parent.attributes[field], list):
+                            self.mute[self.parent_attr] = self.parent.attributes[field]
+                        elif isinstance(self.parent.attributes[field][attr], list):
+                            if self.parent_attr in self.mute:
+                                self.mute[self.parent_attr][attr] = self.parent.attributes[field][attr]
+                            else:
+                                self.mute[self.parent_attr + '.' + attr] = self.parent.attributes[field][attr]
+                        else:
+                            self.mute[self.parent_attr + '.' + attr] = val
 
 
 def update_tracking_with_new_prop(mutations, new_properties):
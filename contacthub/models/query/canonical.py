@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+
+import six
+
+from contacthub.lib.utils import DateEncoder
+
+
+class CompiledQuery(dict):
+    """
+    The immutable dictionary of a query ready for the APIs, caching its JSON serialization in `serialized`, reused for
+    every page and retry of the requests. The nested dictionaries and lists are shared among queries: they must never
+    be modified.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CompiledQuery, self).__init__(*args, **kwargs)
+        self._serialized = None
+
+    @property
+    def serialized(self):
+        """
+        The JSON string of this query, computed once.
+        """
+        if self._serialized is None:
+            self._serialized = json.dumps(self, cls=DateEncoder)
+        return self._serialized
+
+    @staticmethod
+    def not_implemented(*args, **kwargs):
+        """
+        Raise a new ValueError for blocking the changes to the query.
+        """
+        raise ValueError("Read Only query")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = not_implemented
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return CompiledQuery, (dict(self),)
+
+
+def freeze(value):
+    """
+    Convert a JSON-like value in a hashable one, equal for equal values whatever the order of the keys. The scalar
+    values are paired with their type, since values equal in Python, like 1, 1.0 and True, have different JSON
+    serializations.
+
+    :param value: a dictionary, a list or a scalar value
+    :return: a hashable representation of the value
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    kind = 'str' if isinstance(value, six.string_types) else type(value).__name__
+    try:
+        hash(value)
+        return kind, value
+    except TypeError:
+        return kind, repr(value)
+
+
+def _unique(elements):
+    seen = set()
+    unique = []
+    for element in elements:
+        key = freeze(element)
+        if key not in seen:
+            seen.add(key)
+            unique.append(element)
+    return unique
+
+
+def canonical_condition(condition):
+    """
+    Get the canonical form of the condition of a simple query: the composite conditions nested in a composite
+    condition with the same conjunction are flattened, the duplicated conditions are removed and the keys follow a
+    fixed order. The values of the atomic conditions are copied.
+
+    :param condition: a dictionary representing an atomic or composite condition
+    :return: a new dictionary representing the same condition in canonical form
+    """
+    if condition.get('type') == 'composite':
+        conjunction = condition['conjunction']
+        conditions = []
+        for child in condition['conditions']:
+            child = canonical_condition(child)
+            if child.get('type') == 'composite' and child['conjunction'] == conjunction:
+                conditions.extend(child['conditions'])
+            else:
+                conditions.append(child)
+        conditions = _unique(conditions)
+        if len(conditions) == 1:
+            return conditions[0]
+        return {'type': 'composite', 'conditions': conditions, 'conjunction': conjunction}
+    if condition.get('type') == 'atomic':
+        atomic = {'type': 'atomic', 'attribute': condition['attribute'], 'operator': condition['operator']}
+        if 'value' in condition:
+            #  a copy, since the compiled queries are cached and shared: a later change to the list of values of the
+            #  caller must not reach them
+            atomic['value'] = deepcopy(condition['value'])
+        return atomic
+    return condition
+
+
+def canonical_query(query):
+    """
+    Get the canonical form of a simple or combined query: the conditions are in canonical form, the combined queries
+    nested in a combined query with the same conjunction are flattened and the duplicated queries are removed.
+
+    :param query: a dictionary representing a simple or combined query
+    :return: a new dictionary representing the same query in canonical form
+    """
+    if query.get('type') == 'simple':
+        return {'type': 'simple', 'name': query.get('name', 'query'),
+                'are': {'condition': canonical_condition(query['are']['condition'])}}
+    if query.get('type') == 'combined':
+        conjunction = query['conjunction']
+        queries = []
+        for child in query['queries']:
+            child = canonical_query(child)
+            if child.get('type') == 'combined' and child['conjunction'] == conjunction:
+                queries.extend(child['queries'])
+            else:
+                queries.append(child)
+        queries = _unique(queries)
+        if len(queries) == 1:
+            return queries[0]
+        return {'type': 'combined', 'name': query.get('name', 'query'), 'conjunction': conjunction,
+                'queries': queries}
+    return query
+
+
+_CACHE_SIZE = 256
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compile_inner_query(inner_query):
+    """
+    Get the CompiledQuery of a query in canonical form. The compiled queries are kept in a small LRU cache, so building
+    again an equal query (e.g. in every request of a web application) reuses its serialization.
+
+    :param inner_query: a dictionary representing a simple or combined query in canonical form
+    :return: a CompiledQuery object, ready to be sent to the APIs
+    """
+    key = freeze(inner_query)
+    with _cache_lock:
+        compiled = _cache.pop(key, None)
+        if compiled is None:
+            compiled = CompiledQuery(name='query', query=inner_query)
+        _cache[key] = compiled
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return compiled
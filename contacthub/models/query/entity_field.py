@@ -16,6 +16,8 @@ class EntityField(object):
         """
         self.entity = entity
         self.field = field
+        #  the dotted path of the attribute, computed once for every query using this field
+        self._path = entity._path + '.' + field if isinstance(entity, EntityField) else field
 
     def __getattr__(self, item):
         """
@@ -77,3 +79,14 @@ class EntityField(object):
         :return:  a new Criterion object representing the criteria for querying data
         """
         return Criterion(self, Criterion.SIMPLE_OPERATORS.GTE, other)
+
+
+def get_attribute_path(entity_field):
+    """
+    Get the dotted path of the attribute represented by an EntityField, following its chain up to the entity class.
+    For example, the path of `Customer.base.contacts.email` is 'base.contacts.email'
+
+    :param entity_field: the EntityField object representing the attribute
+    :return: a string containing the dotted path of the attribute
+    """
+    return entity_field._path
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from contacthub.lib.utils import parse_datetime
+from contacthub.models.query.criterion import Criterion
+from contacthub.models.query.entity_field import get_attribute_path
+
+
+def compile_query(query):
+    """
+    Compile a simple or a combined query for the APIs in a predicate, for evaluating it locally on customers.
+
+    :param query: a dictionary representing a simple or a combined query, like the `inner_query` of a Query object
+    :return: a function taking a Customer object or a dictionary of attributes and returning True if it satisfies the
+        query
+    """
+    if query is None:
+        return lambda element: True
+    if query['type'] == 'combined':
+        predicates = [compile_query(q) for q in query['queries']]
+        if query['conjunction'] == 'INTERSECT':
+            return _all(predicates)
+        return _any(predicates)
+    return compile_condition(query['are']['condition'])
+
+
+def compile_condition(condition):
+    """
+    Compile an atomic or a composite condition for the APIs in a predicate, for evaluating it locally on customers.
+
+    :param condition: a dictionary representing an atomic or a composite condition
+    :return: a function taking a Customer object or a dictionary of attributes and returning True if it satisfies the
+        condition
+    """
+    if condition['type'] == 'composite':
+        predicates = [compile_condition(c) for c in condition['conditions']]
+        if condition['conjunction'] == Criterion.COMPLEX_OPERATORS.AND:
+            return _all(predicates)
+        return _any(predicates)
+    return _compile_atomic(condition['attribute'], condition['operator'], condition.get('value'))
+
+
+def compile_criterion(criterion):
+    """
+    Compile a Criterion object in a predicate, for evaluating it locally on customers.
+
+    :param criterion: the Criterion object to compile
+    :return: a function taking a Customer object or a dictionary of attributes and returning True if it satisfies the
+        criterion
+    """
+    if criterion.operator in Criterion.COMPLEX_OPERATORS.OPERATORS:
+        predicates = [compile_criterion(criterion.first_element), compile_criterion(criterion.second_element)]
+        if criterion.operator == Criterion.COMPLEX_OPERATORS.AND:
+            return _all(predicates)
+        return _any(predicates)
+    return _compile_atomic(get_attribute_path(criterion.first_element), criterion.operator, criterion.second_element)
+
+
+def _all(predicates):
+    if len(predicates) == 2:
+        first, second = predicates
+        return lambda element: first(element) and second(element)
+    return lambda element: all(predicate(element) for predicate in predicates)
+
+
+def _any(predicates):
+    if len(predicates) == 2:
+        first, second = predicates
+        return lambda element: first(element) or second(element)
+    return lambda element: any(predicate(element) for predicate in predicates)
+
+
+def _getter(attribute):
+    """
+    Create a function for reading a dotted attribute from a Customer object or a dictionary of attributes.
+    A missing attribute is read as None, an attribute inside a list of objects is read as the list of its values.
+
+    :param attribute: the dotted path of the attribute
+    :return: a function taking a Customer object or a dictionary and returning the value of the attribute
+    """
+    keys = attribute.split('.')
+
+    def get(element, keys=keys):
+        value = element if isinstance(element, dict) else element.attributes
+        for index, key in enumerate(keys):
+            if isinstance(value, dict):
+                value = value.get(key)
+            elif isinstance(value, list):
+                values = []
+                for item in value:
+                    item_value = get(item, keys[index:])
+                    if isinstance(item_value, list):
+                        values.extend(item_value)
+                    elif item_value is not None:
+                        values.append(item_value)
+                return values
+            else:
+                return None
+        return value
+    return get
+
+
+def _coercer(value):
+    """
+    Create a function for converting the values of an attribute in values comparable with the given one: when the
+    value of the criterion is a date or a datetime, the date strings of the customers are parsed.
+
+    :param value: the value of the criterion
+    :return: a function converting an attribute value, or raising ValueError if it is not comparable
+    """
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return lambda v: v if isinstance(v, datetime.datetime) else parse_datetime(v)
+    return lambda v: v
+
+
+def _comparison(compare, coerce):
+    """
+    Create a function comparing an attribute value with the value of the criterion. For list attributes, the
+    comparison is satisfied if any of the elements satisfies it. Values not comparable never satisfy it.
+    """
+    def test(attribute_value):
+        values = attribute_value if isinstance(attribute_value, list) else [attribute_value]
+        for v in values:
+            if v is None:
+                continue
+            try:
+                if compare(coerce(v)):
+                    return True
+            except (TypeError, ValueError):
+                pass
+        return False
+    return test
+
+
+def _compile_atomic(attribute, operator, value):
+    """
+    Compile an atomic condition in a predicate.
+
+    :param attribute: the dotted path of the attribute
+    :param operator: one of the Criterion.SIMPLE_OPERATORS
+    :param value: the value of the condition
+    :return: a function taking a Customer object or a dictionary and returning True if it satisfies the condition
+    """
+    get = _getter(attribute)
+    operators = Criterion.SIMPLE_OPERATORS
+
+    if operator == operators.IS_NULL:
+        return lambda element: get(element) is None
+    if operator == operators.IS_NOT_NULL:
+        return lambda element: get(element) is not None
+
+    if operator in (operators.IN, operators.NOT_IN):
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        values = set(parse_datetime(v) if isinstance(v, datetime.date) else v for v in values)
+        coerce = _coercer(next(iter(values), None))
+
+        def contained(element):
+            attribute_value = get(element)
+            if attribute_value is None:
+                return False
+            attribute_values = attribute_value if isinstance(attribute_value, list) else [attribute_value]
+            for v in attribute_values:
+                try:
+                    if coerce(v) in values:
+                        return True
+                except (TypeError, ValueError):
+                    pass
+            return False
+        if operator == operators.IN:
+            return contained
+        return lambda element: not contained(element)
+
+    if operator == operators.BETWEEN:
+        lower, upper = value
+        coerce = _coercer(lower)
+        lower, upper = coerce(lower), coerce(upper)
+        test = _comparison(lambda v: lower <= v <= upper, coerce)
+        return lambda element: test(get(element))
+
+    coerce = _coercer(value)
+    value = coerce(value)
+    comparisons = {operators.EQUALS: lambda v: v == value,
+                   operators.NOT_EQUALS: lambda v: v == value,
+                   operators.GT: lambda v: v > value,
+                   operators.GTE: lambda v: v >= value,
+                   operators.LT: lambda v: v < value,
+                   operators.LTE: lambda v: v <= value}
+    if operator not in comparisons:
+        raise ValueError('Unknown operator %s' % operator)
+    test = _comparison(comparisons[operator], coerce)
+    if operator == operators.NOT_EQUALS:
+        return lambda element: not test(get(element))
+    return lambda element: test(get(element))
@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 from contacthub._api_manager._api_customer import _CustomerAPIManager
 from contacthub.errors.operation_not_permitted import OperationNotPermitted
+from contacthub.lib.chunked_query import ChunkedQuery
 from contacthub.lib.paginated_list import PaginatedList
 from contacthub.lib.read_only_list import ReadOnlyList
+from contacthub.lib.tracing import traced
 from contacthub.models.customer import Customer
+from contacthub.models.query.canonical import canonical_query, compile_inner_query
 from contacthub.models.query.criterion import Criterion
-from copy import deepcopy
+from contacthub.models.query.entity_field import get_attribute_path
+from contacthub.models.query.evaluator import compile_query
 
 
 class Query(object):
@@ -15,6 +19,9 @@ class Query(object):
     Use this class for interact with the DeclarativeAPIManager Layer or APIManagerLevel and return the queried as object
     or json format variables
     """
+    #  IN and NOT_IN conditions with more values are split in chunks, retrieved by concurrent requests
+    MAX_IN_VALUES = 500
+    IN_CONCURRENCY = 8
 
     def __init__(self, node, entity, previous_query=None):
         """
@@ -26,6 +33,8 @@ class Query(object):
         self.entity = entity
         self.condition = None
         self.inner_query = None
+        self._predicate = None
+        self._compiled = None
         if previous_query:
             self.inner_query = previous_query
             if previous_query['type'] == 'simple':
@@ -42,12 +51,10 @@ class Query(object):
         :return: a new dictionary containing a combined query
         """
         if query2.inner_query['type'] == 'combined' and query2.inner_query['conjunction'] == operation:
-            query_ret = deepcopy(query2.inner_query)
-            query_ret['queries'].append(query1.inner_query)
+            query_ret = dict(query2.inner_query, queries=query2.inner_query['queries'] + [query1.inner_query])
         else:
             if query1.inner_query['type'] == 'combined' and query1.inner_query['conjunction'] == operation:
-                query_ret = deepcopy(query1.inner_query)
-                query_ret['queries'].append(query2.inner_query)
+                query_ret = dict(query1.inner_query, queries=query1.inner_query['queries'] + [query2.inner_query])
             else:
                 query_ret = {'type': 'combined', 'name': 'query', 'conjunction': operation,
                              'queries': [query1.inner_query, query2.inner_query]}
@@ -65,18 +72,66 @@ class Query(object):
         return Query(node=self.node, entity=self.entity,
                      previous_query=self._combine_query(query1=self, query2=other, operation='UNION'))
 
-    def all(self):
+    @property
+    def compiled(self):
+        """
+        The immutable dictionary sent to the APIs for this query in canonical form, None for an empty query: nested
+        AND/OR conditions and combined queries are flattened and duplicates are removed. Its JSON serialization is
+        computed once and reused for every page fetched; equal queries share the same compiled object.
+        """
+        if self._compiled is None and self.inner_query:
+            self._compiled = compile_inner_query(canonical_query(self.inner_query))
+        return self._compiled
+
+    @traced
+    def all(self, size=None, fields=None, raw=False):
         """
         Get all queried data of an entity from the API
 
-        :return: a ReadOnly list with all object queried
+        :param size: the size of the pages containing the queried entities
+        :param fields: a list of strings representing the properties to include in the response
+        :param raw: if True, the list contains the dictionaries returned by the APIs instead of entity objects
+        :return: a ReadOnly list with all object queried. If an IN or NOT_IN condition has more than `MAX_IN_VALUES`
+            values, the query is split as described in ChunkedQuery
         """
 
-        complete_query = {'name': 'query', 'query': self.inner_query} if self.inner_query else None
+        complete_query = self.compiled
+        kwargs = {}
+        if size:
+            kwargs['size'] = size
+        if fields:
+            kwargs['fields'] = fields
 
         if self.entity is Customer:
-            return PaginatedList(node=self.node, function=_CustomerAPIManager(self.node).get_all, entity_class=Customer,
-                                 query=complete_query)
+            function = _CustomerAPIManager.for_node(self.node).get_all
+            if complete_query:
+                function = ChunkedQuery.split(function, complete_query, self.MAX_IN_VALUES,
+                                              self.IN_CONCURRENCY) or function
+            return PaginatedList(node=self.node, function=function, entity_class=Customer, raw=raw,
+                                 query=complete_query, **kwargs)
+
+    def match(self, element):
+        """
+        Evaluate this query locally on a single entity, without calling the APIs.
+
+        :param element: a Customer object or a dictionary representing the attributes of a customer
+        :return: True if the element satisfies this query, False otherwise
+        """
+        if self._predicate is None:
+            self._predicate = compile_query(self.inner_query)
+        return self._predicate(element)
+
+    def evaluate(self, elements):
+        """
+        Evaluate this query locally on the given entities, without calling the APIs.
+
+        :param elements: an iterable of Customer objects or dictionaries representing the attributes of customers
+        :return: a list containing the elements satisfying this query
+        """
+        if self._predicate is None:
+            self._predicate = compile_query(self.inner_query)
+        predicate = self._predicate
+        return [element for element in elements if predicate(element)]
 
     def filter(self, criterion):
         """
@@ -92,13 +147,12 @@ class Query(object):
         if self.condition is None:
             new_query = self._filter(criterion)
         elif self.condition['type'] == 'atomic':
-            new_query = self._and_query(deepcopy(self.condition), self._filter(criterion=criterion))
+            new_query = self._and_query(self.condition, self._filter(criterion=criterion))
         else:
             if self.condition['conjunction'] == Criterion.COMPLEX_OPERATORS.AND:
-                new_query = deepcopy(self.condition)
-                new_query['conditions'].append(self._filter(criterion=criterion))
+                new_query = dict(self.condition, conditions=self.condition['conditions'] + [self._filter(criterion)])
             elif self.condition['conjunction'] == Criterion.COMPLEX_OPERATORS.OR:
-                new_query = self._and_query(deepcopy(self.condition), self._filter(criterion=criterion))
+                new_query = self._and_query(self.condition, self._filter(criterion=criterion))
         query_ret['are']['condition'] = new_query
         return Query(node=self.node, entity=self.entity, previous_query=query_ret)
 
@@ -126,21 +180,7 @@ class Query(object):
         """
         if criterion.operator in Criterion.SIMPLE_OPERATORS.OPERATORS:
             atomic_query = {'type': 'atomic'}
-            entity_field = criterion.first_element
-            fields = [entity_field.field]
-
-            while not type(entity_field.entity) is type(self.entity):
-                entity_field = entity_field.entity
-                fields.append(entity_field.field)
-
-            attribute = ''
-            for field in reversed(fields):
-                attribute += field
-                attribute += '.'
-
-            attribute = attribute[:-1]
-
-            atomic_query['attribute'] = attribute
+            atomic_query['attribute'] = get_attribute_path(criterion.first_element)
             atomic_query['operator'] = criterion.operator
             if criterion.second_element:
                 atomic_query['value'] = criterion.second_element
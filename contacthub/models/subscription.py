@@ -22,7 +22,7 @@ class Subscription(object):
         """
         self.customer = customer
         self.attributes = attributes
-        self.customer_api_manager = _CustomerAPIManager(node=customer.node)
+        self.customer_api_manager = _CustomerAPIManager.for_node(customer.node)
         self.entity_name = 'subscriptions'
         self.parent_attr = parent_attr
         self.properties_class = properties_class
@@ -80,19 +80,20 @@ class Subscription(object):
         if attr in self.__attributes__:
             return super(Subscription, self).__setattr__(attr, val)
         else:
-            if isinstance(val, list):
-                self.attributes[attr] = []
-                for elem in val:
-                    try:
-                        self.attributes[attr] += [elem.attributes]
-                    except AttributeError:
-                        self.attributes[attr] += [elem]
-            else:
-                self.attributes[attr] = val
-            if self.parent_attr:
-                attr = self.parent_attr.split('.')[-1:][0]
-                base_attr = self.parent_attr.split('.')[-2:][0]
-                self.customer.mute[base_attr + '.' + attr] = self.customer.attributes[base_attr][attr]
+            with self.customer.lock:
+                if isinstance(val, list):
+                    self.attributes[attr] = []
+                    for elem in val:
+                        try:
+                            self.attributes[attr] += [elem.attributes]
+                        except AttributeError:
+                            self.attributes[attr] += [elem]
+                else:
+                    self.attributes[attr] = val
+                if self.parent_attr:
+                    attr = self.parent_attr.split('.')[-1:][0]
+                    base_attr = self.parent_attr.split('.')[-2:][0]
+                    self.customer.mute[base_attr + '.' + attr] = self.customer.attributes[base_attr][attr]
 
     def post(self):
         """
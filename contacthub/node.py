@@ -1,8 +1,20 @@
 # -*- coding: utf-8 -*-
 from contacthub._api_manager._api_customer import _CustomerAPIManager
 from contacthub._api_manager._api_event import _EventAPIManager
+from contacthub.lib.bulk import update_tags_bulk
+from contacthub.lib.customer_scan import CustomerScan
+from contacthub.lib.customer_sync import CustomerSync
+from contacthub.lib.exporters import export_elements
+from contacthub.lib.importer import FileImporter
+from contacthub.lib.jobs import ExportJob, ImportJob
 from contacthub.lib.paginated_list import PaginatedList
-from contacthub.lib.utils import resolve_mutation_tracker, convert_properties_obj_in_prop
+from contacthub.lib.parallel_export import ParallelExport
+from contacthub.lib.event_spool import EventSpool
+from contacthub.lib.idempotency import EventDeduplicator
+from contacthub.lib.patch_coalescer import PatchCoalescer
+from contacthub.lib.tracing import traced
+from contacthub.lib.utils import resolve_mutation_tracker, convert_properties_obj_in_prop, diff_attributes, \
+    READ_ONLY_ATTRIBUTES
 from contacthub.models import Properties
 from contacthub.models.customer import Customer
 from contacthub.models.education import Education
@@ -11,6 +23,8 @@ from contacthub.models.job import Job
 from contacthub.models.like import Like
 from contacthub.models.query.query import Query
 import uuid
+from copy import deepcopy
+from datetime import timedelta
 
 from contacthub.models.subscription import Subscription
 
@@ -20,17 +34,25 @@ class Node(object):
     Node class for accessing data on a Contacthub node.
     """
 
-    def __init__(self, workspace, node_id):
+    def __init__(self, workspace, node_id, thread_safe=False):
         """
         :param workspace: A Workspace Object for authenticating on Contacthub
         :param node_id: The id of the Contacthub node
+        :param thread_safe: if True, the PaginatedList objects returned are never modified after their creation, so
+            they can be shared among threads. See the documentation about concurrency for the guarantees
         """
         self.workspace = workspace
         self.node_id = str(node_id)
+        self.thread_safe = thread_safe
         self.customer_api_manager = _CustomerAPIManager(node=self)
         self.event_api_manager = _EventAPIManager(node=self)
+        self.patch_coalescer = None
+        self.event_spool = None
+        self.event_deduplicator = None
+        self.tag_observers = []
 
-    def get_customers(self, external_id=None, page=None, size=None, fields=None):
+    @traced
+    def get_customers(self, external_id=None, page=None, size=None, fields=None, raw=False):
         """
         Get all the customers in this node
 
@@ -38,11 +60,221 @@ class Node(object):
         :param size: the size of the pages containing customers
         :param page: the number of the page for retrieve customer data
         :param fields: : a list of strings representing the properties to include in the response
+        :param raw: if True, the list contains the dictionaries returned by the APIs instead of Customer objects
         :return: A list containing Customer object of a node
         """
-        return PaginatedList(node=self, function=self.customer_api_manager.get_all, entity_class=Customer,
+        return PaginatedList(node=self, function=self.customer_api_manager.get_all, entity_class=Customer, raw=raw,
                              externalId=external_id, page=page, size=size, fields=fields)
 
+    def stream_customers(self, external_id=None, query=None, size=None, fields=None, raw=False):
+        """
+        Iterate over the customers in this node, decoding each page incrementally while it is received: the customers
+        are yielded one at a time, without keeping in memory the whole page. Useful with large page sizes::
+
+            for customer in node.stream_customers(size=1000):
+                ...
+
+        :param external_id: the external id of the customers to retrieve
+        :param query: a Query object for filtering the customers, all the customers if None
+        :param size: the size of the pages containing customers
+        :param fields: a list of strings representing the properties to include in the response
+        :param raw: if True, yield the dictionaries returned by the APIs instead of Customer objects
+        :return: a generator of the Customer objects of all the pages
+        """
+        kwargs = {'externalId': external_id, 'size': size, 'fields': fields}
+        if query is not None and query.inner_query:
+            kwargs['query'] = query.compiled
+        page_number = 0
+        while True:
+            elements = self.customer_api_manager.get_all_stream(page=page_number, **kwargs)
+            for element in elements:
+                yield element if raw else Customer(node=self, **element)
+            page = elements.metadata.get('page')
+            if not page or page['number'] >= page['totalPages'] - 1:
+                return
+            page_number = page['number'] + 1
+
+    @traced
+    def sync_customers(self, since=None, overlap=timedelta(minutes=1), size=None, fields=None):
+        """
+        Get the customers in this node updated since the given watermark. Iterate over the returned object for fetching
+        the updated customers page by page, then store its `watermark` attribute (or its `to_dict()`) for the next
+        synchronization::
+
+            sync = node.sync_customers(since=last_watermark)
+            for customer in sync:
+                ...
+            last_watermark = sync.watermark
+
+        :param since: the Watermark returned by the previous synchronization, its dictionary representation, a datetime
+            or a date string. If None, all the customers in this node are synchronized
+        :param overlap: a timedelta object representing the tolerated clock skew between the APIs and this machine.
+            The customers updated inside this window before the watermark are fetched again and de-duplicated on their
+            id and updatedAt
+        :param size: the size of the pages containing customers
+        :param fields: a list of strings representing the properties to include in the response
+        :return: a CustomerSync object, iterable over the Customer objects updated since the watermark
+        """
+        return CustomerSync(node=self, since=since, overlap=overlap, size=size, fields=fields)
+
+    def scan_customers(self, partitions=4, by='registeredAt', start=None, end=None, query=None, size=None, fields=None,
+                       concurrency=None, raw=False, cursor=None):
+        """
+        Scan all the customers in this node, splitting the dates of the `by` attribute in partitions with about the
+        same number of customers, retrieved concurrently. Store the `cursor` of the returned object for restarting an
+        interrupted scan::
+
+            scan = node.scan_customers(partitions=8, by='registeredAt')
+            for customer in scan:
+                ...
+                checkpoint = scan.cursor
+
+            for customer in node.scan_customers(cursor=checkpoint):
+                ...
+
+        :param partitions: the number of partitions
+        :param by: the date attribute of the partitions, e.g. 'registeredAt' or 'updatedAt'
+        :param start: a datetime object, the lower bound of the dates scanned
+        :param end: a datetime object, the upper bound of the dates scanned. If None, the time the scan starts
+        :param query: a Query object for filtering the customers, all the customers if None
+        :param size: the size of the pages containing customers
+        :param fields: a list of strings representing the properties to include in the response
+        :param concurrency: the maximum number of partitions retrieved at the same time, `partitions` if None
+        :param raw: if True, yield the dictionaries returned by the APIs instead of Customer objects
+        :param cursor: the `cursor` of a previous scan to restart
+        :return: a CustomerScan object, iterable over the customers of all the partitions
+        """
+        return CustomerScan(node=self, partitions=partitions, by=by, start=start, end=end, query=query, size=size,
+                            fields=fields, concurrency=concurrency, raw=raw, cursor=cursor)
+
+    def export(self, path, query=None, format='ndjson', fields=None, size=None):
+        """
+        Write the customers in this node in a file, streaming the pages and writing the dictionaries returned by the
+        APIs without creating Customer objects, so the memory used doesn't grow with the number of customers::
+
+            node.export('customers.csv', query=my_query, format='csv', fields=['id', 'base.contacts.email'])
+
+        :param path: the path of the output file
+        :param query: a Query object for filtering the customers, all the customers if None
+        :param format: 'ndjson' for a JSON document for each line, 'csv' for a CSV file with a column for each dotted
+            field, 'parquet' for a Parquet file (requires the pyarrow package)
+        :param fields: a list of strings representing the dotted fields to export. Required for 'csv' and 'parquet'
+        :param size: the size of the pages containing customers
+        :return: the number of customers written
+        """
+        return export_elements(self.stream_customers(query=query, size=size, fields=fields, raw=True), path,
+                               format=format, fields=fields)
+
+    def export_events(self, customer_id, path, format='ndjson', fields=None, size=None, event_type=None,
+                      context=None, event_mode=None, date_from=None, date_to=None):
+        """
+        Write the events of a customer in a file, writing the dictionaries returned by the APIs page by page without
+        creating Event objects.
+
+        :param customer_id: The id of the customer owner of the events
+        :param path: the path of the output file
+        :param format: 'ndjson', 'csv' or 'parquet', see `export`
+        :param fields: a list of strings representing the dotted fields to export, see `export`
+        :param size: the size of the pages containing events
+        :param event_type: the type of the event present in Event.TYPES
+        :param context: the context of the event present in Event.CONTEXT
+        :param event_mode: the mode of event, ACTIVE or PASSIVE
+        :param date_from: From string or datetime for search of event
+        :param date_to: From string or datetime for search of event
+        :return: the number of events written
+        """
+        events = self.get_events(customer_id=customer_id, event_type=event_type, context=context,
+                                 event_mode=event_mode, date_from=date_from, date_to=date_to, size=size, raw=True)
+        return export_elements(events.iter_all(), path, format=format, fields=fields)
+
+    def export_job(self, checkpoint, query=None, size=None, fields=None, partitions=None, by='registeredAt'):
+        """
+        Create a resumable export of the customers in this node, saving its progress in a checkpoint file after every
+        page. Running an interrupted job again resumes it from the last checkpoint::
+
+            job = node.export_job('export.checkpoint', size=200)
+            job.run(NDJSONWriter('customers.ndjson'))
+
+        :param checkpoint: the path of the checkpoint file
+        :param query: a Query object for filtering the customers, all the customers if None
+        :param size: the size of the pages containing customers
+        :param fields: a list of strings representing the properties to include in the response
+        :param partitions: the number of partitions of a scan by date (see `scan_customers`), None for exporting the
+            pages of a single query
+        :param by: the date attribute of the partitions
+        :return: an ExportJob object
+        """
+        return ExportJob(node=self, checkpoint=checkpoint, query=query, size=size, fields=fields, partitions=partitions,
+                         by=by)
+
+    def import_job(self, path, checkpoint, outcomes, function=None, batch_size=100, concurrency=8):
+        """
+        Create a resumable import of the records in a file with a JSON document for each line, saving its progress
+        and the outcome of each record after every batch. Running an interrupted job again resumes it from the first
+        batch not completed::
+
+            counts = node.import_job('customers.ndjson', 'import.checkpoint', 'outcomes.ndjson').run()
+
+        :param path: the path of the input file
+        :param checkpoint: the path of the checkpoint file
+        :param outcomes: the path of the file with the outcome of each record
+        :param function: a function receiving a record and returning the object imported. If None, each record is
+            added as a customer
+        :param batch_size: the number of records of each batch
+        :param concurrency: the maximum number of records imported at the same time
+        :return: an ImportJob object
+        """
+        return ImportJob(node=self, path=path, checkpoint=checkpoint, outcomes=outcomes, function=function,
+                         batch_size=batch_size, concurrency=concurrency)
+
+    def import_file(self, path, mapping=None, format=None, entity='customer', rejects=None, required=(),
+                    validate=None, batch_size=500, concurrency=8):
+        """
+        Import the customers or the events of a NDJSON or CSV file, streaming its rows and adding them with concurrent
+        threads, so the memory used doesn't grow with the size of the file::
+
+            result = node.import_file('partners.csv', mapping={'mail': 'base.contacts.email', 'code': 'externalId'},
+                                      required=['externalId'], rejects='rejected.ndjson')
+
+        :param path: the path of the input file
+        :param mapping: a dictionary (or a ColumnMapping) mapping the columns of the file to the dotted paths of the
+            attributes, or to tuples (dotted path, converter). If None, the rows are imported as they are
+        :param format: 'ndjson' or 'csv'. If None, it's taken from the extension of the file
+        :param entity: 'customer' or 'event'
+        :param rejects: the path of the file receiving the rejected rows with their errors
+        :param required: a list of dotted paths the records must have
+        :param validate: a function receiving a record and raising ValueError if it is not valid
+        :param batch_size: the number of rows validated and queued together
+        :param concurrency: the number of threads adding the records
+        :return: an ImportResult object with the number of rows read, imported and rejected
+        """
+        importer = FileImporter(node=self, mapping=mapping, entity=entity, required=required, validate=validate,
+                                batch_size=batch_size, concurrency=concurrency)
+        return importer.run(path, format=format, rejects=rejects)
+
+    def export_parallel(self, workers=4, transform=None, query=None, size=None, fields=None):
+        """
+        Export the customers in this node using a pool of processes, which retrieve, decode and hydrate the pages of
+        customers and apply the transform to each of them. Iterate over the returned object for the transformed
+        records::
+
+            def to_row(customer):
+                return customer.id, customer.base.contacts.email
+
+            for row in node.export_parallel(workers=4, transform=to_row, size=200):
+                ...
+
+        :param workers: the number of worker processes. With 1 worker, the export runs in the current process
+        :param transform: a picklable function (e.g. defined at module level) receiving a Customer object and returning
+            a picklable record. If None, the records are the dictionaries returned by the APIs
+        :param query: a Query object for filtering the customers, all the customers if None
+        :param size: the size of the pages containing customers
+        :param fields: a list of strings representing the properties to include in the response
+        :return: a ParallelExport object, iterable over the records in the order of the pages
+        """
+        return ParallelExport(node=self, workers=workers, transform=transform, query=query, size=size, fields=fields)
+
+    @traced
     def get_customer(self, id=None, external_id=None):
         """
         Retrieve a customer from the associated node by its id or external ID. Only one parameter can be specified for
@@ -66,6 +298,7 @@ class Node(object):
         else:
             return Customer(node=self, **self.customer_api_manager.get(_id=id))
 
+    @traced
     def query(self, entity):
         """
         Create a QueryBuilder object for a given entity, that allows to filter the entity's data
@@ -75,6 +308,7 @@ class Node(object):
         """
         return Query(node=self, entity=entity)
 
+    @traced
     def delete_customer(self, id, **attributes):
         """
         Delete the specified Customer from contacthub. For deleting an existing customer object, you should::
@@ -87,18 +321,25 @@ class Node(object):
         """
         return Customer(node=self, **self.customer_api_manager.delete(_id=id))
 
-    def add_customer(self, force_update=False, **attributes):
+    @traced
+    def add_customer(self, force_update=False, upsert_strategy=None, **attributes):
         """
         Add a new customer in contacthub. If the customer already exist and force update is true, this method will update
         the entire customer with new data
 
         :param attributes: the attributes for inserting the customer in the node
         :param force_update: a flag for update an already present customer
+        :param upsert_strategy: an UpsertStrategy object, for updating directly the customers already known by their
+            external id instead of trying to add them first. It implies force_update
         :return: the customer added or updated
         """
         convert_properties_obj_in_prop(properties=attributes, properties_class=Properties)
+        if upsert_strategy is not None:
+            return Customer(node=self, **self.customer_api_manager.post(body=attributes, force_update=force_update,
+                                                                        upsert_strategy=upsert_strategy))
         return Customer(node=self, **self.customer_api_manager.post(body=attributes, force_update=force_update))
 
+    @traced
     def update_customer(self, id, full_update=False, **attributes):
         """
         Update a customer in contacthub with new data. If full_update is true, this method will update the full customer (PUT)
@@ -107,15 +348,67 @@ class Node(object):
         :param id: the customer ID for updating the customer with new attributes
         :param full_update: a flag for execute a full update to the customer
         :param attributes: the attributes to patch or put in the customer
-        :return: the customer updated
+        :return: the customer updated, or None if the patch has been scheduled by the patch coalescer of this node
         """
         convert_properties_obj_in_prop(properties=attributes, properties_class=Properties)
         if full_update:
+            if self.patch_coalescer is not None:
+                self.patch_coalescer.flush(id)
             attributes['id'] = id
             return Customer(node=self, **self.customer_api_manager.put(_id=id, body=attributes))
+        elif self.patch_coalescer is not None:
+            self.patch_coalescer.patch(id, attributes)
         else:
             return Customer(node=self, **self.customer_api_manager.patch(_id=id, body=attributes))
 
+    def coalesce_patches(self, window=0.05):
+        """
+        Merge the partial updates of the same customer made within a time window in a single PATCH request. Once
+        enabled, `update_customer` without full_update and `Customer.patch` schedule their patches instead of sending
+        them. See PatchCoalescer for the ordering guarantees.
+
+        :param window: the seconds waited after the first patch of a customer before sending its merged patch. If None,
+            the patches are sent only by `flush`
+        :return: the PatchCoalescer of this node, for flushing the patches on demand
+        """
+        self.patch_coalescer = PatchCoalescer(node=self, window=window)
+        return self.patch_coalescer
+
+    @traced
+    def sync_customer(self, desired, current=None):
+        """
+        Bring a customer to the desired state, sending only the attributes that changed in a PATCH request. Nothing is
+        sent if the customer is already in the desired state.
+        The current state of the customer is fetched by the id or the external id of the desired customer, unless it is
+        given (e.g. from a LocalMirror). If no customer has the external id of the desired customer, it is added.
+
+        :param desired: a Customer object or a dictionary with the full desired attributes of the customer
+        :param current: an optional Customer object or dictionary with the current attributes of the customer
+        :return: the customer synchronized
+        """
+        desired = deepcopy(desired.attributes if isinstance(desired, Customer) else desired)
+        convert_properties_obj_in_prop(properties=desired, properties_class=Properties)
+        if current is None:
+            if desired.get('id'):
+                current = self.get_customer(id=desired['id'])
+            elif desired.get('externalId'):
+                current = self.get_customer(external_id=desired['externalId'])
+                if not isinstance(current, Customer):
+                    if len(current):
+                        raise ValueError('More than one customer with external id %s' % desired['externalId'])
+                    for attribute in READ_ONLY_ATTRIBUTES:
+                        desired.pop(attribute, None)
+                    return self.add_customer(**desired)
+            else:
+                raise ValueError('Insert an id or an externalId in the desired customer')
+        if not isinstance(current, Customer):
+            current = Customer(node=self, **current)
+        body = diff_attributes(current.attributes, desired)
+        if not body:
+            return current
+        return Customer(node=self, **self.customer_api_manager.patch(_id=current.attributes['id'], body=body))
+
+    @traced
     def add_customer_session(self, customer_id, session_id):
         """
         Add a new session id for a customer.
@@ -136,6 +429,7 @@ class Node(object):
         """
         return str(uuid.uuid4())
 
+    @traced
     def add_tag(self, customer_id, tag):
         """
         Add a new tag in the list of customer's tags
@@ -148,7 +442,10 @@ class Node(object):
         new_tags += [tag]
         customer.tags.manual = new_tags
         self.update_customer(id=customer_id, **resolve_mutation_tracker(customer.mute))
+        for observer in self.tag_observers:
+            observer.tag_added(customer_id, tag)
 
+    @traced
     def remove_tag(self, customer_id, tag):
         """
         Remove (if exists) a tag in the list of customer's tag
@@ -164,7 +461,43 @@ class Node(object):
             self.update_customer(id=customer_id, **resolve_mutation_tracker(customer.mute))
         except ValueError as e:
             raise ValueError("Tag not in Customer's Tags")
+        for observer in self.tag_observers:
+            observer.tag_removed(customer_id, tag)
+
+    @traced
+    def add_tags_bulk(self, customers, tags, concurrency=8, chunk_size=50):
+        """
+        Add manual tags to many customers. Only the manual tags of the customers are fetched, and only the customers
+        missing some of the tags are patched, with at most `concurrency` PATCH requests running at the same time.
+
+        :param customers: a Query object, or a list of ids of customers
+        :param tags: a tag or a list of tags to add
+        :param concurrency: the maximum number of concurrent PATCH requests
+        :param chunk_size: the number of customers fetched for each request
+        :return: a BulkResult object with the outcome (updated, unchanged, not_found or failed) for each customer
+        """
+        if not isinstance(tags, (list, tuple, set)):
+            tags = [tags]
+        return update_tags_bulk(self, customers, add=list(tags), concurrency=concurrency, chunk_size=chunk_size)
 
+    @traced
+    def remove_tags_bulk(self, customers, tags, concurrency=8, chunk_size=50):
+        """
+        Remove manual tags from many customers. Only the manual tags of the customers are fetched, and only the
+        customers having some of the tags are patched, with at most `concurrency` PATCH requests running at the same
+        time.
+
+        :param customers: a Query object, or a list of ids of customers
+        :param tags: a tag or a list of tags to remove
+        :param concurrency: the maximum number of concurrent PATCH requests
+        :param chunk_size: the number of customers fetched for each request
+        :return: a BulkResult object with the outcome (updated, unchanged, not_found or failed) for each customer
+        """
+        if not isinstance(tags, (list, tuple, set)):
+            tags = [tags]
+        return update_tags_bulk(self, customers, remove=list(tags), concurrency=concurrency, chunk_size=chunk_size)
+
+    @traced
     def get_customer_job(self, customer_id, job_id):
         """
         Get a job associated to a customer by its ID
@@ -176,6 +509,7 @@ class Node(object):
         return Job(customer=self.get_customer(id=customer_id), **self.customer_api_manager.get(_id=customer_id, urls_extra='jobs/' +
                                                                                                          job_id))
 
+    @traced
     def add_job(self, customer_id, **attributes):
         """
         Insert a new Job for the given Customer
@@ -187,6 +521,7 @@ class Node(object):
         entity_attrs = self.customer_api_manager.post(body=attributes, urls_extra=customer_id + '/jobs')
         return Job(customer=self.get_customer(id=customer_id), **entity_attrs)
 
+    @traced
     def remove_job(self, customer_id, job_id):
         """
         Remove a the given Job for the given Customer
@@ -196,6 +531,7 @@ class Node(object):
         """
         self.customer_api_manager.delete(_id=customer_id, urls_extra='jobs/' + job_id)
 
+    @traced
     def update_job(self, customer_id, id, **attributes):
         """
         Update the given job of the given customer with new specified attributes
@@ -208,6 +544,7 @@ class Node(object):
         entity_attrs = self.customer_api_manager.put(_id=customer_id, body=attributes, urls_extra='jobs/' + id)
         return Job(customer=self.get_customer(id=customer_id), **entity_attrs)
 
+    @traced
     def get_customer_like(self, customer_id, like_id):
         """
         Get a like associated to a customer by its ID
@@ -219,6 +556,7 @@ class Node(object):
         return Like(customer=self.get_customer(id=customer_id), **self.customer_api_manager.get(_id=customer_id, urls_extra='likes/' +
                                                                                                          like_id))
 
+    @traced
     def add_like(self, customer_id, **attributes):
         """
         Insert a new Like for the given Customer
@@ -230,6 +568,7 @@ class Node(object):
         entity_attrs = self.customer_api_manager.post(body=attributes, urls_extra=customer_id + '/likes')
         return Like(customer=self.get_customer(id=customer_id), **entity_attrs)
 
+    @traced
     def remove_like(self, customer_id, like_id):
         """
         Remove a the given Like for the given Customer
@@ -239,6 +578,7 @@ class Node(object):
         """
         self.customer_api_manager.delete(_id=customer_id, urls_extra='likes/' + like_id)
 
+    @traced
     def update_like(self, customer_id, id, **attributes):
         """
         Update the given Like of the given customer with new specified attributes
@@ -251,6 +591,7 @@ class Node(object):
         entity_attrs = self.customer_api_manager.put(_id=customer_id, body=attributes, urls_extra='likes/' + id)
         return Like(customer=self.get_customer(id=customer_id), **entity_attrs)
 
+    @traced
     def get_customer_education(self, customer_id, education_id):
         """
         Get an education associated to a customer by its ID
@@ -262,6 +603,7 @@ class Node(object):
         return Education(customer=self.get_customer(id=customer_id), **self.customer_api_manager.get(_id=customer_id, urls_extra='educations/' +
                                                                                                          education_id))
 
+    @traced
     def add_education(self, customer_id, **attributes):
         """
         Insert a new Education for the given Customer
@@ -273,6 +615,7 @@ class Node(object):
         entity_attrs = self.customer_api_manager.post(body=attributes, urls_extra=customer_id + '/educations')
         return Education(customer=self.get_customer(id=customer_id), **entity_attrs)
 
+    @traced
     def remove_education(self, customer_id, education_id):
         """
         Remove a the given Education for the given Customer
@@ -282,6 +625,7 @@ class Node(object):
         """
         self.customer_api_manager.delete(_id=customer_id, urls_extra='educations/' + education_id)
 
+    @traced
     def update_education(self, customer_id, id, **attributes):
         """
         Update the given Education of the given customer with new specified attributes
@@ -294,8 +638,9 @@ class Node(object):
         entity_attrs = self.customer_api_manager.put(_id=customer_id, body=attributes, urls_extra='educations/' + id)
         return Education(customer=self.get_customer(id=customer_id), **entity_attrs)
 
+    @traced
     def get_events(self, customer_id, event_type=None, context=None, event_mode=None, date_from=None, date_to=None,
-                   page=None, size=None):
+                   page=None, size=None, raw=False):
         """
         Get all events associated to a customer.
 
@@ -307,12 +652,14 @@ class Node(object):
         :param date_to: From string or datetime for search of event
         :param size: the size of the pages containing events
         :param page: the number of the page for retrieve event data
+        :param raw: if True, the list contains the dictionaries returned by the APIs instead of Event objects
         :return: a list containing the fetched events associated to the given customer id
         """
-        return PaginatedList(node=self, function=self.event_api_manager.get_all, entity_class=Event,
+        return PaginatedList(node=self, function=self.event_api_manager.get_all, entity_class=Event, raw=raw,
                              customer_id=customer_id, type=event_type, mode=event_mode, dateFrom=date_from,
                              dateTo=date_to, page=page, size=size, context=context)
 
+    @traced
     def get_event(self, id):
         """
         Get a single event by its own id
@@ -322,6 +669,7 @@ class Node(object):
         """
         return Event(node=self, **self.event_api_manager.get(_id=id))
 
+    @traced
     def add_event(self, **attributes):
         """
         Add an event in this node. For adding it and associate with a known customer, specify the customer id in the
@@ -336,9 +684,44 @@ class Node(object):
         :return: a new Event object representing the event added in this node
         """
         convert_properties_obj_in_prop(properties=attributes, properties_class=Properties)
-        self.event_api_manager.post(body=attributes)
+        if self.event_spool is not None:
+            self.event_spool.append(attributes)
+        else:
+            self.event_api_manager.post(body=attributes)
         return Event(node=self, **attributes)
 
+    def spool_events(self, directory, **options):
+        """
+        Write the events in a durable spool on disk instead of posting them. Once enabled, `add_event` and `Event.post`
+        return as soon as the event is written in the spool, and a background thread posts the events in order,
+        surviving API outages and restarts of the process. See EventSpool for the delivery guarantees.
+
+        :param directory: the directory of the spool. A spool opened again on the same directory posts the events left
+        :param options: the options of EventSpool, e.g. fsync='always'
+        :return: the EventSpool of this node, for flushing or closing it and reading its metrics
+        """
+        self.event_spool = EventSpool(node=self, directory=directory, **options)
+        return self.event_spool
+
+    def deduplicate_events(self, capacity=100000, header=None, retries=2, retry_delay=0.2):
+        """
+        Drop the events already posted and retry the transient errors of the POST requests of the events, identifying
+        each event by an idempotency key computed from its customer, type, date and properties. See EventDeduplicator
+        for the events considered duplicates.
+
+        :param capacity: the maximum number of keys of the events posted remembered
+        :param header: the name of the header carrying the idempotency key, e.g. 'Idempotency-Key'. If None, the key is
+            not sent to the APIs
+        :param retries: the maximum number of times a POST request is sent again after a transient error. Without
+            header, only the errors that can't have reached the APIs (429, connection timeouts) are retried
+        :param retry_delay: the seconds waited before the first retry, doubled at each following one
+        :return: the EventDeduplicator of this node, for reading its counters
+        """
+        self.event_deduplicator = EventDeduplicator(capacity=capacity, header=header, retries=retries,
+                                                    retry_delay=retry_delay)
+        return self.event_deduplicator
+
+    @traced
     def get_customer_subscription(self, customer_id, subscription_id):
         """
         Get an subscription associated to a customer by its ID
@@ -351,6 +734,7 @@ class Node(object):
                          **self.customer_api_manager.get(_id=customer_id, urls_extra='subscriptions/' +
                                                                                      subscription_id))
 
+    @traced
     def add_subscription(self, customer_id, **attributes):
         """
         Insert a new Subscription for the given Customer
@@ -362,6 +746,7 @@ class Node(object):
         entity_attrs = self.customer_api_manager.post(body=attributes, urls_extra=customer_id + '/subscriptions')
         return Subscription(customer=self.get_customer(id=customer_id), **entity_attrs)
 
+    @traced
     def remove_subscription(self, customer_id, subscription_id):
         """
         Remove a the given Subscription for the given Customer
@@ -371,6 +756,7 @@ class Node(object):
         """
         self.customer_api_manager.delete(_id=customer_id, urls_extra='subscriptions/' + subscription_id)
 
+    @traced
     def update_subscription(self, customer_id, id, **attributes):
         """
         Update the given Subscription of the given customer with new specified attributes
@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
+import threading
+
 from contacthub.node import Node
 from contacthub._parsers._config_parser import _GeneralConfigParser
+from contacthub.lib.hooks import Hooks
+
+_hooks_lock = threading.Lock()
 
 
 class Workspace(object):
@@ -9,15 +14,17 @@ class Workspace(object):
     This class is the first step for accessing the Contacthub APIs, the higher level.
     """
 
-    def __init__(self, workspace_id, token, base_url='https://api.contactlab.it/hub/v1/workspaces'):
+    def __init__(self, workspace_id, token, base_url='https://api.contactlab.it/hub/v1/workspaces', hooks=None):
         """
         :param workspace_id: The ID associated at the unique workspace on Contacthub. This parameter is given by Contacthub
         :param token: Authentication token. This parameter is given by Contacthub
         :param base_url: Optional base URL for accessing the APIs
+        :param hooks: Optional Hooks object, containing the functions called around every request to the APIs
         """
         self.workspace_id = str(workspace_id)
         self.token = str(token)
         self.base_url = str(base_url)
+        self.hooks = hooks
 
     @classmethod
     def from_ini_file(cls, file_path):
@@ -38,14 +45,30 @@ class Workspace(object):
                 return Workspace(workspace_id=workspace_id, token=token)
         raise KeyError("workspace_id or token parameter not found in INI file")
 
-    def get_node(self, node_id):
+    def add_hook(self, event, function):
+        """
+        Register a function called around every request to the APIs made through this Workspace.
+        The function receives a RequestInfo object with the method, the endpoint, the status code, the bytes sent and
+        received and the seconds spent for serializing the request, waiting for the response and decoding it.
+
+        :param event: 'before_request', 'after_response' or 'on_error'
+        :param function: a function accepting a RequestInfo object
+        """
+        if self.hooks is None:
+            with _hooks_lock:
+                if self.hooks is None:
+                    self.hooks = Hooks()
+        self.hooks.add(event, function)
+
+    def get_node(self, node_id, thread_safe=False):
         """
         Retrieve the node associated at the specified node id
 
         :param node_id: The ID of the node to retrieve
+        :param thread_safe: if True, the node returns PaginatedList objects that can be shared among threads
         :return: a Node object with the Workspace object specified
         """
-        return Node(self, node_id)
+        return Node(self, node_id, thread_safe=thread_safe)
 
 
 
@@ -41,7 +41,7 @@ setup(description='This is the official Python SDK for Contacthub REST API. This
       keywords='web skd api',
       author_email='developer@contactlab.com',
       install_requires=install_requires,
-      packages=find_packages(exclude=['tests', 'tests.*']),
+      packages=find_packages(exclude=['tests', 'tests.*', 'benchmarks', 'benchmarks.*']),
       extras_require={
           'testing': testpkgs,
           'documentation': ['Sphinx==1.4.1', 'sphinx_rtd_theme']
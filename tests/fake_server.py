@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+In-process stand-in for the Contacthub API, for the integration tests, benchmarks and load tests of the SDK.
+
+The server keeps the customers and the events in memory and implements the customers, events, jobs, likes,
+educations, subscriptions and sessions endpoints used by the SDK, including paging, query filtering, field projection
+and 409 conflicts on duplicated external ids. Latency and errors can be injected for every request.
+
+Usage::
+
+    with FakeContacthubServer(latency=0.005, error_rate=0.01) as server:
+        node = server.get_node()
+        node.add_customer(base={'firstName': 'Bruce'}, externalId='01')
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from copy import deepcopy
+from datetime import datetime
+
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import urlparse, parse_qs
+
+from contacthub.lib.utils import DateEncoder, parse_datetime
+from contacthub.models.query.evaluator import compile_query
+from contacthub.workspace import Workspace
+
+SUB_ENTITIES = ('jobs', 'likes', 'educations', 'subscriptions')
+
+
+def now():
+    """
+    :return: the current UTC time formatted like the dates returned by the APIs
+    """
+    return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.') + '%03d+0000' % (datetime.utcnow().microsecond // 1000)
+
+
+def merge(target, patch):
+    """
+    Apply a PATCH body to a document: objects are merged recursively, all other values (lists included) are replaced.
+
+    :param target: the dictionary to update
+    :param patch: the dictionary representing the PATCH body
+    """
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge(target[key], value)
+        else:
+            target[key] = deepcopy(value)
+
+
+def project(document, fields):
+    """
+    Create a copy of a document containing only the given dotted fields and its id.
+
+    :param document: the dictionary representing a customer
+    :param fields: a list of dotted fields
+    :return: a new dictionary with the projected fields
+    """
+    projection = {'id': document['id']}
+    for field in fields:
+        keys = field.split('.')
+        source, target = document, projection
+        for key in keys[:-1]:
+            if not isinstance(source, dict) or not isinstance(source.get(key), dict):
+                source = None
+                break
+            source = source[key]
+            target = target.setdefault(key, {})
+        if isinstance(source, dict) and keys[-1] in source:
+            target[keys[-1]] = deepcopy(source[keys[-1]])
+    return projection
+
+
+class APIException(Exception):
+    """
+    An error response of the fake API.
+    """
+
+    def __init__(self, status, message, data=None):
+        super(APIException, self).__init__(message)
+        self.status = status
+        self.message = message
+        self.data = data
+
+
+class FakeContacthubServer(object):
+    """
+    Fake Contacthub API server running in a background thread.
+    """
+
+    def __init__(self, workspace_id='workspace', node_id='node', token='token', host='127.0.0.1', port=0,
+                 latency=0, error_rate=0, error_status=503, seed=None):
+        """
+        :param workspace_id: the id of the workspace served
+        :param node_id: the id of the node served
+        :param token: the token accepted in the Authorization header
+        :param host: the address to bind
+        :param port: the port to bind, by default a free port chosen by the system
+        :param latency: the seconds waited before answering each request, or a (min, max) tuple for a uniform jitter
+        :param error_rate: the probability of answering a request with `error_status`
+        :param error_status: the status code of the injected errors
+        :param seed: the seed of the random generator used for latency jitter and error injection
+        """
+        self.workspace_id = str(workspace_id)
+        self.node_id = str(node_id)
+        self.token = str(token)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.customers = {}
+        self.events = {}
+        self.lock = threading.RLock()
+        self.requests = {}
+        self._server = _ThreadingHTTPServer((host, port), _RequestHandler)
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """
+        The base URL of the workspaces served, to use as `base_url` of a Workspace object.
+        """
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%s/hub/v1/workspaces' % (host, port)
+
+    def get_workspace(self):
+        """
+        :return: a new Workspace object authenticated on this server
+        """
+        return Workspace(workspace_id=self.workspace_id, token=self.token, base_url=self.base_url)
+
+    def get_node(self, thread_safe=False):
+        """
+        :param thread_safe: if True, the Node returned is thread-safe
+        :return: a new Node object associated to the node served
+        """
+        return self.get_workspace().get_node(self.node_id, thread_safe=thread_safe)
+
+    def start(self):
+        """
+        Start serving requests in a background thread.
+
+        :return: this server
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving requests and release the port.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def add_customers(self, customers):
+        """
+        Store the given customers without calling the API, assigning id and dates when missing.
+
+        :param customers: a list of dictionaries representing customers
+        """
+        with self.lock:
+            for customer in customers:
+                customer = deepcopy(customer)
+                customer.setdefault('id', str(uuid.uuid4()))
+                customer.setdefault('nodeId', self.node_id)
+                customer.setdefault('registeredAt', now())
+                customer.setdefault('updatedAt', customer['registeredAt'])
+                self.customers[customer['id']] = customer
+
+    def add_events(self, events):
+        """
+        Store the given events without calling the API, assigning id and dates when missing.
+
+        :param events: a list of dictionaries representing events
+        """
+        with self.lock:
+            for event in events:
+                event = deepcopy(event)
+                event.setdefault('id', str(uuid.uuid4()))
+                event.setdefault('date', now())
+                self.events[event['id']] = event
+
+    def handle(self, method, path, params, body):
+        """
+        Answer a request of the fake API.
+
+        :param method: the HTTP method of the request
+        :param path: the list of segments of the path following the workspace id
+        :param params: a dictionary of query string parameters
+        :param body: the decoded JSON body of the request, or None
+        :return: a tuple containing the status code and the JSON serializable body of the response
+        """
+        if self.latency:
+            if isinstance(self.latency, tuple):
+                time.sleep(self.random.uniform(*self.latency))
+            else:
+                time.sleep(self.latency)
+        endpoint = method + ' /' + '/'.join(
+            segment if index % 2 == 0 else '{id}' for index, segment in enumerate(path))
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            if self.error_rate and self.random.random() < self.error_rate:
+                raise APIException(self.error_status, 'Injected error')
+        if path and path[0] == 'customers':
+            return self._handle_customers(method, path[1:], params, body)
+        if path and path[0] == 'events':
+            return self._handle_events(method, path[1:], params, body)
+        raise APIException(404, 'Not found')
+
+    def _handle_customers(self, method, path, params, body):
+        with self.lock:
+            if not path:
+                if method == 'GET':
+                    return 200, self._get_customers(params)
+                if method == 'POST':
+                    return self._post_customer(body)
+            customer = self.customers.get(path[0]) if path else None
+            if customer is None:
+                raise APIException(404, 'Customer not found')
+            if len(path) == 1:
+                if method == 'GET':
+                    return 200, customer
+                if method == 'PUT':
+                    body.update(id=customer['id'], nodeId=customer['nodeId'], registeredAt=customer['registeredAt'],
+                                updatedAt=now())
+                    self.customers[customer['id']] = body
+                    return 200, body
+                if method == 'PATCH':
+                    merge(customer, body)
+                    customer['updatedAt'] = now()
+                    return 200, customer
+                if method == 'DELETE':
+                    return 200, self.customers.pop(customer['id'])
+            if path[1] == 'sessions' and method == 'POST':
+                return 200, {'value': body['value']}
+            if path[1] in SUB_ENTITIES:
+                return self._handle_sub_entity(customer, path[1], method, path[2:], body)
+        raise APIException(405, 'Method not allowed')
+
+    def _get_customers(self, params):
+        customers = [c for c in self.customers.values() if c.get('nodeId') == params.get('nodeId')]
+        total_unfiltered = len(customers)
+        if 'externalId' in params:
+            customers = [c for c in customers if c.get('externalId') == params['externalId']]
+        if 'query' in params:
+            predicate = compile_query(json.loads(params['query'])['query'])
+            customers = [c for c in customers if predicate(c)]
+        size = int(params.get('size', 10))
+        page = int(params.get('page', 0))
+        elements = customers[page * size:(page + 1) * size]
+        if 'fields' in params:
+            fields = params['fields'].split(',')
+            elements = [project(c, fields) for c in elements]
+        return {'elements': elements,
+                'page': {'size': size, 'totalElements': len(customers),
+                         'totalPages': (len(customers) + size - 1) // size,
+                         'totalUnfilteredElements': total_unfiltered - len(customers), 'number': page}}
+
+    def _post_customer(self, body):
+        if body.get('externalId') is not None:
+            for customer in self.customers.values():
+                if customer.get('nodeId') == body.get('nodeId') and customer.get('externalId') == body['externalId']:
+                    raise APIException(409, 'Conflict with existing customer %s' % customer['id'],
+                                       data={'customer': {'id': customer['id']}})
+        customer = deepcopy(body)
+        customer['id'] = str(uuid.uuid4())
+        customer['registeredAt'] = customer['updatedAt'] = now()
+        self.customers[customer['id']] = customer
+        return 200, customer
+
+    def _handle_sub_entity(self, customer, name, method, path, body):
+        entities = customer.setdefault('base', {}).setdefault(name, []) or []
+        customer['base'][name] = entities
+        if not path and method == 'POST':
+            entity = deepcopy(body)
+            entity.setdefault('id', str(uuid.uuid4()))
+            entities.append(entity)
+            customer['updatedAt'] = now()
+            return 200, entity
+        for index, entity in enumerate(entities):
+            if path and entity.get('id') == path[0]:
+                if method == 'GET':
+                    return 200, entity
+                if method == 'PUT':
+                    body['id'] = entity['id']
+                    entities[index] = body
+                    customer['updatedAt'] = now()
+                    return 200, body
+                if method == 'DELETE':
+                    del entities[index]
+                    customer['updatedAt'] = now()
+                    return 200, None
+        raise APIException(404, 'Entity not found')
+
+    def _handle_events(self, method, path, params, body):
+        with self.lock:
+            if not path and method == 'POST':
+                if 'customerId' not in body and 'bringBackProperties' not in body:
+                    raise APIException(400, 'customerId or bringBackProperties required')
+                self.add_events([body])
+                return 202, None
+            if not path and method == 'GET':
+                return 200, self._get_events(params)
+            if len(path) == 1 and method == 'GET':
+                if path[0] not in self.events:
+                    raise APIException(404, 'Event not found')
+                return 200, self.events[path[0]]
+        raise APIException(405, 'Method not allowed')
+
+    def _get_events(self, params):
+        events = [e for e in self.events.values() if e.get('customerId') == params.get('customerId')]
+        for key in ('type', 'context', 'mode'):
+            if key in params:
+                events = [e for e in events if e.get(key) == params[key]]
+        if 'dateFrom' in params:
+            date_from = parse_datetime(params['dateFrom'])
+            events = [e for e in events if parse_datetime(e['date']) >= date_from]
+        if 'dateTo' in params:
+            date_to = parse_datetime(params['dateTo'])
+            events = [e for e in events if parse_datetime(e['date']) <= date_to]
+        size = int(params.get('size', 10))
+        page = int(params.get('page', 0))
+        return {'elements': events[page * size:(page + 1) * size],
+                'page': {'size': size, 'totalElements': len(events),
+                         'totalPages': (len(events) + size - 1) // size,
+                         'totalUnfilteredElements': 0, 'number': page}}
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class _RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self, method):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        params = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+        segments = [s for s in url.path.split('/') if s]
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else None
+        try:
+            if self.headers.get('Authorization') != 'Bearer ' + fake.token:
+                raise APIException(401, 'Unauthorized')
+            if fake.workspace_id not in segments:
+                raise APIException(404, 'Workspace not found')
+            path = segments[segments.index(fake.workspace_id) + 1:]
+            body = json.loads(raw_body.decode('utf-8')) if raw_body else None
+            status, response = fake.handle(method, path, params, body)
+        except APIException as e:
+            status = e.status
+            response = {'message': e.message, 'logref': str(uuid.uuid4()), 'data': e.data, 'errors': []}
+        payload = json.dumps(response, cls=DateEncoder).encode('utf-8') if response is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,71 @@
+import unittest
+
+import mock
+
+from contacthub.lib.bulk import BulkResult, run_concurrently
+from contacthub.models.customer import Customer
+from tests.fake_server import FakeContacthubServer
+
+
+class TestBulkTags(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+        cls.server.add_customers([{'id': str(i), 'externalId': str(i), 'base': {'firstName': 'Name %s' % i},
+                                   'tags': {'manual': ['vip'] if i % 3 == 0 else ['new'], 'auto': ['auto']}}
+                                  for i in range(12)])
+
+    @classmethod
+    def tearDown(cls):
+        cls.server.stop()
+
+    def test_run_concurrently(self):
+        def invert(x):
+            return 1.0 / x
+        assert run_concurrently(invert, [1, 2, 4], concurrency=2) == [(1.0, None), (0.5, None), (0.25, None)]
+        result, error = run_concurrently(invert, [0])[0]
+        assert result is None and isinstance(error, ZeroDivisionError)
+
+    def test_add_tags_bulk(self):
+        ids = [str(i) for i in range(6)] + ['missing']
+        result = self.node.add_tags_bulk(ids, ['vip', 'summer'], chunk_size=4, concurrency=3)
+        assert result.counts == {'updated': 6, 'unchanged': 0, 'not_found': 1, 'failed': 0}, result
+        assert result.ids(BulkResult.NOT_FOUND) == ['missing']
+        assert self.node.get_customer(id='0').tags.manual == ['vip', 'summer']
+        assert self.node.get_customer(id='1').tags.manual == ['new', 'vip', 'summer']
+        customer = self.node.get_customer(id='1')
+        assert customer.base.firstName == 'Name 1' and customer.tags.auto == ['auto']
+        again = self.node.add_tags_bulk(ids, 'vip')
+        assert again.counts['unchanged'] == 6 and again.counts['updated'] == 0
+        assert self.server.requests['PATCH /customers/{id}'] == 6, self.server.requests
+        assert self.server.requests['GET /customers'] == 3 and self.server.requests['GET /customers/{id}'] == 3
+
+    def test_remove_tags_bulk_with_query(self):
+        query = self.node.query(Customer).filter(Customer.tags.manual == 'vip')
+        result = self.node.remove_tags_bulk(query, 'vip', chunk_size=2)
+        assert result.ids(BulkResult.UPDATED) == ['0', '3', '6', '9'], result.outcomes
+        assert self.node.get_customer(id='3').tags.manual == []
+        assert self.node.remove_tags_bulk(['1', '2'], 'vip').counts['unchanged'] == 2
+
+    def test_manual_tags_request_ids(self):
+        with mock.patch.object(self.node.customer_api_manager, 'get_all',
+                               wraps=self.node.customer_api_manager.get_all) as get_all:
+            self.node.add_tags_bulk(['1', '2'], 'vip')
+            self.node.add_tags_bulk(self.node.query(Customer).filter(Customer.tags.manual == 'new'), 'new')
+        assert get_all.call_count == 2
+        for call in get_all.call_args_list:
+            assert call[1]['fields'] == ['id', 'tags.manual'], call
+
+    def test_failures(self):
+        original = self.node.customer_api_manager.patch
+
+        def patch(_id, body):
+            if _id == '2':
+                raise ValueError('broken')
+            return original(_id=_id, body=body)
+
+        self.node.customer_api_manager.patch = patch
+        result = self.node.add_tags_bulk(['1', '2'], 'x')
+        assert result.outcomes == {'1': 'updated', '2': 'failed'}
+        assert str(result.errors['2']) == 'broken'
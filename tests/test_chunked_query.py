@@ -0,0 +1,89 @@
+import unittest
+
+from contacthub.lib.chunked_query import ChunkedQuery
+from contacthub.models.customer import Customer
+from contacthub.models.query import in_, not_in_
+from contacthub.models.query.query import Query
+from tests.fake_server import FakeContacthubServer
+
+
+class TestChunkedQuery(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+        cls.server.add_customers([{'id': 'c%02d' % i, 'externalId': str(i), 'tags': {'manual': ['even'] if i % 2 == 0
+                                                                                     else []}} for i in range(40)])
+        cls.max_in_values = Query.MAX_IN_VALUES
+        Query.MAX_IN_VALUES = 4
+
+    @classmethod
+    def tearDown(cls):
+        Query.MAX_IN_VALUES = cls.max_in_values
+        cls.server.stop()
+
+    def test_in(self):
+        external_ids = [str(i) for i in range(30, 3, -1)] + ['1', '30', 'missing']
+        customers = self.node.query(Customer).filter(in_(external_ids, Customer.externalId)).all(size=5)
+        assert isinstance(customers.function, ChunkedQuery) and len(customers.function.queries) == 8
+        assert customers.total_elements == 28 and customers.total_pages == 7
+        assert [c.externalId for c in customers] == ['27', '28', '29', '30']
+        external_ids = [c.externalId for c in customers.iter_all()]
+        assert len(external_ids) == 28 and set(external_ids) == set(str(i) for i in range(4, 31)) | set(['1'])
+        assert self.server.requests['GET /customers'] == 8
+        #  the pages served are not kept: a page is retrieved again when requested again
+        assert [c.externalId for c in customers.get_page(6)] == ['1', '4', '5', '6']
+        assert self.server.requests['GET /customers'] == 9
+
+    def test_streaming(self):
+        Query.IN_CONCURRENCY = 2
+        try:
+            ids = ['c%02d' % i for i in range(40)]
+            customers = self.node.query(Customer).filter(in_(ids, Customer.id)).all(size=2, raw=True)
+        finally:
+            Query.IN_CONCURRENCY = 8
+        #  the first pages of the 10 chunks, and at most 2 pages in background
+        assert customers.total_pages == 20 and self.server.requests['GET /customers'] <= 12
+        assert [c['id'] for c in customers.iter_all()] == ids
+        assert self.server.requests['GET /customers'] == 20 and not customers.function.first_pages
+
+    def test_in_duplicates_across_chunks(self):
+        customers = self.node.query(Customer).filter(in_(['even', 'x1', 'x2', 'x3', 'x4'], Customer.tags.manual))
+        self.server.add_customers([{'id': 'd1', 'tags': {'manual': ['even', 'x4']}}])
+        ids = [c['id'] for c in customers.all(size=50, raw=True).iter_all()]
+        assert ids == ['c%02d' % i for i in range(0, 40, 2)] + ['d1']
+        #  the filters work on the pages requested in any order, without the attribute in the fields
+        customers = customers.all(size=50, fields=['externalId'], raw=True)
+        assert [c['id'] for c in customers.get_page(1)] == [] and 'tags' not in customers[0]
+
+    def test_in_with_other_conditions(self):
+        ids = ['c%02d' % i for i in range(20)] * 2
+        query = self.node.query(Customer).filter(in_(ids, Customer.id) & (Customer.tags.manual == 'even'))
+        customers = query.all(size=50, raw=True)
+        assert [c['id'] for c in customers.iter_all()] == ['c%02d' % i for i in range(0, 20, 2)]
+
+    def test_not_in(self):
+        ids = ['c%02d' % i for i in range(0, 40, 3)]
+        customers = self.node.query(Customer).filter(not_in_(ids, Customer.id)).all(size=100, raw=True)
+        assert [c['id'] for c in customers] == ['c%02d' % i for i in range(40) if i % 3]
+        assert len(customers.function.queries) == 1 and self.server.requests['GET /customers'] == 1
+        query = self.node.query(Customer).filter(not_in_([str(i) for i in range(10)], Customer.externalId))
+        customers = query.all(size=100, fields=['base'], raw=True)
+        assert [c['id'] for c in customers] == ['c%02d' % i for i in range(10, 40)]
+        assert 'externalId' not in customers[0]
+
+    def test_not_conjunctive(self):
+        #  a condition not satisfied by every entity of the query is sent in a single request
+        ids = ['c%02d' % i for i in range(0, 40, 3)]
+        query = self.node.query(Customer).filter(not_in_(ids, Customer.id) | (Customer.externalId == '3'))
+        customers = query.all(size=100, raw=True)
+        assert not isinstance(customers.function, ChunkedQuery)
+        assert [c['id'] for c in customers] == ['c%02d' % i for i in range(40) if i % 3 or i == 3]
+        query = self.node.query(Customer).filter(in_(ids, Customer.id) | (Customer.externalId == '1'))
+        assert not isinstance(query.all().function, ChunkedQuery)
+        self.assertRaises(ValueError, ChunkedQuery, None, query.compiled, query.compiled['query']['are']['condition']
+                          ['conditions'][0], 4)
+
+    def test_small_query(self):
+        customers = self.node.query(Customer).filter(in_(['c01', 'c02'], Customer.id)).all()
+        assert not isinstance(customers.function, ChunkedQuery) and len(customers) == 2
@@ -0,0 +1,73 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+
+from contacthub.lib.customer_scan import CustomerScan
+from contacthub.lib.utils import parse_datetime
+from contacthub.models.customer import Customer
+from tests.fake_server import FakeContacthubServer
+
+
+def date(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%S.000+0000')
+
+
+class TestCustomerScan(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+        customers = [{'id': 'jan%02d' % i, 'registeredAt': date(datetime(2020, 1, 1) + timedelta(hours=i)),
+                      'tags': {'manual': ['vip'] if i % 2 else []}} for i in range(40)]
+        customers += [{'id': 'year%02d' % i, 'registeredAt': date(datetime(2021, 1, 1) + timedelta(days=i * 17))}
+                      for i in range(20)]
+        cls.server.add_customers(customers)
+        cls.ids = set(c['id'] for c in customers)
+
+    @classmethod
+    def tearDown(cls):
+        cls.server.stop()
+
+    def test_balanced_partitions(self):
+        scan = self.node.scan_customers(partitions=4, start=datetime(2019, 1, 1), end=datetime(2022, 1, 1), size=4)
+        customers = list(scan)
+        assert isinstance(customers[0], Customer)
+        ids = [c.id for c in customers]
+        assert len(ids) == 60 and set(ids) == self.ids
+        partitions = scan.cursor['partitions']
+        assert partitions[0]['lower'] == '2019-01-01T00:00:00Z' and partitions[-1]['upper'] == '2022-01-01T00:00:00Z'
+        assert all(p['done'] for p in partitions)
+        for partition in partitions:
+            count = scan.count(parse_datetime(partition['lower']), parse_datetime(partition['upper']))
+            assert 10 <= count <= 20, partitions
+        json.dumps(scan.cursor)
+
+    def test_query_and_fields(self):
+        query = self.node.query(Customer).filter(Customer.tags.manual == 'vip')
+        scan = self.node.scan_customers(partitions=3, query=query, fields=['tags'], raw=True, concurrency=2)
+        customers = list(scan)
+        assert sorted(c['id'] for c in customers) == ['jan%02d' % i for i in range(1, 40, 2)]
+        assert set(customers[0]) == set(['id', 'tags', 'registeredAt'])
+
+    def test_boundary_customers(self):
+        self.server.add_customers([{'id': 'boundary', 'registeredAt': '2020-06-01T00:00:00Z'}])
+        cursor = {'by': 'registeredAt', 'seen': [],
+                  'partitions': [{'lower': '2019-01-01T00:00:00Z', 'upper': '2020-06-01T00:00:00Z', 'page': 0,
+                                  'done': False},
+                                 {'lower': '2020-06-01T00:00:00Z', 'upper': '2022-01-01T00:00:00Z', 'page': 0,
+                                  'done': False}]}
+        scan = CustomerScan(self.node, cursor=cursor, raw=True)
+        ids = [c['id'] for c in scan]
+        assert ids.count('boundary') == 1 and len(ids) == 61
+        assert scan.cursor['seen'] == ['boundary']
+
+    def test_restart(self):
+        scan = self.node.scan_customers(partitions=3, start=datetime(2019, 1, 1), size=5, raw=True)
+        iterator = iter(scan)
+        first = [next(iterator)['id'] for _ in range(23)]
+        iterator.close()
+        cursor = scan.cursor
+        assert not all(p['done'] for p in cursor['partitions'])
+        second = [c['id'] for c in self.node.scan_customers(cursor=cursor, raw=True, size=5)]
+        assert set(first) | set(second) == self.ids
+        assert len(second) < 60 and len(set(second)) == len(second)
@@ -0,0 +1,113 @@
+import json
+import unittest
+
+import mock
+from datetime import datetime, timedelta
+
+from contacthub.lib.customer_sync import CustomerSync, Watermark
+from contacthub.lib.utils import parse_datetime
+from contacthub.workspace import Workspace
+
+
+def page(elements, number=0, total_pages=1):
+    return {'elements': elements,
+            'page': {'size': 10, 'totalElements': len(elements), 'totalPages': total_pages,
+                     'totalUnfilteredElements': 0, 'number': number}}
+
+
+class TestCustomerSync(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        w = Workspace(workspace_id=123, token=456)
+        cls.node = w.get_node(123)
+
+    @classmethod
+    def tearDown(cls):
+        pass
+
+    @mock.patch('contacthub.lib.customer_sync.datetime')
+    @mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.get_all')
+    def test_sync_all_pages(self, mock_get_all, mock_datetime):
+        mock_datetime.utcnow.return_value = datetime(2017, 3, 2, 12, 14, 30)
+        mock_get_all.side_effect = [
+            page([{'id': '01', 'updatedAt': '2017-03-02T12:12:53.074+0000'}], number=0, total_pages=2),
+            page([{'id': '02', 'updatedAt': '2017-03-02T12:14:00.000+0000'}], number=1, total_pages=2)]
+        sync = self.node.sync_customers()
+        ids = [c.id for c in sync]
+        assert ids == ['01', '02'], ids
+        assert sync.watermark.updated_at == datetime(2017, 3, 2, 12, 14, 30), sync.watermark.updated_at
+        assert sync.watermark.seen == {'02': '2017-03-02T12:14:00.000+0000'}, sync.watermark.seen
+        mock_get_all.assert_called_with(page=1, query=None)
+
+    @mock.patch('contacthub.lib.customer_sync.datetime')
+    @mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.get_all')
+    def test_sync_since_watermark(self, mock_get_all, mock_datetime):
+        mock_datetime.utcnow.return_value = datetime(2017, 3, 2, 12, 13)
+        mock_get_all.return_value = page([{'id': '01', 'updatedAt': '2017-03-02T12:12:53.074+0000'},
+                                          {'id': '02', 'updatedAt': '2017-03-02T12:12:55.000+0000'}])
+        since = Watermark(updated_at='2017-03-02T12:12:53.074+0000', seen={'01': '2017-03-02T12:12:53.074+0000'})
+        sync = self.node.sync_customers(since=since.to_dict(), overlap=timedelta(seconds=10), size=50)
+        ids = [c.id for c in sync]
+        assert ids == ['02'], ids
+        assert sync.skipped == 1, sync.skipped
+        assert sync.watermark.seen == {'01': '2017-03-02T12:12:53.074+0000', '02': '2017-03-02T12:12:55.000+0000'}
+
+        query = {'name': 'query', 'query':
+            {'type': 'simple', 'name': 'query', 'are':
+                {'condition': {'type': 'atomic', 'attribute': 'updatedAt', 'operator': 'GTE',
+                               'value': datetime(2017, 3, 2, 12, 12, 43, 74000)}}}}
+        mock_get_all.assert_called_with(page=0, query=query, size=50)
+
+    @mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.get_all')
+    def test_sync_updated_again(self, mock_get_all):
+        mock_get_all.return_value = page([{'id': '01', 'updatedAt': '2017-03-02T12:13:00.000+0000'}])
+        since = Watermark(updated_at='2017-03-02T12:12:53.074+0000', seen={'01': '2017-03-02T12:12:53.074+0000'})
+        sync = CustomerSync(node=self.node, since=since)
+        ids = [c.id for c in sync]
+        assert ids == ['01'], ids
+
+    @mock.patch('contacthub.lib.customer_sync.datetime')
+    @mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.get_all')
+    def test_watermark_is_start_time(self, mock_get_all, mock_datetime):
+        #  the pages are not sorted by updatedAt: a customer older than the newest one delivered comes last
+        mock_datetime.utcnow.return_value = datetime(2017, 3, 2, 12, 20)
+        mock_get_all.side_effect = [
+            page([{'id': '01', 'updatedAt': '2017-03-02T12:19:00.000+0000'}], number=0, total_pages=2),
+            page([{'id': '02', 'updatedAt': '2017-03-02T12:10:00.000+0000'}], number=1, total_pages=2)]
+        since = Watermark(updated_at='2017-03-02T12:00:00.000+0000')
+        sync = CustomerSync(node=self.node, since=since, overlap=timedelta(minutes=1))
+        customers = iter(sync)
+        assert next(customers).id == '01'
+        #  during the iteration, the watermark stays the starting one
+        assert sync.watermark.updated_at == datetime(2017, 3, 2, 12), sync.watermark.updated_at
+        assert sync.watermark.seen == {'01': '2017-03-02T12:19:00.000+0000'}
+        assert [c.id for c in customers] == ['02']
+        assert sync.watermark.updated_at == datetime(2017, 3, 2, 12, 20), sync.watermark.updated_at
+        assert sync.watermark.seen == {'01': '2017-03-02T12:19:00.000+0000'}
+
+    @mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.get_all')
+    def test_sync_fields(self, mock_get_all):
+        mock_get_all.return_value = page([])
+        sync = self.node.sync_customers(since=datetime(2017, 3, 2), fields=['base.firstName'])
+        assert sync.watermark.updated_at == datetime(2017, 3, 2), sync.watermark.updated_at
+        assert list(sync) == []
+        assert sync.watermark.updated_at > datetime(2017, 3, 2), sync.watermark.updated_at
+        assert mock_get_all.call_args[1]['fields'] == ['base.firstName', 'id', 'updatedAt'], mock_get_all.call_args
+
+    def test_watermark_to_dict(self):
+        w = Watermark(updated_at=datetime(2017, 3, 2, 12, 12, 53, 74000), seen={'01': '2017-03-02T12:12:53.074+0000'})
+        d = json.loads(json.dumps(w.to_dict()))
+        w1 = Watermark.from_dict(d)
+        assert w1.updated_at == w.updated_at, w1.updated_at
+        assert w1.seen == w.seen, w1.seen
+
+    def test_parse_datetime(self):
+        assert parse_datetime('2017-03-02T12:12:53.074+0000') == datetime(2017, 3, 2, 12, 12, 53, 74000)
+        assert parse_datetime('2017-03-02T12:12:53Z') == datetime(2017, 3, 2, 12, 12, 53)
+        assert parse_datetime('2017-03-02T14:12:53+02:00') == datetime(2017, 3, 2, 12, 12, 53)
+        assert parse_datetime('2017-03-02') == datetime(2017, 3, 2)
+        try:
+            parse_datetime('yesterday')
+            assert False
+        except ValueError as e:
+            assert 'Unknown date format' in str(e), str(e)
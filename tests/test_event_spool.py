@@ -0,0 +1,213 @@
+import base64
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from contacthub.lib.event_spool import EventSpool, HEADER
+from contacthub.models.event import Event
+from tests.fake_server import FakeContacthubServer
+
+
+class TestEventSpool(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+        cls.server.add_customers([{'id': 'c1', 'externalId': 'e1'}])
+
+    @classmethod
+    def tearDown(cls):
+        if cls.node.event_spool is not None:
+            cls.node.event_spool.close()
+        cls.server.stop()
+        shutil.rmtree(cls.directory)
+
+    def event(self, number):
+        return {'customerId': 'c1', 'type': 'viewedPage', 'context': 'WEB', 'properties': {'number': number}}
+
+    def posted(self):
+        return sorted(e['properties']['number'] for e in self.server.events.values())
+
+    def test_add_event_is_spooled(self):
+        spool = self.node.spool_events(self.directory, start=False)
+        self.node.add_event(**self.event(1))
+        Event(node=self.node, **self.event(2)).post()
+        assert not self.server.events
+        assert spool.metrics['depth'] == 2 and spool.metrics['appended'] == 2
+        assert spool.send_pending() is None
+        assert self.posted() == [1, 2]
+        assert spool.metrics['depth'] == 0 and spool.metrics['depth_bytes'] == 0 and spool.metrics['sent'] == 2
+
+    def test_background_sender(self):
+        spool = self.node.spool_events(self.directory, fsync='always', fsync_interval=0.01)
+        for number in range(20):
+            self.node.add_event(**self.event(number))
+        assert spool.flush(timeout=5)
+        assert self.posted() == list(range(20))
+
+    def test_restart(self):
+        spool = EventSpool(self.node, self.directory, start=False, batch_size=2)
+        for number in range(5):
+            spool.append(self.event(number))
+        post = self.node.event_api_manager.post
+
+        def failing_post(body):
+            if body['properties']['number'] == 3:
+                self.server.error_rate = 1
+            return post(body=body)
+
+        self.node.event_api_manager.post = failing_post
+        assert spool.send_pending() is not None
+        spool.close()
+        self.node.event_api_manager.post = post
+        self.server.error_rate = 0
+        assert self.posted() == [0, 1, 2]
+
+        spool = EventSpool(self.node, self.directory, start=False)
+        assert spool.metrics['depth'] == 2
+        spool.append(self.event(5))
+        assert spool.send_pending() is None
+        spool.close()
+        spool = EventSpool(self.node, self.directory, start=False)
+        assert spool.metrics['depth'] == 0
+        spool.close()
+        assert self.posted() == [0, 1, 2, 3, 4, 5]
+
+    def test_segments_compaction(self):
+        spool = EventSpool(self.node, self.directory, start=False, segment_size=300, batch_size=2)
+        for number in range(10):
+            spool.append(self.event(number))
+        assert spool.metrics['segments'] > 2
+        spool.send_pending()
+        assert self.posted() == list(range(10))
+        assert spool.metrics['segments'] == 1
+        assert len([name for name in os.listdir(self.directory) if name.endswith('.log')]) == 1
+        spool.close()
+
+    def test_torn_tail(self):
+        spool = EventSpool(self.node, self.directory, start=False)
+        spool.append(self.event(1))
+        spool.append(self.event(2))
+        spool.close()
+        segment = os.path.join(self.directory, '%016d.log' % 0)
+        size = os.path.getsize(segment)
+        with open(segment, 'r+b') as f:
+            f.truncate(size - 5)
+        spool = EventSpool(self.node, self.directory, start=False)
+        assert spool.metrics['depth'] == 1
+        spool.append(self.event(3))
+        spool.send_pending()
+        spool.close()
+        assert self.posted() == [1, 3]
+        assert os.path.getsize(segment) < size + HEADER.size
+
+    def corrupt(self, index, record):
+        #  flip a byte in the payload of a record of a segment
+        with open(os.path.join(self.directory, '%016d.log' % index), 'r+b') as f:
+            data = f.read()
+            offset = 0
+            for _ in range(record):
+                offset += HEADER.size + HEADER.unpack(data[offset:offset + HEADER.size])[0]
+            f.seek(offset + HEADER.size + 2)
+            f.write(b'#')
+        return len(data) - offset
+
+    def dead(self):
+        with open(os.path.join(self.directory, 'dead.ndjson')) as f:
+            return [json.loads(line) for line in f]
+
+    def test_corrupted_record(self):
+        spool = EventSpool(self.node, self.directory, start=False, segment_size=450)
+        for number in range(8):
+            spool.append(self.event(number))
+        spool.close()
+        assert len([name for name in os.listdir(self.directory) if name.endswith('.log')]) > 2
+        tail = self.corrupt(0, 1)
+        spool = EventSpool(self.node, self.directory, start=False)
+        assert spool.send_pending() is None
+        spool.close()
+        dead = self.dead()
+        assert len(dead) == 1 and dead[0]['segment'] == '%016d.log' % 0 and dead[0]['error'] == 'Corrupted record'
+        data = base64.b64decode(dead[0]['data'])
+        #  the record after the corrupted one is kept too
+        assert len(data) == tail and b'"number": 1' in data and b'"number": 2' in data
+        assert self.posted() == [0] + list(range(3, 8))
+
+    def test_corrupted_record_in_last_segment(self):
+        spool = EventSpool(self.node, self.directory, start=False)
+        for number in range(3):
+            spool.append(self.event(number))
+        spool.close()
+        self.corrupt(0, 1)
+        spool = EventSpool(self.node, self.directory, start=False)
+        assert spool.metrics['depth'] == 1 and spool.metrics['failed'] == 1
+        spool.append(self.event(3))
+        spool.send_pending()
+        spool.close()
+        assert self.posted() == [0, 3]
+        data = base64.b64decode(self.dead()[0]['data'])
+        assert b'"number": 1' in data or b'"number": 2' in data
+
+    def test_retry_and_dead_letter(self):
+        spool = EventSpool(self.node, self.directory, start=False)
+        spool.append(self.event(1))
+        spool.append({'type': 'viewedPage', 'context': 'WEB', 'properties': {}})
+        spool.append(self.event(2))
+        self.server.error_rate = 1
+        assert spool.send_pending() is not None
+        assert spool.metrics['retries'] == 1 and spool.metrics['depth'] == 3 and spool.metrics['lag'] > 0
+        self.server.error_rate = 0
+        assert spool.send_pending() is None
+        assert self.posted() == [1, 2]
+        metrics = spool.metrics
+        assert metrics['failed'] == 1 and metrics['sent'] == 2 and metrics['depth'] == 0 and metrics['lag'] == 0
+        with open(os.path.join(self.directory, 'dead.ndjson')) as f:
+            dead = [json.loads(line) for line in f]
+        assert dead[0]['event']['type'] == 'viewedPage' and dead[0]['error'].startswith('Status code: 400')
+        spool.close()
+
+    def test_sender_survives_errors(self):
+        spool = self.node.spool_events(self.directory, start=False, retry_delay=0.01, fsync_interval=0.01)
+        post = self.node.event_api_manager.post
+        save = spool.checkpoint.save
+        failures = {'post': 1, 'save': 1}
+
+        def failing_post(body):
+            if failures['post']:
+                failures['post'] -= 1
+                raise ValueError('No JSON object could be decoded')
+            return post(body=body)
+
+        def failing_save(state):
+            if failures['save']:
+                failures['save'] -= 1
+                raise OSError('disk full')
+            return save(state)
+
+        self.node.event_api_manager.post = failing_post
+        spool.checkpoint.save = failing_save
+        spool.start()
+        self.node.add_event(**self.event(1))
+        assert spool.flush(timeout=5)
+        metrics = spool.metrics
+        assert metrics['retries'] == 1 and metrics['errors'] == 1 and 'OSError' in metrics['last_error']
+        assert 1 in self.posted()
+        self.node.add_event(**self.event(2))
+        assert spool.flush(timeout=5) and sorted(set(self.posted())) == [1, 2]
+
+    def test_append_dates_events(self):
+        spool = EventSpool(self.node, self.directory, start=False)
+        event = self.event(1)
+        spool.append(event)
+        spool.append(dict(self.event(2), date='2020-01-01T00:00:00Z'))
+        assert 'date' not in event
+        spool.send_pending()
+        dates = dict((e['properties']['number'], e['date']) for e in self.server.events.values())
+        assert dates[1].endswith('Z') and dates[1][:4] >= '2026' and dates[2] == '2020-01-01T00:00:00Z'
+        spool.close()
+
+    def test_unknown_fsync(self):
+        self.assertRaises(ValueError, EventSpool, self.node, self.directory, fsync='sometimes')
@@ -0,0 +1,149 @@
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+import mock
+
+from contacthub.lib.exporters import CSVWriter, ParquetWriter, convert_column, flatten, get_writer, infer_kind
+from contacthub.lib.jobs import Checkpoint
+from contacthub.models.customer import Customer
+from tests.fake_server import FakeContacthubServer
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class TestExporters(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+        cls.server.add_customers([{'id': 'c%02d' % i, 'externalId': str(i),
+                                   'base': {'firstName': u'N\xe4me %s' % i, 'contacts': {'email': '%s@a.b' % i}},
+                                   'tags': {'manual': ['t%s' % i]}} for i in range(12)])
+        cls.server.add_events([{'customerId': 'c01', 'type': 'viewedPage', 'context': 'WEB',
+                                'properties': {'url': 'http://a.b/%s' % i}} for i in range(5)])
+
+    @classmethod
+    def tearDown(cls):
+        cls.server.stop()
+        shutil.rmtree(cls.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def read_csv(self, name):
+        with open(self.path(name), 'rb') as f:
+            return list(csv.reader(f.read().decode('utf-8').splitlines()))
+
+    def test_flatten(self):
+        flat = flatten({'id': 'a', 'base': {'contacts': {'email': 'e'}, 'jobs': []}, 'extended': {}})
+        assert list(flat.items()) == [('id', 'a'), ('base.contacts.email', 'e'), ('base.jobs', []), ('extended', {})]
+
+    def test_export_ndjson(self):
+        query = self.node.query(Customer).filter(Customer.externalId != '0')
+        assert self.node.export(self.path('out.ndjson'), query=query, size=5) == 11
+        with open(self.path('out.ndjson')) as f:
+            customers = [json.loads(line) for line in f]
+        assert [c['id'] for c in customers] == ['c%02d' % i for i in range(1, 12)]
+        assert customers[0]['base']['firstName'] == u'N\xe4me 1'
+
+    def test_export_csv(self):
+        fields = ['id', 'base.contacts.email', 'tags.manual', 'base.lastName']
+        assert self.node.export(self.path('out.csv'), format='csv', fields=fields, size=5) == 12
+        rows = self.read_csv('out.csv')
+        assert rows[0] == fields and rows[2] == ['c01', '1@a.b', '["t1"]', '']
+        self.node.export(self.path('all.csv'), format='csv', fields=['base.firstName'])
+        assert self.read_csv('all.csv')[1] == [u'N\xe4me 0']
+        self.assertRaises(ValueError, self.node.export, self.path('none.csv'), format='csv')
+
+    def test_export_events(self):
+        assert self.node.export_events('c01', self.path('events.csv'), format='csv', size=2,
+                                       fields=['type', 'properties.url']) == 5
+        assert self.read_csv('events.csv')[1:] == [['viewedPage', 'http://a.b/%s' % i] for i in range(5)]
+
+    def test_csv_export_job_resume(self):
+        class FailingCSVWriter(CSVWriter):
+            def write(self, record):
+                if record['id'] == 'c07':
+                    raise IOError('disk full')
+                super(FailingCSVWriter, self).write(record)
+
+        checkpoint = self.path('checkpoint')
+        try:
+            self.node.export_job(checkpoint, size=3).run(FailingCSVWriter(self.path('out.csv'), fields=['id']))
+            assert False
+        except IOError:
+            pass
+        assert Checkpoint(checkpoint).load()['cursor'] == 2
+        self.node.export_job(checkpoint, size=3).run(CSVWriter(self.path('out.csv')))
+        assert self.read_csv('out.csv') == [['id']] + [['c%02d' % i] for i in range(12)]
+
+    def test_parquet_not_installed(self):
+        with mock.patch.dict(sys.modules, {'pyarrow': None, 'pyarrow.parquet': None}):
+            try:
+                get_writer(self.path('out.parquet'), format='parquet', fields=['id'])
+                assert False
+            except ImportError as e:
+                assert 'pyarrow' in str(e), str(e)
+        try:
+            get_writer(self.path('out.xml'), format='xml')
+            assert False
+        except ValueError:
+            pass
+
+    def test_parquet_kinds(self):
+        assert infer_kind([1, None, 2.5]) == 'double' and infer_kind([True]) == 'bool'
+        assert infer_kind([None]) == 'string'
+        assert infer_kind([1, 'a']) == 'string' and infer_kind([datetime(2020, 1, 1)]) == 'timestamp'
+        assert convert_column([1, None, 'a', 2.5, True], 'string') == ['1', None, 'a', '2.5', 'true']
+        assert convert_column([datetime(2020, 1, 1)], 'string') == ['2020-01-01T00:00:00Z']
+        assert convert_column([1, 2.0], 'int') == [1, 2] and convert_column([1], 'double') == [1.0]
+        assert convert_column(['2020-01-01T10:00:00Z'], 'timestamp') == [datetime(2020, 1, 1, 10)]
+        for values, kind in (([2.5], 'int'), (['a'], 'double'), ([1], 'bool'), ([True], 'double')):
+            self.assertRaises(ValueError, convert_column, values, kind)
+
+    def test_parquet_row_groups(self):
+        fake = mock.MagicMock()
+        with mock.patch.dict(sys.modules, {'pyarrow': fake, 'pyarrow.parquet': fake.parquet}):
+            writer = ParquetWriter(self.path('out.parquet'), ['id', 'extra.points', 'extra.note', 'extra.flag'],
+                                   batch_size=2, schema={'extra.flag': 'bool'})
+            writer.open()
+            writer.write({'id': 'a', 'extra': {'points': 1}})
+            writer.write({'id': 'b', 'extra': {'points': 2}})
+            writer.write({'id': 'c', 'extra': {'points': 2.5, 'note': 3, 'flag': True}})
+            writer.close()
+            assert fake.schema.call_args[0][0] == [('id', fake.string()), ('extra.points', fake.float64()),
+                                                   ('extra.note', fake.string()), ('extra.flag', fake.bool_())]
+            assert fake.parquet.ParquetWriter.return_value.write_table.call_count == 2
+            arrays = [c[0][0] for c in fake.array.call_args_list[-4:]]
+            assert arrays == [['c'], [2.5], ['3'], [True]], arrays
+            writer = ParquetWriter(self.path('out.parquet'), ['extra.points'], batch_size=1)
+            writer.write({'extra': {'points': 1}})
+            try:
+                writer.write({'extra': {'points': 'many'}})
+                assert False
+            except ValueError as e:
+                assert 'extra.points' in str(e) and 'schema' in str(e)
+            self.assertRaises(ValueError, ParquetWriter, self.path('out.parquet'), ['id'], schema={'id': 'text'})
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_export_parquet(self):
+        fields = ['id', 'base.contacts.email', 'tags.manual', 'base.lastName']
+        writer = get_writer(self.path('out.parquet'), format='parquet', fields=fields)
+        writer.batch_size = 5
+        writer.open()
+        for element in self.node.stream_customers(raw=True):
+            writer.write(element)
+        writer.close()
+        table = pyarrow.parquet.read_table(self.path('out.parquet'))
+        assert table.num_rows == 12 and table.column_names == fields
+        assert table.column('base.contacts.email').to_pylist()[3] == '3@a.b'
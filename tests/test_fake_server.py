@@ -0,0 +1,97 @@
+import unittest
+
+from tests.fake_server import FakeContacthubServer
+from benchmarks.node_benchmark import run
+from contacthub.errors.api_error import APIError
+from contacthub.models.customer import Customer
+
+
+class TestFakeServer(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.server = FakeContacthubServer(seed=0).start()
+        cls.node = cls.server.get_node()
+
+    @classmethod
+    def tearDown(cls):
+        cls.server.stop()
+
+    def test_customers(self):
+        c = self.node.add_customer(externalId='01', base={'firstName': 'Bruce', 'contacts': {'email': 'b@w.it'}})
+        assert c.id and c.registeredAt, c.to_dict()
+        assert self.node.get_customer(external_id='01').id == c.id
+        assert self.node.update_customer(id=c.id, base={'lastName': 'Wayne'}).base.firstName == 'Bruce'
+        assert self.node.get_customer(id=c.id).base.lastName == 'Wayne'
+        self.node.delete_customer(id=c.id)
+        try:
+            self.node.get_customer(id=c.id)
+            assert False
+        except APIError as e:
+            assert '404' in str(e), str(e)
+
+    def test_conflict(self):
+        c = self.node.add_customer(externalId='01', extra='first')
+        try:
+            self.node.add_customer(externalId='01')
+            assert False
+        except APIError as e:
+            assert '409' in str(e), str(e)
+        updated = self.node.add_customer(externalId='01', extra='second', force_update=True)
+        assert updated.id == c.id and updated.extra == 'second', updated.to_dict()
+
+    def test_paging_and_query(self):
+        self.server.add_customers([{'externalId': str(i), 'tags': {'manual': ['even' if i % 2 == 0 else 'odd']}}
+                                   for i in range(25)])
+        customers = self.node.get_customers(size=10)
+        assert customers.total_pages == 3 and customers.total_elements == 25
+        assert len(list(customers.iter_all())) == 25
+        even = self.node.query(Customer).filter(Customer.tags.manual == 'even').all(size=5)
+        assert [c.externalId for c in even.iter_all()] == [str(i) for i in range(0, 25, 2)]
+        projected = self.node.get_customers(size=1, fields=['externalId'], raw=True)
+        assert list(projected) == [{'id': projected[0]['id'], 'externalId': '0'}], list(projected)
+
+    def test_sub_entities_and_sessions(self):
+        c = self.node.add_customer(externalId='01')
+        job = self.node.add_job(customer_id=c.id, id='j1', companyName='acme', isCurrent=True, jobTitle='dev',
+                                startDate='2017-01-01')
+        assert self.node.get_customer_job(customer_id=c.id, job_id=job.id).companyName == 'acme'
+        self.node.add_like(customer_id=c.id, id='l1', name='cinema', category='movies')
+        self.node.remove_job(customer_id=c.id, job_id='j1')
+        customer = self.node.get_customer(id=c.id)
+        assert [like.id for like in customer.base.likes] == ['l1'] and not customer.base.jobs
+        assert self.node.add_customer_session(customer_id=c.id, session_id='s1') == 's1'
+
+    def test_events(self):
+        c = self.node.add_customer(externalId='01')
+        for i in range(3):
+            self.node.add_event(customerId=c.id, type='viewedPage', context='WEB', properties={})
+        self.node.add_event(customerId=c.id, type='clickedLink', context='WEB', properties={})
+        assert len(self.node.get_events(customer_id=c.id)) == 4
+        events = self.node.get_events(customer_id=c.id, event_type='viewedPage')
+        assert len(events) == 3
+        assert self.node.get_event(id=events[0].id).type == 'viewedPage'
+
+    def test_unauthorized(self):
+        self.server.token = 'other'
+        try:
+            self.node.get_customers()
+            assert False
+        except APIError as e:
+            assert '401' in str(e), str(e)
+
+    def test_error_injection(self):
+        self.server.error_rate = 1
+        try:
+            self.node.get_customers()
+            assert False
+        except APIError as e:
+            assert '503' in str(e), str(e)
+        assert self.server.requests == {'GET /customers': 1}, self.server.requests
+
+    def test_benchmark(self):
+        results = run(customers=10, threads=2, page_size=3)
+        assert [r['scenario'] for r in results] == ['add_customer', 'resync_force_update', 'resync_upsert_learning',
+                                                    'resync_upsert_known', 'get_customer', 'update_customer',
+                                                    'add_event', 'get_customers_pages', 'query_pages']
+        assert results[3]['round_trips_saved'] == 10, results[3]
+        assert all(r['errors'] == 0 for r in results), results
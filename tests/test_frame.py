@@ -0,0 +1,86 @@
+import json
+import sys
+import unittest
+
+import mock
+
+from contacthub.lib.frame import build_columns, to_frame
+from contacthub.workspace import Workspace
+from tests.utility import FakeHTTPResponse
+
+
+class TestFrame(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        w = Workspace(workspace_id=123, token=456)
+        cls.node = w.get_node(123)
+        cls.elements = json.loads(FakeHTTPResponse().text)['elements']
+
+    @classmethod
+    def tearDown(cls):
+        pass
+
+    def test_build_columns(self):
+        columns = build_columns(self.elements, ['id', 'base.contacts.email', 'base.address.geo.lat', 'tags.manual',
+                                                'base.unknown.field'])
+        assert list(columns) == ['id', 'base.contacts.email', 'base.address.geo.lat', 'tags.manual',
+                                 'base.unknown.field'], list(columns)
+        assert columns['base.contacts.email'] == ['email@email.it', 'marco.bosio@axant.it'], columns
+        assert columns['base.address.geo.lat'] == [123, None], columns
+        assert columns['tags.manual'] == [['manual'], []], columns
+        assert columns['base.unknown.field'] == [None, None], columns
+
+    def test_to_frame_unknown_format(self):
+        try:
+            to_frame(build_columns(self.elements, ['id']), format='excel')
+            assert False
+        except ValueError as e:
+            assert 'Unknown format' in str(e), str(e)
+
+    def test_to_frame_pandas_not_installed(self):
+        with mock.patch.dict(sys.modules, {'pandas': None}):
+            try:
+                to_frame(build_columns(self.elements, ['id']), format='pandas')
+                assert False
+            except ImportError as e:
+                assert 'pandas' in str(e), str(e)
+
+    def test_to_frame_arrow_not_installed(self):
+        with mock.patch.dict(sys.modules, {'pyarrow': None}):
+            try:
+                to_frame(build_columns(self.elements, ['id']), format='arrow')
+                assert False
+            except ImportError as e:
+                assert 'pyarrow' in str(e), str(e)
+
+    @mock.patch('requests.get', return_value=FakeHTTPResponse())
+    def test_paginated_list_to_frame(self, mock_get):
+        customers = self.node.get_customers()
+        columns = customers.to_frame(fields=['externalId', 'base.firstName'])
+        assert columns['externalId'] == ['02', None], columns
+        assert columns['base.firstName'] == ['Marco', None], columns
+
+    @mock.patch('requests.get', return_value=FakeHTTPResponse())
+    def test_paginated_list_keeps_only_entities(self, mock_get):
+        customers = self.node.get_customers()
+        assert not hasattr(customers, '_elements')
+        customers[0].base.firstName = 'Changed'
+        columns = customers.to_frame(fields=['externalId', 'base.firstName'])
+        assert columns['externalId'] == ['02', None] and columns['base.firstName'] == ['Changed', None], columns
+        assert mock_get.call_count == 1
+        raw = self.node.get_customers(raw=True)
+        assert raw.to_frame(fields=['externalId'])['externalId'] == ['02', None]
+        assert mock_get.call_count == 2
+
+    @mock.patch('requests.get', return_value=FakeHTTPResponse())
+    def test_paginated_list_to_frame_all_pages(self, mock_get):
+        customers = self.node.get_customers(size=2)
+        with mock.patch('contacthub.models.customer.Customer.__init__') as mock_customer:
+            columns = customers.to_frame(fields=['externalId'], all_pages=True)
+            assert not mock_customer.called
+        assert columns['externalId'] == ['02', None, '02', None], columns
+        assert customers.page_number == 0, customers.page_number
+        params_expected = {'nodeId': '123', 'page': 1, 'size': 2}
+        mock_get.assert_called_with('https://api.contactlab.it/hub/v1/workspaces/123/customers',
+                                    params=params_expected,
+                                    headers={'Authorization': 'Bearer 456', 'Content-Type': 'application/json'})
@@ -0,0 +1,108 @@
+import unittest
+
+import mock
+from requests import ConnectionError
+
+from contacthub.errors.api_error import APIError
+from contacthub.lib.hooks import Hooks
+from contacthub.lib.metrics import Histogram, MetricsCollector
+from contacthub.workspace import Workspace
+from tests.utility import FakeHTTPResponse
+
+
+class TestHooks(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.workspace = Workspace(workspace_id=123, token=456)
+        cls.node = cls.workspace.get_node(123)
+        cls.calls = []
+        for event in Hooks.EVENTS:
+            cls.workspace.add_hook(event, lambda info, event=event: cls.calls.append((event, info)))
+
+    @classmethod
+    def tearDown(cls):
+        pass
+
+    @mock.patch('requests.get', return_value=FakeHTTPResponse(resp_path='tests/util/fake_external_single_response'))
+    def test_hooks_success(self, mock_get):
+        self.node.get_customer(id='01')
+        assert [event for event, _ in self.calls] == ['before_request', 'after_response'], self.calls
+        info = self.calls[1][1]
+        assert info.method == 'get' and info.endpoint == '/customers/{id}' and info.status == 200
+        assert info.request_bytes == 0 and info.response_bytes > 0
+        assert info.total_time == info.serialize_time + info.network_time + info.decode_time
+        mock_get.assert_called_with('https://api.contactlab.it/hub/v1/workspaces/123/customers/01',
+                                    headers={'Authorization': 'Bearer 456', 'Content-Type': 'application/json'})
+
+    @mock.patch('requests.post', return_value=FakeHTTPResponse(resp_path='tests/util/fake_session_response'))
+    def test_hooks_body(self, mock_post):
+        self.node.add_customer_session(customer_id='01', session_id='s1')
+        info = self.calls[0][1]
+        assert info.method == 'post' and info.endpoint == '/customers/{id}/sessions', info
+        assert info.request_bytes > 0
+
+    @mock.patch('requests.get', return_value=FakeHTTPResponse(status_code=401))
+    def test_hooks_error_status(self, mock_get):
+        try:
+            self.node.get_customers()
+            assert False
+        except APIError:
+            pass
+        assert [event for event, _ in self.calls] == ['before_request', 'after_response', 'on_error'], self.calls
+        assert self.calls[2][1].status == 401 and self.calls[2][1].endpoint == '/customers'
+
+    @mock.patch('requests.get', side_effect=ConnectionError('down'))
+    def test_hooks_exception(self, mock_get):
+        try:
+            self.node.get_customers()
+            assert False
+        except ConnectionError:
+            pass
+        assert [event for event, _ in self.calls] == ['before_request', 'on_error'], self.calls
+        assert isinstance(self.calls[1][1].error, ConnectionError) and self.calls[1][1].status is None
+
+    def test_unknown_event(self):
+        try:
+            self.workspace.add_hook('after_request', lambda info: None)
+            assert False
+        except ValueError as e:
+            assert 'Unknown event' in str(e), str(e)
+
+    def test_histogram(self):
+        h = Histogram()
+        for i in range(1, 101):
+            h.record(i / 1000.0)
+        assert h.count == 100 and h.max == 0.1
+        assert abs(h.percentile(50) - 0.05) / 0.05 < 0.2, h.percentile(50)
+        assert abs(h.percentile(99) - 0.099) / 0.099 < 0.2, h.percentile(99)
+        assert h.percentile(100) == 0.1
+        assert h.buckets()[-1][1] == 100
+        assert Histogram().percentile(50) is None
+
+    @mock.patch('requests.get')
+    def test_metrics_collector(self, mock_get):
+        metrics = MetricsCollector()
+        metrics.register(self.workspace)
+        mock_get.return_value = FakeHTTPResponse(resp_path='tests/util/fake_external_single_response')
+        self.node.get_customer(id='01')
+        self.node.get_customer(id='02')
+        mock_get.return_value = FakeHTTPResponse(status_code=404)
+        try:
+            self.node.get_customer(id='03')
+        except APIError:
+            pass
+        mock_get.side_effect = ConnectionError('down')
+        try:
+            self.node.get_customers()
+        except ConnectionError:
+            pass
+        snapshot = metrics.snapshot()
+        assert sorted(snapshot) == ['GET /customers', 'GET /customers/{id}'], snapshot
+        customer = snapshot['GET /customers/{id}']
+        assert customer['requests'] == 3 and customer['errors'] == 1, customer
+        assert customer['statuses'] == {200: 2, 404: 1}, customer
+        assert customer['timings']['network']['count'] == 3 and customer['timings']['total']['p99'] is not None
+        assert snapshot['GET /customers']['requests'] == 1 and snapshot['GET /customers']['errors'] == 1
+        metrics.unregister(self.workspace)
+        metrics.reset()
+        assert metrics.snapshot() == {}
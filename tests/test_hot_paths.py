@@ -0,0 +1,43 @@
+import unittest
+
+from benchmarks.documents import generate_customer, generate_page
+from benchmarks.hot_paths import CASES, compare, run
+
+
+class TestHotPaths(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        pass
+
+    @classmethod
+    def tearDown(cls):
+        pass
+
+    def test_generate_customer(self):
+        customer = generate_customer(index=3, contacts=1, jobs=3, likes=0, subscriptions=4, extended=6, tags=2)
+        assert customer == generate_customer(index=3, contacts=1, jobs=3, likes=0, subscriptions=4, extended=6, tags=2)
+        assert customer['externalId'] == '3'
+        assert len(customer['base']['contacts']['otherContacts']) == 1
+        assert len(customer['base']['jobs']) == 3 and customer['base']['likes'] == []
+        assert len(customer['base']['subscriptions']) == 4
+        assert len(customer['extended']) == 6
+        assert customer['tags'] == {'manual': ['manual0', 'manual1'], 'auto': ['auto0', 'auto1']}
+
+    def test_generate_page(self):
+        page = generate_page(size=5, number=2, total_pages=4)
+        assert [c['externalId'] for c in page['elements']] == ['10', '11', '12', '13', '14']
+        assert page['page'] == {'size': 5, 'totalElements': 20, 'totalPages': 4, 'totalUnfilteredElements': 0,
+                                'number': 2}
+
+    def test_run(self):
+        result = run(params={'page_size': 2}, number=1, repeat=1)
+        assert sorted(result['results']) == sorted(name for name, _ in CASES)
+        assert all(r['seconds'] > 0 for r in result['results'].values()), result
+
+    def test_compare(self):
+        baseline = {'results': {'a': {'seconds': 1.0, 'peak_bytes': 100}, 'b': {'seconds': 1.0, 'peak_bytes': None}}}
+        current = {'results': {'a': {'seconds': 1.05, 'peak_bytes': 200}, 'b': {'seconds': 0.5, 'peak_bytes': None},
+                               'c': {'seconds': 1.0, 'peak_bytes': 1}}}
+        assert compare(current, baseline, tolerance=0.1) == [
+            {'case': 'a', 'seconds': 1.05, 'peak_bytes': 2.0, 'regressed': True},
+            {'case': 'b', 'seconds': 0.5, 'peak_bytes': None, 'regressed': False}]
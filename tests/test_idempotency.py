@@ -0,0 +1,141 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+
+import mock
+from requests import ConnectionError, HTTPError
+
+from contacthub.lib.idempotency import EventDeduplicator, event_key
+from contacthub.models.event import Event
+from tests.fake_server import FakeContacthubServer
+
+
+class TestIdempotency(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+        cls.server.add_customers([{'id': 'c1', 'externalId': 'e1'}])
+
+    @classmethod
+    def tearDown(cls):
+        cls.server.stop()
+
+    def event(self, number, **attributes):
+        event = {'customerId': 'c1', 'type': 'viewedPage', 'context': 'WEB', 'date': datetime(2026, 1, 1, 10, 0, 0),
+                 'properties': {'number': number}}
+        event.update(attributes)
+        return event
+
+    def test_event_key(self):
+        key = event_key(self.event(1))
+        assert key == event_key(self.event(1, context='APP', properties={'number': 1}))
+        assert key == event_key(self.event(1, date='2026-01-01T10:00:00Z'))
+        assert key != event_key(self.event(2))
+        assert key != event_key(self.event(1, customerId='c2'))
+        assert key != event_key(self.event(1, date=datetime(2026, 1, 1, 10, 0, 1)))
+
+    def test_duplicates_dropped(self):
+        deduplicator = self.node.deduplicate_events()
+        self.node.add_event(**self.event(1))
+        self.node.add_event(**self.event(1))
+        Event(node=self.node, **self.event(1)).post()
+        self.node.add_event(**self.event(2))
+        undated = self.event(3)
+        del undated['date']
+        self.node.add_event(**undated)
+        self.node.add_event(**undated)
+        assert sorted(e['properties']['number'] for e in self.server.events.values()) == [1, 2, 3, 3]
+        counters = deduplicator.counters
+        assert counters['posted'] == 4 and counters['duplicates'] == 2 and counters['retries'] == 0
+        assert counters['duplicate_rate'] == 2 / 6.0
+
+    def test_capacity(self):
+        deduplicator = self.node.deduplicate_events(capacity=2)
+        for number in (1, 2, 3, 1):
+            self.node.add_event(**self.event(number))
+        assert deduplicator.counters['duplicates'] == 0 and len(deduplicator.keys) == 2
+
+    def test_retries(self):
+        deduplicator = self.node.deduplicate_events(header='Idempotency-Key', retry_delay=0)
+        calls = []
+        post = self.node.event_api_manager._post
+
+        def flaky_post(body, headers):
+            calls.append(headers)
+            if len(calls) < 3:
+                raise ConnectionError('timeout')
+            return post(body, headers)
+
+        self.node.event_api_manager._post = flaky_post
+        self.node.add_event(**self.event(1))
+        assert len(calls) == 3 and len(self.server.events) == 1
+        assert calls[0]['Idempotency-Key'] == calls[2]['Idempotency-Key'] == event_key(self.event(1))
+        assert 'Idempotency-Key' not in self.node.event_api_manager.headers
+        assert deduplicator.counters['retries'] == 2 and deduplicator.counters['retry_rate'] == 2.0
+
+        #  after the last retry fails, the event is not remembered and can be posted again
+        def failing_post(body, headers):
+            raise ConnectionError('timeout')
+
+        self.node.event_api_manager._post = failing_post
+        self.assertRaises(ConnectionError, self.node.add_event, **self.event(2))
+        self.node.event_api_manager._post = post
+        self.node.add_event(**self.event(2))
+        assert len(self.server.events) == 2
+
+    def test_client_errors_not_retried(self):
+        deduplicator = self.node.deduplicate_events(retry_delay=0)
+        self.assertRaises(HTTPError, self.node.add_event, type='viewedPage', context='WEB', date=datetime(2026, 1, 1))
+        assert deduplicator.counters['retries'] == 0 and deduplicator.counters['posted'] == 0
+        self.server.error_rate = 1
+        self.server.error_status = 429
+        self.assertRaises(HTTPError, self.node.add_event, **self.event(1))
+        assert deduplicator.counters['retries'] == 2
+
+    def test_ambiguous_errors_retried_only_with_key(self):
+        deduplicator = self.node.deduplicate_events(retry_delay=0)
+        self.server.error_rate = 1
+        try:
+            self.node.add_event(**self.event(1))
+            assert False
+        except HTTPError as e:
+            assert e.status_code == 503
+        calls = []
+
+        def failing_post(body, headers):
+            calls.append(headers)
+            raise ConnectionError('read timeout')
+
+        self.node.event_api_manager._post = failing_post
+        self.assertRaises(ConnectionError, self.node.add_event, **self.event(1))
+        assert deduplicator.counters['retries'] == 0 and len(calls) == 1
+        deduplicator = self.node.deduplicate_events(header='Idempotency-Key', retry_delay=0)
+        self.assertRaises(ConnectionError, self.node.add_event, **self.event(1))
+        assert deduplicator.counters['retries'] == 2 and len(calls) == 4
+
+    def test_concurrent_duplicates(self):
+        deduplicator = EventDeduplicator()
+        release = threading.Event()
+        posted = []
+
+        def slow_post(body, headers):
+            release.wait()
+            posted.append(body)
+
+        thread = threading.Thread(target=deduplicator.post, args=(slow_post, self.event(1), {}))
+        thread.start()
+        while not deduplicator.in_flight:
+            time.sleep(0.001)
+        assert deduplicator.post(slow_post, self.event(1), {}) is None
+        release.set()
+        thread.join()
+        assert len(posted) == 1 and deduplicator.counters['duplicates'] == 1
+
+    @mock.patch('requests.post')
+    def test_header_only_when_configured(self, mock_post):
+        mock_post.return_value.text = ''
+        self.node.deduplicate_events()
+        self.node.add_event(**self.event(1))
+        assert 'Idempotency-Key' not in mock_post.call_args[1]['headers']
@@ -0,0 +1,103 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from contacthub.lib.importer import ColumnMapping, FileImporter
+from tests.fake_server import FakeContacthubServer
+
+
+class TestImporter(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+        cls.server.add_customers([{'id': 'existing', 'externalId': 'p3'}])
+
+    @classmethod
+    def tearDown(cls):
+        cls.server.stop()
+        shutil.rmtree(cls.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write(self, name, text):
+        with io.open(self.path(name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def read_rejects(self, name='rejects.ndjson'):
+        with io.open(self.path(name), encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_column_mapping(self):
+        mapping = ColumnMapping({'mail': 'base.contacts.email', 'name': 'base.firstName', 'code': 'externalId',
+                                 'points': ('extended.points', int)})
+        record = mapping.apply({'mail': 'a@b.c', 'name': '', 'code': 'x', 'points': '12', 'other': 'ignored'})
+        assert record == {'base': {'contacts': {'email': 'a@b.c'}}, 'externalId': 'x', 'extended': {'points': 12}}
+        try:
+            mapping.apply({'points': 'many'})
+            assert False
+        except ValueError as e:
+            assert 'points' in str(e)
+
+    def test_import_csv(self):
+        self.write('partners.csv', u'code,mail,name,points\n'
+                                   u'p1,p1@a.b,J\xfcrgen,10\n'
+                                   u',missing@a.b,No code,1\n'
+                                   u'p2,p2@a.b,"Doe, Jane",x\n'
+                                   u'p3,p3@a.b,Duplicate,3\n'
+                                   u'p4,p4@a.b,,4\n')
+        mapping = {'code': 'externalId', 'mail': 'base.contacts.email', 'name': 'base.firstName',
+                   'points': ('extended.points', int)}
+        result = self.node.import_file(self.path('partners.csv'), mapping=mapping, required=['externalId'],
+                                       rejects=self.path('rejects.ndjson'), batch_size=2, concurrency=3)
+        assert result.counts == {'read': 5, 'imported': 2, 'rejected': 3}, result
+        customers = dict((c['externalId'], c) for c in self.server.customers.values())
+        assert customers['p1']['base']['firstName'] == u'J\xfcrgen' and customers['p1']['extended'] == {'points': 10}
+        assert 'firstName' not in customers['p4']['base']
+        rejects = sorted(self.read_rejects(), key=lambda r: r['line'])
+        assert [(r['line'], r['stage']) for r in rejects] == [(3, 'validation'), (4, 'validation'), (5, 'write')]
+        assert rejects[0]['row']['mail'] == 'missing@a.b' and 'externalId' in rejects[0]['error']
+        assert 'Conflict' in rejects[2]['error']
+
+    def test_import_ndjson_events(self):
+        self.write('events.ndjson', u'{"customerId": "existing", "type": "viewedPage", "context": "WEB"}\n\n'
+                                    u'not json\n'
+                                    u'{"type": "viewedPage", "context": "WEB"}\n')
+
+        def validate(event):
+            if 'customerId' not in event:
+                raise ValueError('Missing customer')
+
+        result = self.node.import_file(self.path('events.ndjson'), entity='event', validate=validate,
+                                       rejects=self.path('rejects.ndjson'))
+        assert result.counts == {'read': 3, 'imported': 1, 'rejected': 2}, result
+        assert [r['line'] for r in self.read_rejects()] == [3, 4]
+        assert [e['type'] for e in self.server.events.values()] == ['viewedPage']
+
+    def test_backpressure(self):
+        self.write('many.ndjson', u''.join(u'{"externalId": "m%s"}\n' % i for i in range(40)))
+        release = threading.Event()
+        active = []
+
+        def add(**record):
+            active.append(record)
+            release.wait()
+
+        importer = FileImporter(self.node, batch_size=5, concurrency=2, queue_size=1)
+        importer.add = add
+        thread = threading.Thread(target=importer.run, args=(self.path('many.ndjson'),))
+        thread.start()
+        try:
+            thread.join(0.3)
+            #  2 writers blocked on their first record, and 1 batch waiting in the queue
+            assert thread.is_alive() and len(active) == 2
+        finally:
+            release.set()
+            thread.join()
+        assert len(active) == 40
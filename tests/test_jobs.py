@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from contacthub.lib.jobs import Checkpoint, ImportJob, NDJSONWriter
+from contacthub.models.customer import Customer
+from tests.fake_server import FakeContacthubServer
+
+
+class FailingWriter(NDJSONWriter):
+    def __init__(self, path, fail_after):
+        super(FailingWriter, self).__init__(path)
+        self.fail_after = fail_after
+
+    def write(self, record):
+        if self.fail_after == 0:
+            raise IOError('disk full')
+        self.fail_after -= 1
+        super(FailingWriter, self).write(record)
+
+
+class TestJobs(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+        cls.server.add_customers([{'id': 'c%02d' % i, 'externalId': str(i),
+                                   'registeredAt': (datetime(2020, 1, 1) + timedelta(hours=i)).strftime(
+                                       '%Y-%m-%dT%H:%M:%S.000+0000')} for i in range(25)])
+
+    @classmethod
+    def tearDown(cls):
+        cls.server.stop()
+        shutil.rmtree(cls.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def read_ids(self, name):
+        with open(self.path(name)) as f:
+            return [json.loads(line)['id'] for line in f]
+
+    def test_checkpoint(self):
+        checkpoint = Checkpoint(self.path('checkpoint'))
+        assert checkpoint.load() is None
+        checkpoint.save({'page': 1})
+        checkpoint.save({'page': 2})
+        assert checkpoint.load() == {'page': 2}
+        assert os.listdir(self.directory) == ['checkpoint']
+        checkpoint.clear()
+        assert checkpoint.load() is None
+
+    def test_export_resume(self):
+        job = self.node.export_job(self.path('export.checkpoint'), size=4)
+        try:
+            job.run(FailingWriter(self.path('out.ndjson'), fail_after=10))
+            assert False
+        except IOError:
+            pass
+        assert Checkpoint(self.path('export.checkpoint')).load()['cursor'] == 2
+        requests = self.server.requests['GET /customers']
+        assert self.node.export_job(self.path('export.checkpoint'), size=4).run(
+            NDJSONWriter(self.path('out.ndjson'))) == 25
+        assert self.read_ids('out.ndjson') == ['c%02d' % i for i in range(25)]
+        assert self.server.requests['GET /customers'] - requests == 5
+        assert job.run(NDJSONWriter(self.path('other.ndjson'))) == 25
+        assert not os.path.exists(self.path('other.ndjson'))
+
+    def test_export_partitions_resume(self):
+        query = self.node.query(Customer).filter(Customer.externalId != '3')
+        checkpoint = self.path('scan.checkpoint')
+        try:
+            self.node.export_job(checkpoint, query=query, size=3, partitions=3).run(
+                FailingWriter(self.path('out.ndjson'), fail_after=13))
+            assert False
+        except IOError:
+            pass
+        assert len(self.read_ids('out.ndjson')) <= 13
+        try:
+            self.node.export_job(checkpoint, size=3, partitions=3).run(NDJSONWriter(self.path('out.ndjson')))
+            assert False
+        except ValueError:
+            pass
+        assert self.node.export_job(checkpoint, query=query, size=3, partitions=3).run(
+            NDJSONWriter(self.path('out.ndjson'))) == 24
+        assert sorted(self.read_ids('out.ndjson')) == ['c%02d' % i for i in range(25) if i != 3]
+
+    def test_export_resume_date_query(self):
+        query = self.node.query(Customer).filter(Customer.registeredAt >= datetime(2020, 1, 1, 4, 30))
+        checkpoint = self.path('dates.checkpoint')
+        try:
+            self.node.export_job(checkpoint, query=query, size=4).run(FailingWriter(self.path('out.ndjson'), 6))
+            assert False
+        except IOError:
+            pass
+        assert self.node.export_job(checkpoint, query=query, size=4).run(NDJSONWriter(self.path('out.ndjson'))) == 20
+        assert self.read_ids('out.ndjson') == ['c%02d' % i for i in range(5, 25)]
+
+    def test_import_resume(self):
+        with open(self.path('in.ndjson'), 'w') as f:
+            for i in range(7):
+                f.write(json.dumps({'externalId': 'new%s' % i}) + '\n')
+            f.write('\n')
+            f.write(json.dumps({'externalId': '3'}) + '\n')
+        calls = []
+
+        def add(record):
+            calls.append(record['externalId'])
+            if len(calls) == 4:
+                raise KeyboardInterrupt
+            return self.node.add_customer(**record)
+
+        job = self.node.import_job(self.path('in.ndjson'), self.path('import.checkpoint'),
+                                   self.path('outcomes.ndjson'), function=add, batch_size=3, concurrency=1)
+        try:
+            job.run()
+            assert False
+        except KeyboardInterrupt:
+            pass
+        assert Checkpoint(self.path('import.checkpoint')).load()['line'] == 3
+        job = ImportJob(self.node, self.path('in.ndjson'), self.path('import.checkpoint'),
+                        self.path('outcomes.ndjson'), batch_size=3)
+        assert job.run() == {'imported': 7, 'failed': 1}
+        with open(self.path('outcomes.ndjson')) as f:
+            outcomes = [json.loads(line) for line in f]
+        assert [o['line'] for o in outcomes] == [1, 2, 3, 4, 5, 6, 7, 9]
+        assert outcomes[-1]['outcome'] == 'failed' and 'Conflict' in outcomes[-1]['error']
+        assert len(self.server.customers) == 32
+
+    def test_import_malformed_lines(self):
+        with open(self.path('in.ndjson'), 'w') as f:
+            f.write(json.dumps({'externalId': 'new0'}) + '\n')
+            f.write('{"externalId": \n')
+            f.write('[1, 2]\n')
+            f.write(json.dumps({'externalId': 'new1'}) + '\n')
+        job = self.node.import_job(self.path('in.ndjson'), self.path('import.checkpoint'),
+                                   self.path('outcomes.ndjson'), batch_size=2)
+        assert job.run() == {'imported': 2, 'failed': 2}
+        with open(self.path('outcomes.ndjson')) as f:
+            outcomes = [json.loads(line) for line in f]
+        assert [(o['line'], o['outcome']) for o in outcomes] == [(1, 'imported'), (2, 'failed'), (3, 'failed'),
+                                                                 (4, 'imported')]
+        assert 'not a JSON object' in outcomes[2]['error']
+        assert Checkpoint(self.path('import.checkpoint')).load()['done']
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from benchmarks.documents import generate_customer
+from contacthub.errors.api_error import APIError
+from contacthub.lib.json_stream import JSONArrayStream
+from contacthub.models.customer import Customer
+from tests.fake_server import FakeContacthubServer
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestJSONArrayStream(unittest.TestCase):
+    def test_chunk_boundaries(self):
+        document = {'page': {'size': 12345, 'number': 0}, 'elements': [{'a': '[{"}]', 'b': [1.5, None, True]},
+                                                                        {'name': u'caf\xe9 ☃'}, 123456, 'x'],
+                    'other': [1, {'c': 2}]}
+        text = json.dumps(document, ensure_ascii=False)
+        for size in (1, 2, 3, 7, len(text)):
+            for chunks in (chunked(text, size), chunked(text.encode('utf-8'), size)):
+                stream = JSONArrayStream(chunks)
+                assert list(stream) == document['elements'], (size, chunks)
+                assert stream.metadata == {'page': document['page'], 'other': document['other']}
+
+    def test_empty(self):
+        stream = JSONArrayStream([' { "elements" : [ ] , "page" : {} } '])
+        assert list(stream) == [] and stream.metadata == {'page': {}}
+        assert list(JSONArrayStream(['{}'])) == []
+
+    def test_truncated(self):
+        closed = []
+        stream = JSONArrayStream(['{"elements": [{"a": 1}, {"a": '], close=lambda: closed.append(True))
+        elements = iter(stream)
+        assert next(elements) == {'a': 1}
+        try:
+            next(elements)
+            assert False
+        except ValueError:
+            pass
+        assert closed == [True]
+
+    def test_invalid(self):
+        try:
+            list(JSONArrayStream(['[1, 2]']))
+            assert False
+        except ValueError as e:
+            assert 'Expecting' in str(e)
+
+    @unittest.skipUnless(hasattr(tracemalloc, 'reset_peak'), 'tracemalloc.reset_peak is not available')
+    def test_memory(self):
+        text = json.dumps({'elements': [generate_customer(index=i) for i in range(2000)], 'page': {}})
+        chunks = chunked(text.encode('utf-8'), 65536)
+        tracemalloc.start()
+        try:
+            for _ in JSONArrayStream(chunks):
+                pass
+            streamed = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+            json.loads(b''.join(chunks).decode('utf-8'))
+            loaded = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert streamed * 5 < loaded, (streamed, loaded)
+
+
+class TestStreamCustomers(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+        cls.server.add_customers([{'externalId': str(i), 'tags': {'manual': ['even' if i % 2 == 0 else 'odd']}}
+                                  for i in range(25)])
+
+    @classmethod
+    def tearDown(cls):
+        cls.server.stop()
+
+    def test_stream_customers(self):
+        customers = list(self.node.stream_customers(size=10))
+        assert all(isinstance(c, Customer) for c in customers)
+        assert [c.externalId for c in customers] == [str(i) for i in range(25)]
+        assert self.server.requests['GET /customers'] == 3
+
+    def test_query_and_raw(self):
+        query = self.node.query(Customer).filter(Customer.tags.manual == 'odd')
+        customers = list(self.node.stream_customers(query=query, size=4, fields=['externalId'], raw=True))
+        assert [c['externalId'] for c in customers] == [str(i) for i in range(1, 25, 2)]
+        assert set(customers[0]) == set(['id', 'externalId'])
+
+    def test_hooks_and_errors(self):
+        statuses = []
+        self.node.workspace.add_hook('after_response', lambda info: statuses.append(info.status))
+        assert len(list(self.node.stream_customers(size=20))) == 25
+        assert statuses == [200, 200]
+        self.server.error_rate = 1
+        try:
+            list(self.node.stream_customers())
+            assert False
+        except APIError as e:
+            assert '503' in str(e), str(e)
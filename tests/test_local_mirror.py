@@ -0,0 +1,137 @@
+import json
+import unittest
+
+import mock
+
+from contacthub.lib.local_mirror import LocalMirror
+from contacthub.models.customer import Customer
+from contacthub.models.query import in_, not_in_
+from contacthub.workspace import Workspace
+from tests.utility import FakeHTTPResponse
+
+
+class TestLocalMirror(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        w = Workspace(workspace_id=123, token=456)
+        cls.node = w.get_node(123)
+        cls.mirror = LocalMirror(node=cls.node)
+
+    @classmethod
+    def tearDown(cls):
+        cls.mirror.close()
+
+    def fill(self):
+        self.mirror.store(json.loads(FakeHTTPResponse().text)['elements'])
+
+    def test_store(self):
+        self.fill()
+        assert len(self.mirror) == 2, len(self.mirror)
+        customers = self.mirror.get_customers()
+        assert isinstance(customers[0], Customer), type(customers[0])
+        assert customers[0].base.contacts.email == 'email@email.it', customers[0].base.contacts.email
+        assert customers[0].node is self.node, customers[0].node
+
+    def test_store_replace(self):
+        self.fill()
+        customer = self.mirror.get_customer(id='0745ef01-ad77-4662-b3c7-b8513ce94384')
+        customer.attributes['tags']['manual'] = ['new']
+        self.mirror.store([customer])
+        assert len(self.mirror) == 2, len(self.mirror)
+        assert not self.mirror.get_customers_by_tag('manual')
+        assert self.mirror.get_customers_by_tag('new')[0].id == customer.id
+
+    def test_get_customer(self):
+        self.fill()
+        assert self.mirror.get_customer(external_id='02').id == '0745ef01-ad77-4662-b3c7-b8513ce94384'
+        assert self.mirror.get_customer(id='unknown') is None
+        try:
+            self.mirror.get_customer(id='01', external_id='02')
+            assert False
+        except ValueError as e:
+            assert 'both' in str(e), str(e)
+
+    def test_get_customers_by_email(self):
+        self.fill()
+        customers = self.mirror.get_customers_by_email('marco.bosio@axant.it')
+        assert [c.id for c in customers] == ['8b321dce-53c4-4029-8388-1938efa2090c'], customers
+
+    def test_get_customers_by_tag(self):
+        self.fill()
+        assert [c.externalId for c in self.mirror.get_customers_by_tag('auto', kind='auto')] == ['02']
+        assert not self.mirror.get_customers_by_tag('auto')
+
+    def test_filter(self):
+        self.fill()
+        customers = self.mirror.filter((Customer.externalId == '02') | (Customer.base.contacts.email == None))
+        assert [c.externalId for c in customers] == ['02'], customers
+        customers = self.mirror.filter(not_in_('manual', Customer.tags.manual))
+        assert [c.externalId for c in customers] == [None], customers
+        customers = self.mirror.filter(in_(['manual', 'other'], Customer.tags.manual) & (Customer.externalId != '01'))
+        assert [c.externalId for c in customers] == ['02'], customers
+
+    def test_filter_query(self):
+        self.fill()
+        q1 = self.node.query(Customer).filter(Customer.externalId == '02')
+        q2 = self.node.query(Customer).filter(Customer.base.contacts.email == 'marco.bosio@axant.it')
+        assert len(self.mirror.filter(q1 | q2)) == 2
+        assert len(self.mirror.filter(q1 & q2)) == 0
+        assert len(self.mirror.filter(self.node.query(Customer))) == 2
+
+    def test_filter_not_indexed(self):
+        self.fill()
+        customers = self.mirror.filter((Customer.base.firstName == 'Marco') | (Customer.externalId == None))
+        assert len(customers) == 2, customers
+        customers = self.mirror.filter((Customer.base.firstName == 'Marco') & (Customer.externalId == None))
+        assert len(customers) == 0, customers
+
+    def test_not_in_null(self):
+        self.fill()
+        criterion = not_in_(['02'], Customer.externalId)
+        expected = [c.id for c in self.node.query(Customer).filter(criterion).evaluate(self.mirror.get_customers())]
+        assert [c.id for c in self.mirror.filter(criterion)] == expected and len(expected) == 1
+        customers = self.mirror.filter(criterion & (Customer.base.firstName != 'Nobody'))
+        assert [c.id for c in customers] == expected, customers
+        params = []
+        assert self.mirror._compile_condition({'type': 'atomic', 'attribute': 'externalId', 'operator': 'NOT_IN',
+                                               'value': ['02']}, params) == \
+            '(external_id IS NULL OR external_id NOT IN (?))'
+
+    def test_many_values(self):
+        self.mirror.store([{'id': 'c%04d' % i, 'externalId': str(i), 'tags': {'manual': ['t%s' % (i % 7)]}}
+                           for i in range(2000)] + [{'id': 'none'}])
+        ids = ['c%04d' % i for i in range(0, 3000, 2)]
+        external_ids = [str(i) for i in range(0, 3000, 3)]
+        tags = ['t%s' % i for i in range(3)] + ['x%s' % i for i in range(1500)]
+        criteria = [in_(ids, Customer.id), not_in_(external_ids, Customer.externalId),
+                    in_(tags, Customer.tags.manual), not_in_(tags, Customer.tags.manual),
+                    in_(ids, Customer.id) & not_in_(external_ids, Customer.externalId)]
+        everyone = self.mirror.get_customers()
+        for json_each in (True, False):
+            self.mirror.json_each = json_each
+            for criterion in criteria:
+                expected = [c.id for c in self.node.query(Customer).filter(criterion).evaluate(everyone)]
+                assert [c.id for c in self.mirror.filter(criterion)] == expected and expected
+        params = []
+        self.mirror.json_each = True
+        condition = {'type': 'atomic', 'attribute': 'id', 'operator': 'IN', 'value': ids}
+        assert self.mirror._compile_condition(condition, params) == 'id IN (SELECT value FROM json_each(?))'
+        assert len(params) == 1
+
+    def test_remove(self):
+        self.fill()
+        self.mirror.remove('8b321dce-53c4-4029-8388-1938efa2090c')
+        assert len(self.mirror) == 1, len(self.mirror)
+
+    @mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.get_all')
+    def test_sync(self, mock_get_all):
+        mock_get_all.return_value = json.loads(FakeHTTPResponse(resp_path='tests/util/fake_query_response').text)
+        mock_get_all.return_value['page']['totalPages'] = 1
+        stored = self.mirror.sync()
+        assert stored == len(self.mirror) > 0, stored
+        assert self.mirror.watermark.updated_at is not None
+        mock_get_all.assert_called_with(page=0, query=None)
+
+        self.mirror.sync(size=100)
+        assert mock_get_all.call_args[1]['query'] is not None, mock_get_all.call_args
+        assert mock_get_all.call_args[1]['size'] == 100, mock_get_all.call_args
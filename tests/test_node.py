@@ -40,6 +40,16 @@ class TestNode(TestSuite):
         assert type(customers) is PaginatedList, type(customers)
         assert customers[0].enabled, customers[0]
 
+    @mock.patch('requests.get', return_value=FakeHTTPResponse())
+    def test_get_customers_raw(self, mock_get):
+        customers = self.node.get_customers(raw=True)
+        params_expected = {'nodeId': '123'}
+        mock_get.assert_called_with(self.base_url, params=params_expected, headers=self.headers_expected)
+        assert type(customers) is PaginatedList, type(customers)
+        assert isinstance(customers[0], dict), type(customers[0])
+        assert customers[0]['base']['contacts']['email'] == 'email@email.it', customers[0]
+        assert customers.total_elements == 2, customers.total_elements
+
     @mock.patch('requests.get')
     def test_query(self, mock_get):
         mock_get.return_value = FakeHTTPResponse(resp_path='tests/util/fake_query_response')
@@ -332,6 +342,13 @@ class TestNode(TestSuite):
         assert isinstance(e, list), type(e)
         assert e[0].customerId =='8b321dce-53c4-4029-8388-1938efa2090c', e[0].customerId
 
+    @mock.patch('requests.get', return_value=FakeHTTPResponse(resp_path='tests/util/fake_event_response'))
+    def test_get_all_events_raw(self, mock_get):
+        e = self.node.get_events(customer_id='8b321dce-53c4-4029-8388-1938efa2090c', raw=True)
+        mock_get.assert_called_with(self.base_events_url, headers=self.headers_expected, params={'customerId':'8b321dce-53c4-4029-8388-1938efa2090c'})
+        assert isinstance(e[0], dict), type(e[0])
+        assert e[0]['customerId'] == '8b321dce-53c4-4029-8388-1938efa2090c', e[0]
+
     @mock.patch('requests.get', return_value=FakeHTTPResponse(resp_path='tests/util/fake_single_event_response'))
     def test_get_event(self, mock_get):
         e = self.node.get_event(id='123')
@@ -0,0 +1,50 @@
+import unittest
+
+from tests.fake_server import FakeContacthubServer
+from benchmarks.parallel_export import run
+from contacthub.lib.parallel_export import node_config, node_from_config
+from contacthub.models.customer import Customer
+
+
+def to_row(customer):
+    return customer.externalId, customer.base.firstName
+
+
+class TestParallelExport(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+        cls.server.add_customers([{'externalId': str(i), 'base': {'firstName': 'Name %s' % i},
+                                   'tags': {'manual': ['even' if i % 2 == 0 else 'odd']}} for i in range(45)])
+
+    @classmethod
+    def tearDown(cls):
+        cls.server.stop()
+
+    def test_node_config(self):
+        node = node_from_config(node_config(self.node))
+        assert node.node_id == self.node.node_id and node.workspace.base_url == self.node.workspace.base_url
+        assert node.workspace.token == self.node.workspace.token
+
+    def test_export(self):
+        expected = [(str(i), 'Name %s' % i) for i in range(45)]
+        for workers in (1, 3):
+            export = self.node.export_parallel(workers=workers, transform=to_row, size=10)
+            assert list(export) == expected, workers
+            assert export.total_pages == 5 and export.total_elements == 45 and export.exported == 45
+
+    def test_query_and_raw_records(self):
+        query = self.node.query(Customer).filter(Customer.tags.manual == 'odd')
+        records = list(self.node.export_parallel(workers=2, query=query, size=4, fields=['externalId']))
+        assert [r['externalId'] for r in records] == [str(i) for i in range(1, 45, 2)]
+        assert set(records[0]) == set(['id', 'externalId']), records[0]
+
+    def test_early_stop(self):
+        export = iter(self.node.export_parallel(workers=2, transform=to_row, size=5))
+        assert next(export) == ('0', 'Name 0')
+        export.close()
+
+    def test_benchmark(self):
+        results = run(customers=20, size=6, workers=(1, 2))
+        assert [(r['workers'], r['customers']) for r in results] == [(1, 20), (2, 20)], results
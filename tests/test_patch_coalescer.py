@@ -0,0 +1,126 @@
+import time
+import unittest
+
+import mock
+from requests import HTTPError
+
+from contacthub.lib.patch_coalescer import PatchCoalescer, merge_patches
+from contacthub.workspace import Workspace
+from tests.fake_server import FakeContacthubServer
+
+
+class TestPatchCoalescer(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+        cls.customer = cls.node.add_customer(externalId='01', base={'firstName': 'Bruce', 'lastName': 'Wayne'})
+
+    @classmethod
+    def tearDown(cls):
+        cls.server.stop()
+
+    def test_merge_patches(self):
+        pending = {'base': {'firstName': 'a', 'contacts': {'email': 'a@a.it'}}, 'tags': {'manual': ['a']}}
+        merge_patches(pending, {'base': {'contacts': {'email': None, 'fax': 'f'}}, 'tags': {'manual': ['b']},
+                                'extra': None})
+        assert pending == {'base': {'firstName': 'a', 'contacts': {'email': None, 'fax': 'f'}},
+                           'tags': {'manual': ['b']}, 'extra': None}, pending
+
+    def test_flush_on_demand(self):
+        coalescer = self.node.coalesce_patches(window=None)
+        assert self.node.update_customer(id=self.customer.id, base={'firstName': 'Clark'}) is None
+        self.node.update_customer(id=self.customer.id, base={'lastName': 'Kent'}, extra='1')
+        self.node.update_customer(id=self.customer.id, extra='2')
+        assert self.node.get_customer(id=self.customer.id).base.firstName == 'Bruce'
+        responses = coalescer.flush(self.customer.id)
+        assert responses[self.customer.id]['extra'] == '2'
+        customer = self.node.get_customer(id=self.customer.id)
+        assert customer.base.firstName == 'Clark' and customer.base.lastName == 'Kent' and customer.extra == '2'
+        assert self.server.requests['PATCH /customers/{id}'] == 1, self.server.requests
+        assert coalescer.stats == {'received': 3, 'sent': 1, 'pending': 0, 'errors': 0}, coalescer.stats
+        assert coalescer.flush() == {}
+
+    def test_window(self):
+        coalescer = self.node.coalesce_patches(window=0.05)
+        other = self.node.add_customer(externalId='02')
+        for i in range(5):
+            self.node.update_customer(id=self.customer.id, extra=str(i))
+        self.node.update_customer(id=other.id, extra='other')
+        customer = self.node.get_customer(id=self.customer.id)
+        customer.base.firstName = 'Clark'
+        customer.patch()
+        deadline = time.time() + 5
+        while coalescer.stats['sent'] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        customer = self.node.get_customer(id=self.customer.id)
+        assert customer.extra == '4' and customer.base.firstName == 'Clark', customer.to_dict()
+        assert self.node.get_customer(id=other.id).extra == 'other'
+        assert self.server.requests['PATCH /customers/{id}'] == 2, self.server.requests
+
+    def test_full_update_flushes(self):
+        coalescer = self.node.coalesce_patches(window=None)
+        self.node.update_customer(id=self.customer.id, extra='patched')
+        customer = self.node.get_customer(id=self.customer.id)
+        self.node.update_customer(full_update=True, **dict(customer.to_dict(), extra='put'))
+        assert coalescer.stats['pending'] == 0
+        assert self.node.get_customer(id=self.customer.id).extra == 'put'
+
+    def test_errors_on_expired_window(self):
+        coalescer = self.node.coalesce_patches(window=0.01)
+        self.server.error_rate = 1
+        self.node.update_customer(id=self.customer.id, extra='lost')
+        deadline = time.time() + 5
+        while not coalescer.errors and time.time() < deadline:
+            time.sleep(0.01)
+        assert coalescer.errors[0][0] == self.customer.id and '503' in str(coalescer.errors[0][1])
+        assert coalescer.stats['pending'] == 1
+        self.assertRaises(HTTPError, coalescer.close)
+        self.node.update_customer(id=self.customer.id, base={'firstName': 'Clark'})
+        self.server.error_rate = 0
+        coalescer.close()
+        customer = self.node.get_customer(id=self.customer.id)
+        assert customer.extra == 'lost' and customer.base.firstName == 'Clark'
+        assert coalescer.stats['pending'] == 0
+
+    def test_retry_after_failure(self):
+        coalescer = PatchCoalescer(self.node, window=0.01, max_retry_delay=0.02, max_errors=2)
+        self.node.patch_coalescer = coalescer
+        self.server.error_rate = 1
+        self.node.update_customer(id=self.customer.id, extra='retried')
+        deadline = time.time() + 5
+        while coalescer.stats['errors'] < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(coalescer.errors) == 2 and coalescer.stats['errors'] >= 3
+        self.node.update_customer(id=self.customer.id, base={'firstName': 'Clark'})
+        self.server.error_rate = 0
+        while not coalescer.stats['sent'] and time.time() < deadline:
+            time.sleep(0.01)
+        customer = self.node.get_customer(id=self.customer.id)
+        assert customer.extra == 'retried' and customer.base.firstName == 'Clark'
+        assert not coalescer.failures and not coalescer.timers
+
+    def test_requeue_before_later_patches(self):
+        coalescer = self.node.coalesce_patches(window=None)
+        patch = self.node.customer_api_manager.patch
+
+        def failing_patch(_id, body):
+            #  a patch received while the request is sent
+            self.node.update_customer(id=_id, extra='later')
+            raise HTTPError('Status code: 503')
+
+        self.node.update_customer(id=self.customer.id, extra='earlier', base={'firstName': 'Clark'})
+        self.node.customer_api_manager.patch = failing_patch
+        self.assertRaises(HTTPError, coalescer.flush)
+        self.node.customer_api_manager.patch = patch
+        assert coalescer.pending[self.customer.id] == {'extra': 'later', 'base': {'firstName': 'Clark'}}
+        coalescer.flush()
+        customer = self.node.get_customer(id=self.customer.id)
+        assert customer.extra == 'later' and customer.base.firstName == 'Clark'
+
+    @mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.patch')
+    def test_without_coalescer(self, mock_patch):
+        node = Workspace(workspace_id=123, token=456).get_node(123)
+        mock_patch.return_value = {'id': '01'}
+        node.update_customer(id='01', extra='a')
+        mock_patch.assert_called_with(_id='01', body={'extra': 'a'})
@@ -142,6 +142,18 @@ class TestQuery(unittest.TestCase):
                                       })
         mock_get.assert_called_with(self.base_url, headers=self.headers_expected, params=params)
 
+    @mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.get_all',
+                return_value=json.loads(FakeHTTPResponse().text))
+    def test_all_raw(self, mock_get):
+        customers = self.node.query(Customer).filter(Customer.base.firstName == 'firstName').all(raw=True, size=5)
+        query = {'name': 'query', 'query':
+            {'type': 'simple', 'name': 'query', 'are':
+                {'condition':
+                     {'type': 'atomic', 'attribute': 'base.firstName', 'operator': 'EQUALS', 'value': 'firstName'}}}}
+        mock_get.assert_called_with(page=0, query=query, size=5)
+        assert isinstance(customers[0], dict), type(customers[0])
+        assert customers[0]['externalId'] == '02', customers[0]
+
     @mock.patch('requests.get', return_value=FakeHTTPResponse())
     def test_between_str(self, mock_get):
         self.node.query(Customer).filter(
@@ -0,0 +1,106 @@
+import json
+import pickle
+import unittest
+from copy import deepcopy
+
+import mock
+
+from contacthub.models.customer import Customer
+from contacthub.models.query.canonical import CompiledQuery, canonical_condition, canonical_query
+from contacthub.models.query.criterion import Criterion
+from contacthub.workspace import Workspace
+from tests.utility import FakeHTTPResponse
+
+
+class TestQueryCanonical(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        w = Workspace(workspace_id=123, token=456)
+        cls.node = w.get_node(123)
+
+    @classmethod
+    def tearDown(cls):
+        pass
+
+    def atomic(self, attribute, value):
+        return {'type': 'atomic', 'attribute': attribute, 'operator': 'EQUALS', 'value': value}
+
+    def test_canonical_condition(self):
+        a, b, c = self.atomic('a', 1), self.atomic('b', 2), self.atomic('c', 3)
+        nested = {'conjunction': 'and', 'type': 'composite',
+                  'conditions': [a, {'type': 'composite', 'conjunction': 'and', 'conditions': [b, a]},
+                                 {'type': 'composite', 'conjunction': 'or', 'conditions': [c, c]}]}
+        canonical = canonical_condition(nested)
+        assert canonical == {'type': 'composite', 'conditions': [a, b, c], 'conjunction': 'and'}
+        assert list(canonical) == ['type', 'conditions', 'conjunction']
+        unordered = canonical_condition({'value': 1, 'operator': 'EQUALS', 'attribute': 'a', 'type': 'atomic'})
+        assert json.dumps(unordered) == json.dumps(a)
+
+    def test_equal_values_of_different_types(self):
+        conditions = [self.atomic('a', 1), self.atomic('a', True), self.atomic('a', 1.0), self.atomic('a', 1)]
+        canonical = canonical_condition({'type': 'composite', 'conjunction': 'or', 'conditions': conditions})
+        assert [c['value'] for c in canonical['conditions']] == [1, True, 1.0]
+        assert [type(c['value']) for c in canonical['conditions']] == [int, bool, float]
+        number = self.node.query(Customer).filter(Customer.extra == 1)
+        boolean = self.node.query(Customer).filter(Customer.extra == True)  # noqa: E712
+        assert number.compiled is not boolean.compiled
+        assert json.loads(boolean.compiled.serialized)['query']['are']['condition']['value'] is True
+
+    def test_values_copied(self):
+        values = ['a', 'b']
+        query = self.node.query(Customer).filter(Criterion(Customer.base.firstName, Criterion.SIMPLE_OPERATORS.IN,
+                                                           values))
+        compiled = query.compiled
+        values.append('EVIL')
+        other = self.node.query(Customer).filter(Criterion(Customer.base.firstName, Criterion.SIMPLE_OPERATORS.IN,
+                                                           ['a', 'b']))
+        assert other.compiled is compiled
+        assert json.loads(other.compiled.serialized)['query']['are']['condition']['value'] == ['a', 'b']
+
+    def test_canonical_query(self):
+        simple = {'type': 'simple', 'name': 'query', 'are': {'condition': self.atomic('a', 1)}}
+        other = {'type': 'simple', 'name': 'query', 'are': {'condition': self.atomic('b', 2)}}
+        combined = {'type': 'combined', 'name': 'query', 'conjunction': 'UNION',
+                    'queries': [simple, {'type': 'combined', 'name': 'query', 'conjunction': 'UNION',
+                                         'queries': [other, simple]}]}
+        assert canonical_query(combined)['queries'] == [simple, other]
+
+    def test_filter_is_canonical(self):
+        query = self.node.query(Customer).filter(Customer.base.firstName == 'a')
+        query = query.filter((Customer.base.lastName == 'b') & (Customer.base.firstName == 'a'))
+        conditions = query.compiled['query']['are']['condition']['conditions']
+        assert [c['attribute'] for c in conditions] == ['base.firstName', 'base.lastName']
+        same = self.node.query(Customer).filter(Customer.base.firstName == 'a').filter(Customer.base.lastName == 'b')
+        assert query.compiled is same.compiled
+
+    def test_filter_does_not_change_previous_query(self):
+        base = self.node.query(Customer).filter(Customer.base.firstName == 'a').filter(Customer.base.lastName == 'b')
+        before = deepcopy(base.inner_query)
+        base.filter(Customer.extra == 'c')
+        (base | self.node.query(Customer).filter(Customer.extra == 'd')) & base
+        assert base.inner_query == before
+
+    def test_compiled_query(self):
+        query = self.node.query(Customer).filter(Customer.base.contacts.email == 'a@b.c')
+        compiled = query.compiled
+        assert isinstance(compiled, CompiledQuery) and compiled is query.compiled
+        assert compiled == {'name': 'query', 'query': query.inner_query} and compiled['query'] is not query.inner_query
+        assert compiled.serialized is compiled.serialized
+        assert json.loads(compiled.serialized) == compiled
+        assert deepcopy(compiled) is compiled
+        assert pickle.loads(pickle.dumps(compiled)) == compiled
+        try:
+            compiled['name'] = 'other'
+            assert False
+        except ValueError:
+            pass
+        assert self.node.query(Customer).compiled is None
+
+    @mock.patch('requests.get', return_value=FakeHTTPResponse())
+    def test_serialized_once_for_all_pages(self, mock_get):
+        query = self.node.query(Customer).filter(Customer.base.firstName == 'pages')
+        with mock.patch('json.dumps', wraps=json.dumps) as dumps:
+            query.all().next_page()
+            query.all()
+        assert len([c for c in dumps.call_args_list if isinstance(c[0][0], CompiledQuery)]) == 1
+        assert mock_get.call_args[1]['params']['query'] == query.compiled.serialized
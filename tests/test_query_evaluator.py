@@ -0,0 +1,94 @@
+import json
+import unittest
+
+from datetime import datetime, date
+
+from contacthub.models.customer import Customer
+from contacthub.models.query import between_, in_, not_in_
+from contacthub.models.query.evaluator import compile_criterion, compile_condition
+from contacthub.workspace import Workspace
+from tests.utility import FakeHTTPResponse
+
+
+class TestQueryEvaluator(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        w = Workspace(workspace_id=123, token=456)
+        cls.node = w.get_node(123)
+        cls.elements = json.loads(FakeHTTPResponse().text)['elements']
+        cls.customers = [Customer(node=cls.node, **json.loads(FakeHTTPResponse().text)['elements'][0]),
+                         Customer(node=cls.node, **json.loads(FakeHTTPResponse().text)['elements'][1])]
+
+    @classmethod
+    def tearDown(cls):
+        pass
+
+    def external_ids(self, criterion):
+        predicate = compile_criterion(criterion)
+        return [e['externalId'] for e in self.elements if predicate(e)]
+
+    def test_equals(self):
+        assert self.external_ids(Customer.base.firstName == 'Marco') == ['02']
+        assert self.external_ids(Customer.base.contacts.email == 'marco.bosio@axant.it') == [None]
+
+    def test_not_equals(self):
+        assert self.external_ids(Customer.base.firstName != 'Marco') == [None]
+
+    def test_gt_lt(self):
+        assert self.external_ids(Customer.base.address.geo.lat > 100) == ['02']
+        assert self.external_ids(Customer.base.address.geo.lat >= 123) == ['02']
+        assert self.external_ids(Customer.base.address.geo.lat < 123) == []
+        assert self.external_ids(Customer.base.address.geo.lat <= 123) == ['02']
+
+    def test_dates(self):
+        assert self.external_ids(Customer.updatedAt > datetime(2017, 3, 2, 13)) == [None]
+        assert self.external_ids(Customer.base.dob < date(2013, 1, 1)) == ['02']
+        assert self.external_ids(Customer.registeredAt >= '2017-03-01') == ['02']
+
+    def test_in(self):
+        assert self.external_ids(in_('manual', Customer.tags.manual)) == ['02']
+        assert self.external_ids(in_(['other', 'auto'], Customer.tags.auto)) == ['02']
+        assert self.external_ids(in_(['02', '03'], Customer.externalId)) == ['02']
+        assert self.external_ids(in_('COLLEGE', Customer.base.educations.schoolType)) == ['02']
+
+    def test_not_in(self):
+        assert self.external_ids(not_in_('manual', Customer.tags.manual)) == [None]
+
+    def test_is_null(self):
+        assert self.external_ids(Customer.externalId == None) == [None]
+        assert self.external_ids(Customer.base.address == None) == [None]
+        assert self.external_ids(Customer.unknown.attribute == None) == ['02', None]
+
+    def test_is_not_null(self):
+        assert self.external_ids(Customer.base.firstName != None) == ['02']
+
+    def test_between(self):
+        assert self.external_ids(between_(Customer.base.dob, datetime(2011, 12, 11), datetime(2015, 12, 11))) == ['02']
+        assert self.external_ids(between_(Customer.base.dob, '2011-12-11', '2012-04-22')) == []
+
+    def test_and_or(self):
+        assert self.external_ids((Customer.base.firstName == 'Marco') & (Customer.extra == 'Ciaasdo')) == ['02']
+        assert self.external_ids((Customer.base.firstName == 'Marco') & (Customer.extra == 'Ciao')) == []
+        assert self.external_ids((Customer.base.firstName == 'Marco') | (Customer.externalId == None)) == ['02', None]
+        assert self.external_ids(((Customer.base.firstName == 'Marco') | (Customer.extra == None)) &
+                                 (Customer.enabled == True)) == ['02', None]
+
+    def test_compile_condition(self):
+        predicate = compile_condition({'type': 'composite', 'conjunction': 'or', 'conditions': [
+            {'type': 'atomic', 'attribute': 'base.firstName', 'operator': 'EQUALS', 'value': 'Marco'},
+            {'type': 'atomic', 'attribute': 'extra', 'operator': 'IS_NULL'},
+            {'type': 'atomic', 'attribute': 'extra', 'operator': 'EQUALS', 'value': 'Ciao'}]})
+        assert [predicate(e) for e in self.elements] == [True, True]
+
+    def test_query_match(self):
+        q = self.node.query(Customer).filter(Customer.base.firstName == 'Marco')
+        assert q.match(self.customers[0])
+        assert not q.match(self.customers[1])
+        assert q.filter(Customer.extra == 'Ciao').evaluate(self.customers) == []
+
+    def test_query_evaluate_combined(self):
+        q1 = self.node.query(Customer).filter(Customer.base.firstName == 'Marco')
+        q2 = self.node.query(Customer).filter(Customer.base.contacts.email == 'marco.bosio@axant.it')
+        assert (q1 | q2).evaluate(self.customers) == self.customers
+        assert (q1 & q2).evaluate(self.elements) == []
+        assert self.node.query(Customer).evaluate(self.elements) == self.elements
@@ -0,0 +1,58 @@
+import json
+import unittest
+
+import mock
+
+from contacthub.models.customer import Customer
+from contacthub.workspace import Workspace
+from tests.utility import FakeHTTPResponse
+
+
+class TestSyncCustomer(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        w = Workspace(workspace_id=123, token=456)
+        cls.node = w.get_node(123)
+        response = FakeHTTPResponse(resp_path='tests/util/fake_external_single_response')
+        cls.current = json.loads(response.text)['elements'][0]
+
+    @classmethod
+    def tearDown(cls):
+        pass
+
+    @mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.patch')
+    def test_sync_customer_given_current(self, mock_patch):
+        mock_patch.return_value = self.current
+        desired = json.loads(json.dumps(self.current))
+        desired['base']['firstName'] = 'Bruce'
+        desired['extended'] = {}
+        self.node.sync_customer(desired, current=self.current)
+        expected = {'base': {'firstName': 'Bruce'}}
+        for key, value in self.current['extended'].items():
+            expected.setdefault('extended', {})[key] = None
+        mock_patch.assert_called_with(_id=self.current['id'], body=expected)
+
+    @mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.patch')
+    @mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.get')
+    def test_sync_customer_fetch_by_id(self, mock_get, mock_patch):
+        mock_get.return_value = self.current
+        customer = self.node.sync_customer(Customer(node=self.node, **json.loads(json.dumps(self.current))))
+        mock_get.assert_called_with(_id=self.current['id'])
+        assert not mock_patch.called
+        assert customer.id == self.current['id']
+
+    @mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.post')
+    def test_sync_customer_not_found(self, mock_post):
+        empty = {'elements': [], 'page': {'size': 10, 'totalElements': 0, 'totalPages': 0,
+                                          'totalUnfilteredElements': 0, 'number': 0}}
+        mock_post.return_value = dict(self.current)
+        with mock.patch('contacthub._api_manager._api_customer._CustomerAPIManager.get_all', return_value=empty):
+            self.node.sync_customer({'externalId': 'new', 'registeredAt': 'x', 'extra': 'a'})
+        mock_post.assert_called_with(body={'externalId': 'new', 'extra': 'a'}, force_update=False)
+
+    def test_sync_customer_no_id(self):
+        try:
+            self.node.sync_customer({'extra': 'a'})
+            assert False
+        except ValueError as e:
+            assert 'id' in str(e), str(e)
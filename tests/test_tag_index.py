@@ -0,0 +1,78 @@
+import unittest
+
+import mock
+
+from contacthub.lib.tag_index import Tag, TagIndex, _bitset
+from contacthub.models.customer import Customer
+from tests.fake_server import FakeContacthubServer
+
+
+class TestTagIndex(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+        customers = []
+        for i in range(30):
+            manual = [tag for tag, divisor in (('two', 2), ('three', 3), ('five', 5)) if i % divisor == 0]
+            customers.append({'id': 'c%02d' % i, 'externalId': str(i), 'tags': {'manual': manual,
+                                                                             'auto': ['odd'] if i % 2 else []}})
+        cls.server.add_customers(customers)
+        cls.index = TagIndex.build(cls.node, size=7)
+
+    @classmethod
+    def tearDown(cls):
+        cls.server.stop()
+
+    def expected(self, predicate):
+        return ['c%02d' % i for i in range(30) if predicate(i)]
+
+    def test_segments(self):
+        assert len(self.index) == 30
+        assert self.index.ids_of('two') == self.expected(lambda i: i % 2 == 0)
+        assert self.index.ids_of(Tag('two') & Tag('three')) == self.expected(lambda i: i % 6 == 0)
+        assert self.index.ids_of(Tag('three') | Tag('five')) == self.expected(lambda i: i % 3 == 0 or i % 5 == 0)
+        assert self.index.ids_of(~Tag('two') & ~Tag('odd', kind='auto')) == []
+        assert self.index.ids_of(Tag('five') & ~Tag('three')) == self.expected(lambda i: i % 5 == 0 and i % 3)
+        assert self.index.count(Tag('missing') | Tag('five')) == 6
+        assert self.index.count(~Tag('missing')) == 30
+        try:
+            Tag('x', kind='other')
+            assert False
+        except ValueError:
+            pass
+
+    def test_incremental_updates(self):
+        self.node.add_tag('c01', 'five')
+        self.node.remove_tag('c00', 'two')
+        assert self.index.ids_of(Tag('five'))[:2] == ['c00', 'c01']
+        assert 'c00' not in self.index.ids_of('two')
+        result = self.node.add_tags_bulk(['c02', 'c03'], 'vip')
+        assert result.counts['updated'] == 2 and self.index.ids_of('vip') == ['c02', 'c03']
+        self.node.remove_tags_bulk(self.node.query(Customer).filter(Customer.tags.manual == 'vip'), 'vip')
+        assert self.index.count('vip') == 0
+        self.index.remove_customer('c04')
+        assert len(self.index) == 29 and 'c04' not in self.index.ids_of(~Tag('two'))
+        self.index.add_customer('c04', manual=['new'])
+        assert self.index.ids_of('new') == ['c04'] and 'c04' not in self.index.ids_of('two')
+        self.index.detach(self.node)
+        self.node.add_tag('c05', 'new')
+        assert self.index.ids_of('new') == ['c04']
+
+    def test_bitset(self):
+        assert _bitset([], 0) == 0
+        assert _bitset([0, 3, 9, 64], 70) == 1 | 1 << 3 | 1 << 9 | 1 << 64
+        self.index.add_customer('c06', manual=['two', 'other'])
+        self.index.add_customer('c06', auto=['odd'])
+        assert self.index.customer_tags[self.index.ordinals['c06']] == set([('auto', 'odd')])
+        assert 'other' not in self.index.tags['manual'] and 'c06' not in self.index.ids_of('two')
+        assert 'c06' in self.index.ids_of(Tag('odd', kind='auto'))
+
+    def test_build_requests_ids(self):
+        with mock.patch.object(self.node, 'stream_customers', wraps=self.node.stream_customers) as stream:
+            TagIndex.build(self.node, size=7)
+        assert stream.call_args[1]['fields'] == ['id', 'tags']
+
+    def test_fetch(self):
+        customers = list(self.index.fetch(self.node, Tag('five') & Tag('three'), chunk_size=1))
+        assert [c.id for c in customers] == ['c00', 'c15'] and isinstance(customers[0], Customer)
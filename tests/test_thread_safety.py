@@ -0,0 +1,110 @@
+import pickle
+import threading
+import unittest
+from multiprocessing.pool import ThreadPool
+
+from contacthub.models.customer import Customer
+from contacthub.models.properties import Properties
+from tests.fake_server import FakeContacthubServer
+
+THREADS = 16
+
+
+class TestThreadSafety(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node(thread_safe=True)
+        cls.pool = ThreadPool(THREADS)
+
+    @classmethod
+    def tearDown(cls):
+        cls.pool.close()
+        cls.pool.join()
+        cls.server.stop()
+
+    def test_shared_managers(self):
+        customer = Customer(node=self.node, externalId='01')
+        assert customer.customer_api_manager is self.node.customer_api_manager
+        assert customer.event_api_manager is self.node.event_api_manager
+        assert customer.base.lock is customer.lock
+
+    def test_pickle(self):
+        customer = Customer(node=self.node, externalId='01', base=Properties(firstName='Bruce'))
+        customer.base.lastName = 'Wayne'
+        restored = pickle.loads(pickle.dumps(customer))
+        assert restored.to_dict() == customer.to_dict() and restored.mute == customer.mute
+        assert restored.lock is not customer.lock and restored.base.lock is restored.lock
+        restored.extended = Properties(points=1)
+        assert restored.mute['extended'] == {'points': 1} and 'extended' not in customer.mute
+        base = pickle.loads(pickle.dumps(customer.base))
+        assert base.lock is base.parent.lock and base.firstName == 'Bruce'
+        assert pickle.loads(pickle.dumps(Properties(a=1))).a == 1
+
+    def test_shared_pages(self):
+        self.server.add_customers([{'externalId': str(i)} for i in range(95)])
+        first = self.node.get_customers(size=10)
+
+        def read_all(_):
+            return [c.externalId for c in first.iter_all()]
+
+        results = self.pool.map(read_all, range(THREADS * 4))
+        assert all(r == [str(i) for i in range(95)] for r in results), results[0]
+        assert first.page_number == 0 and [c.externalId for c in first] == [str(i) for i in range(10)]
+        pages = self.pool.map(lambda n: first.get_page(n), range(10))
+        assert [p.page_number for p in pages] == list(range(10)) and len(pages[-1]) == 5
+        assert first.next_page().page_number == 1 and first.page_number == 0
+
+    def test_compatible_pages(self):
+        self.server.add_customers([{'externalId': str(i)} for i in range(15)])
+        page = self.server.get_node().get_customers(size=10)
+        assert page.next_page() is page and page.page_number == 1
+        assert page.previous_page() is page and page.page_number == 0
+
+    def test_shared_customer_mutations(self):
+        customer = self.node.add_customer(externalId='01', base={'firstName': 'Bruce'})
+        start = threading.Event()
+
+        def mutate(i):
+            start.wait()
+            for j in range(50):
+                extended = customer.extended
+                setattr(extended, 'field%s' % i, j)
+                customer.base.contacts.email = 'b%s@w.it' % i
+                customer.extra = str(j)
+
+        threads = [threading.Thread(target=mutate, args=(i,)) for i in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        tracker = customer.get_mutation_tracker()
+        assert tracker['extended'] == dict(('field%s' % i, 49) for i in range(THREADS)), tracker
+        assert tracker['extra'] == '49'
+        customer.patch()
+        stored = self.node.get_customer(id=customer.id)
+        assert stored.extended.to_dict() == tracker['extended'] and stored.base.firstName == 'Bruce'
+
+    def test_concurrent_operations(self):
+        statuses = []
+        lock = threading.Lock()
+
+        def record(info):
+            with lock:
+                statuses.append(info.status)
+
+        def operate(i):
+            self.node.workspace.add_hook('after_response', record)
+            customer = self.node.add_customer(externalId=str(i), base={'firstName': str(i)})
+            customer.base = Properties(firstName='Name %s' % i, contacts={'email': '%s@example.com' % i})
+            customer.patch()
+            self.node.add_event(customerId=customer.id, type='viewedPage', context='WEB', properties={})
+            self.node.workspace.hooks.remove('after_response', record)
+            return self.node.get_customer(id=customer.id).base.firstName
+
+        names = self.pool.map(operate, range(THREADS * 4))
+        assert names == ['Name %s' % i for i in range(THREADS * 4)], names
+        assert self.server.requests['PATCH /customers/{id}'] == THREADS * 4
+        assert self.node.workspace.hooks.after_response == []
+        assert statuses and all(200 <= status < 300 for status in statuses)
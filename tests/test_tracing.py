@@ -0,0 +1,76 @@
+import unittest
+from contextlib import contextmanager
+
+import mock
+
+from contacthub.lib import tracing
+from contacthub.models.customer import Customer
+from contacthub.workspace import Workspace
+from tests.utility import FakeHTTPResponse
+
+
+class RecordingTracer(object):
+    """
+    Tracer recording the spans opened as (name, parent name, attributes) tuples.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.stack = []
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        span = mock.Mock()
+        self.spans.append((name, self.stack[-1] if self.stack else None, attributes or {}))
+        self.stack.append(name)
+        try:
+            yield span
+        finally:
+            self.stack.pop()
+
+
+class TestTracing(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        w = Workspace(workspace_id=123, token=456)
+        cls.node = w.get_node(123)
+        cls.tracer = RecordingTracer()
+        tracing.set_tracer(cls.tracer)
+
+    @classmethod
+    def tearDown(cls):
+        tracing.set_tracer(None)
+
+    @mock.patch('requests.get', return_value=FakeHTTPResponse(resp_path='tests/util/fake_external_single_response'))
+    @mock.patch('requests.put', return_value=FakeHTTPResponse(resp_path='tests/util/fake_job_response'))
+    def test_update_job(self, mock_put, mock_get):
+        self.node.update_job(customer_id='01', id='j1', companyName='acme')
+        names = [(name, parent) for name, parent, _ in self.tracer.spans]
+        assert names == [('Node.update_job', None),
+                         ('contacthub.http', 'Node.update_job'),
+                         ('contacthub.json.encode', 'contacthub.http'),
+                         ('contacthub.json.decode', 'contacthub.http'),
+                         ('Node.get_customer', 'Node.update_job'),
+                         ('contacthub.http', 'Node.get_customer'),
+                         ('contacthub.json.decode', 'contacthub.http')], names
+        attributes = self.tracer.spans[1][2]
+        assert attributes['http.method'] == 'PUT' and attributes['contacthub.endpoint'] == '/customers/{id}/jobs/{id}'
+
+    @mock.patch('requests.get', return_value=FakeHTTPResponse())
+    def test_query_pages(self, mock_get):
+        self.node.query(Customer).filter(Customer.base.firstName == 'Marco').all()
+        names = [(name, parent) for name, parent, _ in self.tracer.spans]
+        assert names == [('Node.query', None),
+                         ('Query.all', None),
+                         ('contacthub.page', 'Query.all'),
+                         ('contacthub.http', 'contacthub.page'),
+                         ('contacthub.json.decode', 'contacthub.http'),
+                         ('contacthub.hydrate', 'Query.all')], names
+        assert self.tracer.spans[-1][2] == {'contacthub.entities': 2}
+
+    @mock.patch('requests.get', return_value=FakeHTTPResponse())
+    def test_disabled(self, mock_get):
+        tracing.set_tracer(None)
+        self.node.get_customers()
+        assert self.tracer.spans == []
+        assert tracing.span('name') is tracing.span('other')
@@ -0,0 +1,61 @@
+import unittest
+
+from contacthub.errors.api_error import APIError
+from contacthub.lib.upsert import UpsertStrategy
+from contacthub.models.customer import Customer
+from tests.fake_server import FakeContacthubServer
+
+
+class TestUpsertStrategy(unittest.TestCase):
+    @classmethod
+    def setUp(cls):
+        cls.server = FakeContacthubServer().start()
+        cls.node = cls.server.get_node()
+
+    @classmethod
+    def tearDown(cls):
+        cls.server.stop()
+
+    def test_known_customers(self):
+        existing = self.node.add_customer(externalId='01', extra='old')
+        strategy = UpsertStrategy(known={'01': existing.id})
+        updated = self.node.add_customer(externalId='01', extra='new', upsert_strategy=strategy)
+        created = self.node.add_customer(externalId='02', extra='new', upsert_strategy=strategy)
+        assert updated.id == existing.id and updated.extra == 'new'
+        assert strategy.lookup('02') == created.id
+        assert self.server.requests == {'POST /customers': 2, 'PATCH /customers/{id}': 1}, self.server.requests
+        assert strategy.stats == {'posts': 1, 'direct_patches': 1, 'conflicts': 0, 'stale': 0,
+                                  'round_trips_saved': 1}, strategy.stats
+
+    def test_learn_from_conflicts(self):
+        existing = self.node.add_customer(externalId='01', extra='old')
+        strategy = UpsertStrategy()
+        for extra in ('first', 'second', 'third'):
+            updated = self.node.add_customer(externalId='01', extra=extra, upsert_strategy=strategy)
+        assert updated.id == existing.id and updated.extra == 'third'
+        assert self.server.requests == {'POST /customers': 2, 'PATCH /customers/{id}': 3}, self.server.requests
+        assert strategy.stats == {'posts': 0, 'direct_patches': 2, 'conflicts': 1, 'stale': 0,
+                                  'round_trips_saved': 2}, strategy.stats
+
+    def test_stale_customer(self):
+        strategy = UpsertStrategy(known={'01': 'deleted'})
+        created = self.node.add_customer(externalId='01', extra='new', upsert_strategy=strategy)
+        assert strategy.lookup('01') == created.id
+        assert strategy.stats['stale'] == 1 and strategy.stats['posts'] == 1 and strategy.round_trips_saved == -1
+
+    def test_customer_post(self):
+        existing = self.node.add_customer(externalId='01', extra='old')
+        strategy = UpsertStrategy.from_customers([existing])
+        Customer(node=self.node, externalId='01', extra='new').post(upsert_strategy=strategy)
+        assert self.node.get_customer(id=existing.id).extra == 'new'
+        assert strategy.stats['direct_patches'] == 1
+
+    def test_error(self):
+        self.server.error_rate = 1
+        strategy = UpsertStrategy(known={'01': 'id'})
+        try:
+            self.node.add_customer(externalId='01', upsert_strategy=strategy)
+            assert False
+        except APIError as e:
+            assert '503' in str(e), str(e)
+        assert strategy.lookup('01') == 'id'
@@ -4,7 +4,8 @@ from contacthub.lib.paginated_list import PaginatedList
 from contacthub.lib.read_only_list import ReadOnlyList
 import json
 
-from contacthub.lib.utils import DateEncoder, get_dictionary_paths, generate_mutation_tracker, remove_empty_attributes
+from contacthub.lib.utils import DateEncoder, get_dictionary_paths, generate_mutation_tracker, remove_empty_attributes, \
+    diff_attributes
 import datetime
 
 
@@ -68,3 +69,23 @@ class TestEvent(unittest.TestCase):
         d1 = {'s': [], 'b': {'s': [], 'c': [{'d': 'd'}]}}
         r = remove_empty_attributes(d)
         assert d1 == r, r
+
+    def test_diff_attributes(self):
+        current = {'id': '01', 'updatedAt': '2017-03-02T12:12:53.074+0000', 'externalId': '02',
+                   'base': {'firstName': 'Bruce', 'lastName': 'Wayne', 'dob': '1980-01-01',
+                            'contacts': {'email': 'bruce@wayne.com', 'fax': None}, 'jobs': [{'id': 'j1'}]},
+                   'extended': {}, 'tags': {'manual': ['a'], 'auto': []}, 'extra': 'old', 'enabled': True}
+        desired = {'id': '01', 'externalId': '02',
+                   'base': {'firstName': 'Bruce', 'lastName': 'Kent', 'dob': datetime.date(1980, 1, 1),
+                            'contacts': {'email': 'bruce@wayne.com'}, 'jobs': [{'id': 'j1'}, {'id': 'j2'}],
+                            'likes': []},
+                   'tags': {'manual': ['a', 'b'], 'auto': []}, 'enabled': True, 'new': {'a': 1}}
+        body = diff_attributes(current, desired)
+        assert body == {'base': {'lastName': 'Kent', 'jobs': [{'id': 'j1'}, {'id': 'j2'}]},
+                        'tags': {'manual': ['a', 'b']}, 'extra': None, 'new': {'a': 1}}, body
+
+    def test_diff_attributes_same(self):
+        current = {'id': '01', 'registeredAt': '2017-03-02T12:12:53.074+0000', 'base': {'contacts': {}},
+                   'extended': None, 'tags': {'auto': [], 'manual': ['a']}}
+        desired = {'base': {'contacts': {}, 'jobs': []}, 'extended': {}, 'tags': {'auto': [], 'manual': ['a']}}
+        assert diff_attributes(current, desired) == {}